@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'qms.routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'hospital_qms.urls'
@@ -81,9 +83,67 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections between requests; warm-up opens them at startup
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        # Background workers write concurrently: the timeout waits for locks
+        # instead of failing. Registrations, which read the last MRN and
+        # token number before writing, start with the write lock (see
+        # qms.tokens.numbering_atomic); other transactions stay deferred so
+        # they do not queue behind each other.
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # A file, not the shared in-memory database, so concurrent tests
+        # wait for locks like the server does instead of failing at once
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# WAL lets readers run while qms_worker writes. The journal mode is stored
+# in the database file and leaves -wal/-shm files next to it, so it is
+# opt-in: set QMS_SQLITE_WAL=1 where the web server and workers share a
+# database, not on a development checkout.
+if os.environ.get('QMS_SQLITE_WAL') == '1':
+    DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;'
+
+# Optional read replica for dashboards, reports, exports and the admin
+# (see qms/routers.py). Set QMS_REPLICA_DB to the replica's SQLite file,
+# or add a 'replica' entry for another backend.
+if os.environ.get('QMS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{os.environ['QMS_REPLICA_DB']}?mode=ro",
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['qms.routers.ReplicaRouter']
+
+# GET requests under these paths read from the replica
+QMS_REPLICA_PATHS = ['/admin/']
+# After a write, the user reads from the primary for this long
+QMS_REPLICA_PIN_SECONDS = 10
+# Seconds between replica health checks
+QMS_REPLICA_RETRY_SECONDS = 30
+
+
+# Cache
+# Dashboard fragments are versioned through this cache (see qms/cache.py).
+# Use a shared backend such as memcached or redis when running several
+# worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hospital-qms',
     }
 }
 
+QMS_FRAGMENT_CACHE_SECONDS = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,3 +185,86 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Queue dispatch
+# 'pinned' sends patients who chose a doctor to that doctor's room only;
+# 'shared' serves the role queue strictly in order, whatever room is free.
+QMS_DOCTOR_DISPATCH = 'pinned'
+
+# When a pinned patient may be sent to another room instead:
+# 'strict' never, 'absent' if the doctor does not work today,
+# 'timeout' also after waiting QMS_PINNED_FALLBACK_MINUTES.
+QMS_PINNED_FALLBACK = 'absent'
+QMS_PINNED_FALLBACK_MINUTES = 30
+
+# Departments that lend idle rooms to each other. A free room takes the
+# next unpinned patient of the partner with the longest queue when that
+# queue is more than max_imbalance patients longer than its own, e.g.
+# [{'roles': ['optometrist'], 'departments': ['General', 'Retina'], 'max_imbalance': 3}]
+QMS_OVERFLOW_RULES = []
+
+# Appointments
+# Default bookable hours per room; QMS_ROOM_HOURS overrides single rooms,
+# e.g. {'B1': ('09:00', '13:00')}.
+QMS_APPOINTMENT_HOURS = ('08:00', '16:00')
+QMS_ROOM_HOURS = {}
+QMS_SLOT_MINUTES = 15
+QMS_SLOT_CAPACITY = 1
+
+# Patient notifications: a text when a patient is QMS_NOTIFY_POSITION
+# places from the front (None to disable) and when called. Messages are
+# written to an outbox and sent by `manage.py send_notifications` or the
+# send-notifications job, which share QMS_NOTIFY_RATE_PER_MINUTE through
+# the cache.
+QMS_NOTIFY_POSITION = 3
+QMS_NOTIFY_BACKEND = 'qms.senders.ConsoleSender'
+QMS_NOTIFY_FILE_PATH = BASE_DIR / 'notifications.log'
+QMS_NOTIFY_RATE_PER_MINUTE = 120
+QMS_NOTIFY_MAX_ATTEMPTS = 5
+
+# Background jobs (`manage.py qms_worker`): name -> {'job', 'every' seconds,
+# optional 'kwargs'}. Each period is queued once however many workers run.
+QMS_RECURRING_JOBS = {
+    'send-notifications': {'job': 'qms.send_notifications', 'every': 60},
+    'purge-jobs': {'job': 'qms.purge_jobs', 'every': 3600, 'kwargs': {'days': 7}},
+    'purge-notifications': {'job': 'qms.purge_notifications', 'every': 86400, 'kwargs': {'days': 30}},
+    'purge-announcements': {'job': 'qms.purge_announcements', 'every': 86400, 'kwargs': {'days': 1}},
+}
+
+# Repeated POST actions return the first response: requests with an
+# Idempotency-Key header for QMS_IDEMPOTENCY_SECONDS, identical requests
+# without one (double clicks) for QMS_COALESCE_SECONDS.
+QMS_IDEMPOTENCY_SECONDS = 600
+QMS_COALESCE_SECONDS = 2
+
+# Registrations scoring at least this against an existing patient are
+# flagged as possible duplicates (0-1, see qms.matching).
+QMS_DUPLICATE_THRESHOLD = 0.75
+
+# Import views, compile templates, connect and load reference data when a
+# WSGI worker starts instead of on its first requests (see qms/warmup.py).
+# Set QMS_WARMUP=0 in the environment to skip it.
+QMS_WARMUP = os.environ.get('QMS_WARMUP', '1') != '0'
+
+# Daily tokens ("R-17") start again from 1 at midnight in the hospital's
+# time zone, e.g. 'Asia/Kolkata' when the server runs on UTC.
+QMS_HOSPITAL_TIME_ZONE = TIME_ZONE
+
+# Largest page the /api/v1/ list endpoints return (see qms/api.py)
+QMS_API_MAX_PAGE_SIZE = 1000
+
+# Kiosk self check-in: largest batch a kiosk may send at once
+QMS_KIOSK_BATCH_LIMIT = 50
+
+# Spoken calls on the display boards at /display/<area>/ (see
+# qms/announcements.py). Clips are WAV files in
+# QMS_ANNOUNCEMENT_CLIPS/<locale>/, played in each of the locales in turn.
+# Rooms call into the waiting area of their wing letter unless listed in
+# QMS_WAITING_AREAS, e.g. {'eye-clinic': ['A1', 'A2', 'B1']}.
+QMS_ANNOUNCEMENT_CLIPS = BASE_DIR / 'announcements'
+QMS_ANNOUNCEMENT_LOCALES = ['en']
+QMS_WAITING_AREAS = {}
+QMS_ANNOUNCEMENT_POLL_SECONDS = 2
+QMS_ANNOUNCEMENT_MAX_AGE = 120
+QMS_ANNOUNCEMENT_CACHE_SIZE = 512
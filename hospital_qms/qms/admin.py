@@ -1,9 +1,16 @@
-from django.contrib import admin
-from .models import Department, Doctor, Patient, PatientCareAssignment, PatientLine
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import (
+    Announcement, Appointment, AppointmentSlot, AvailabilityDay, Department, Doctor, Job, Kiosk, KioskCheckIn,
+    Notification, PathwayStage, Patient, PatientCareAssignment, PatientLine, TokenCounter,
+)
+from .duplicates import merge_patients
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
-    list_display = ['name']
+    list_display = ['name', 'token_prefix']
     search_fields = ['name']
 
 @admin.register(Doctor)
@@ -17,6 +24,31 @@ class PatientAdmin(admin.ModelAdmin):
     list_display = ['mrn', 'name', 'age', 'gender', 'department', 'emergency', 'created_at']
     list_filter = ['department', 'emergency', 'gender']
     search_fields = ['name', 'mrn', 'phone']
+    actions = ['merge_into_oldest']
+
+    @admin.action(description='Merge selected patients into the oldest record', permissions=['delete'])
+    def merge_into_oldest(self, request, queryset):
+        patients = list(queryset.order_by('created_at', 'id'))
+        if len(patients) < 2:
+            self.message_user(request, 'Select at least two patients to merge.', messages.WARNING)
+            return None
+
+        keep, duplicates = patients[0], patients[1:]
+        # Like delete_selected: nothing changes until the confirmation page is posted
+        if not request.POST.get('post'):
+            return TemplateResponse(request, 'admin/qms/patient/merge_confirmation.html', {
+                **self.admin_site.each_context(request),
+                'title': 'Merge patients?',
+                'opts': self.model._meta,
+                'keep': keep,
+                'duplicates': duplicates,
+                'queryset': queryset,
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            })
+
+        moved = merge_patients(keep, duplicates)
+        self.message_user(request, f'Merged {len(duplicates)} records into {keep.mrn} ({moved} queue lines moved)')
+        return None
 
 @admin.register(PatientCareAssignment)
 class PatientCareAssignmentAdmin(admin.ModelAdmin):
@@ -25,6 +57,67 @@ class PatientCareAssignmentAdmin(admin.ModelAdmin):
 
 @admin.register(PatientLine)
 class PatientLineAdmin(admin.ModelAdmin):
-    list_display = ['patient', 'queue_type', 'status', 'room', 'order_index', 'created_at']
+    list_display = ['patient', 'token_number', 'token_date', 'queue_type', 'doctor', 'status', 'room', 'room_department', 'order_index', 'created_at']
     list_filter = ['queue_type', 'status', 'patient__department']  # Fixed: Changed 'department' to 'patient__department'
-    search_fields = ['patient__name', 'patient__mrn']
\ No newline at end of file
+    search_fields = ['patient__name', 'patient__mrn']
+
+@admin.register(AppointmentSlot)
+class AppointmentSlotAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'department', 'room', 'date', 'start_time', 'capacity', 'available']
+    list_filter = ['department', 'date']
+    search_fields = ['doctor__name']
+
+@admin.register(AvailabilityDay)
+class AvailabilityDayAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'department', 'date', 'free']
+    list_filter = ['department', 'date']
+
+@admin.register(Appointment)
+class AppointmentAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'slot', 'status', 'created_at']
+    list_filter = ['status', 'slot__department']
+    search_fields = ['patient__name', 'patient__mrn']
+
+@admin.register(Kiosk)
+class KioskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'active', 'created_at']
+    readonly_fields = ['token']
+
+@admin.register(KioskCheckIn)
+class KioskCheckInAdmin(admin.ModelAdmin):
+    list_display = ['kiosk', 'idempotency_key', 'patient_line', 'created_at']
+    list_filter = ['kiosk']
+
+@admin.register(PathwayStage)
+class PathwayStageAdmin(admin.ModelAdmin):
+    list_display = ['name', 'department', 'queue_type', 'order']
+    list_filter = ['department']
+    filter_horizontal = ['requires']
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['phone', 'kind', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['phone', 'patient_line__patient__mrn']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'priority', 'run_at', 'attempts', 'locked_by', 'duration_ms', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'unique_key']
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_at=timezone.now(), attempts=0)
+
+@admin.register(Announcement)
+class AnnouncementAdmin(admin.ModelAdmin):
+    list_display = ['area', 'token', 'room', 'created_at']
+    list_filter = ['area']
+    search_fields = ['patient_line__patient__mrn']
+
+@admin.register(TokenCounter)
+class TokenCounterAdmin(admin.ModelAdmin):
+    list_display = ['department', 'date', 'last']
+    list_filter = ['department']
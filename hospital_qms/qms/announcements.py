@@ -0,0 +1,229 @@
+"""
+Spoken patient calls for the waiting area display boards.
+
+Calling a patient only writes an Announcement row, from the PatientLine
+post_save receiver; no audio is built on the request path. Each room
+belongs to a waiting area (QMS_WAITING_AREAS), and the display boards of
+an area poll its announcements in id order and play them one after
+another, so calls made at the same moment never talk over each other.
+
+Audio is put together from recorded clips, one WAV file per word in
+QMS_ANNOUNCEMENT_CLIPS/<locale>/: "token.wav", "room.wav", numbers
+("0.wav" ... "19.wav", "20.wav" ... "90.wav", "hundred.wav",
+"thousand.wav", or any whole number a language needs recorded) and the
+letters of token prefixes and rooms ("a.wav" ...); "chime.wav" is
+played first if present. Clips are
+read once per process and kept as raw PCM. An announcement is a list of
+memoryviews into those buffers behind a computed WAV header, joined once
+into the response body, and the last QMS_ANNOUNCEMENT_CACHE_SIZE results
+are kept per process.
+"""
+import datetime
+import functools
+import os
+import re
+import struct
+import threading
+import wave
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Announcement
+
+
+# Silence between the token and the room
+PAUSE_SECONDS = 0.3
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+class MissingClip(LookupError):
+    pass
+
+
+# ---------------------------------------------------------
+# WAITING AREAS
+# ---------------------------------------------------------
+
+def area_for_room(room):
+    """
+    The waiting area a room calls into: its entry in QMS_WAITING_AREAS,
+    else the room's wing letter ("A3" -> "A").
+    """
+    for area, rooms in getattr(settings, 'QMS_WAITING_AREAS', {}).items():
+        if room in rooms:
+            return area
+    return room[:1].upper()
+
+
+def announce_call(line, previous_status):
+    """Queue the spoken call for a line that has just been called."""
+    if line.status != 'calling' or previous_status == 'calling' or not line.room:
+        return None
+
+    return Announcement.objects.create(
+        area=area_for_room(line.room),
+        patient_line=line,
+        # Lines made with bulk_create have no daily token
+        token=line.token or str(line.id),
+        room=line.room,
+    )
+
+
+def get_announcements(area, after=0, limit=20):
+    """
+    Announcements for ``area`` newer than id ``after``, oldest first, and
+    whether more are waiting after these ``limit``.
+
+    Boards poll with the last id they saw, which the (area, id) index
+    answers directly. Calls older than QMS_ANNOUNCEMENT_MAX_AGE seconds
+    are never returned, so a board that was offline doesn't read out a
+    backlog.
+    """
+    max_age = getattr(settings, 'QMS_ANNOUNCEMENT_MAX_AGE', 120)
+    announcements = list(Announcement.objects.filter(
+        area=area,
+        id__gt=after,
+        created_at__gte=timezone.now() - datetime.timedelta(seconds=max_age),
+    ).order_by('id')[:limit + 1])
+    return announcements[:limit], len(announcements) > limit
+
+
+# ---------------------------------------------------------
+# CLIP LIBRARY
+# ---------------------------------------------------------
+
+class ClipLibrary:
+    """The PCM frames of every clip of one locale, all in one format."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.clips = {}
+        self.params = None
+
+        for filename in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() != '.wav':
+                continue
+            with wave.open(os.path.join(directory, filename), 'rb') as f:
+                params = (f.getnchannels(), f.getsampwidth(), f.getframerate())
+                if self.params is None:
+                    self.params = params
+                elif params != self.params:
+                    # Clips are concatenated as they are, never resampled
+                    raise ValueError(f'{filename} is {params}, other clips in {directory} are {self.params}')
+                self.clips[name.lower()] = memoryview(f.readframes(f.getnframes()))
+
+        if self.params:
+            channels, width, rate = self.params
+            # 8-bit PCM is unsigned, so its silence is 128
+            sample = b'\x80' if width == 1 else bytes(width)
+            self.pause = memoryview(sample * channels * int(rate * PAUSE_SECONDS))
+
+    def __contains__(self, name):
+        return name in self.clips
+
+    def __getitem__(self, name):
+        try:
+            return self.clips[name]
+        except KeyError:
+            raise MissingClip(f'No {name}.wav in {self.directory}') from None
+
+
+def get_library(locale):
+    library = _libraries.get(locale)
+    if library is None:
+        with _libraries_lock:
+            library = _libraries.get(locale)
+            if library is None:
+                root = getattr(settings, 'QMS_ANNOUNCEMENT_CLIPS', None)
+                directory = os.path.join(root or '', locale)
+                if not root or not os.path.isdir(directory):
+                    raise MissingClip(f'No clips for locale {locale!r}')
+                library = _libraries[locale] = ClipLibrary(directory)
+    return library
+
+
+def get_locales():
+    return getattr(settings, 'QMS_ANNOUNCEMENT_LOCALES', ['en'])
+
+
+def load_libraries():
+    """Read the clips of every configured locale; returns the number of clips."""
+    count = 0
+    for locale in get_locales():
+        try:
+            count += len(get_library(locale).clips)
+        except MissingClip:
+            pass
+    return count
+
+
+def reset_libraries():
+    """Forget loaded clips, e.g. after recording new ones."""
+    with _libraries_lock:
+        _libraries.clear()
+    render_announcement.cache_clear()
+
+
+# ---------------------------------------------------------
+# ASSEMBLY
+# ---------------------------------------------------------
+
+def number_words(number, library):
+    # Languages whose numbers don't compose record them whole
+    if str(number) in library or number < 20:
+        return [str(number)]
+    if number >= 1000000:
+        return [digit for digit in str(number)]
+    if number >= 1000:
+        words = number_words(number // 1000, library) + ['thousand']
+        return words + (number_words(number % 1000, library) if number % 1000 else [])
+    if number >= 100:
+        words = number_words(number // 100, library) + ['hundred']
+        return words + (number_words(number % 100, library) if number % 100 else [])
+    return [str(number - number % 10)] + ([str(number % 10)] if number % 10 else [])
+
+
+def code_words(code, library):
+    # Tokens and rooms are read out letter by letter, numbers whole: "R-17", "A3"
+    words = []
+    for part in re.findall(r'[a-z]|\d+', code.lower()):
+        words += number_words(int(part), library) if part.isdigit() else [part]
+    return words
+
+
+def wav_header(params, data_size):
+    channels, width, rate = params
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, rate, rate * channels * width, channels * width, width * 8,
+        b'data', data_size,
+    )
+
+
+def announcement_segments(library, token, room):
+    """The clips of "Token R-17, room A3" as memoryviews; nothing is copied."""
+    segments = [library['chime']] if 'chime' in library else []
+    segments.append(library['token'])
+    segments += [library[word] for word in code_words(token, library)]
+    segments.append(library.pause)
+    segments.append(library['room'])
+    segments += [library[word] for word in code_words(room, library)]
+    return segments
+
+
+def assemble(library, segments):
+    """A WAV file of ``segments``, copied once into the result."""
+    size = sum(segment.nbytes for segment in segments)
+    return b''.join([wav_header(library.params, size), *segments])
+
+
+@functools.lru_cache(maxsize=getattr(settings, 'QMS_ANNOUNCEMENT_CACHE_SIZE', 512))
+def render_announcement(locale, token, room):
+    """WAV bytes of one call; raises MissingClip if the library lacks a word."""
+    library = get_library(locale)
+    return assemble(library, announcement_segments(library, token, room))
@@ -0,0 +1,279 @@
+"""
+Read-only JSON API, version 1 (``/api/v1/...``).
+
+Every resource is a list of flat objects:
+
+    GET /api/v1/lines/?department_id=3&status=waiting,calling&fields=id,token,status
+
+``fields`` picks the fields to return (the resource's defaults otherwise)
+and only those columns are selected, with ``values()``, so no model
+instances are built. Filters are plain query parameters; comma-separated
+values match any of them. Pages are ``limit`` rows long (at most
+QMS_API_MAX_PAGE_SIZE) in id order, and ``next`` is the URL of the next
+page, or null. The cursor in it is keyed on the last id, so pages stay
+consistent while rows are being added.
+
+Bodies are encoded with orjson when it is installed, the standard
+library otherwise, and gzipped for clients that accept it.
+"""
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from .matching import phone_key
+from .models import Department, Doctor, Patient, PatientLine
+from .reference import get_departments
+from .tokens import format_token
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ---------------------------------------------------------
+# ENCODING
+# ---------------------------------------------------------
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        # Same format as orjson
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    # UTF-8 like orjson; escaping would make names several times longer
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_default).encode()
+
+
+class ApiResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(dumps(data), **kwargs)
+
+
+def api_error(message, status=400):
+    return ApiResponse({'error': message}, status=status)
+
+
+def encode_cursor(last_id):
+    return urlsafe_base64_encode(str(last_id).encode())
+
+
+def decode_cursor(cursor):
+    return int(urlsafe_base64_decode(cursor).decode())
+
+
+# ---------------------------------------------------------
+# RESOURCES
+# ---------------------------------------------------------
+
+class Computed:
+    """
+    A field worked out in Python from selected ``columns``.
+
+    ``factory`` runs once per request and returns the function applied
+    to each row, so lookups it needs are done once.
+    """
+
+    def __init__(self, columns, factory):
+        self.columns = columns
+        self.factory = factory
+
+
+def _token_field():
+    prefixes = {department.id: department.token_prefix for department in get_departments()}
+    return lambda row: format_token(prefixes.get(row['department_id'], 'T'), row['token_number'])
+
+
+class Resource:
+    """
+    ``fields`` maps API names to a lookup (None for a column of the same
+    name) or a Computed; ``filters`` maps query parameters to lookups,
+    or to functions that turn the value into ``filter()`` keyword
+    arguments.
+    """
+
+    def __init__(self, model, fields, default_fields, filters, groups=None):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.filters = filters
+        # Groups allowed to read the resource; None lets any user in
+        self.groups = groups
+
+    def queryset(self, params):
+        queryset = self.model.objects.all()
+        for param, lookup in self.filters.items():
+            if param not in params:
+                continue
+            values = params[param].split(',')
+            if callable(lookup):
+                queryset = queryset.filter(**lookup(values))
+            elif len(values) > 1:
+                queryset = queryset.filter(**{f'{lookup}__in': values})
+            else:
+                queryset = queryset.filter(**{lookup: values[0]})
+        return queryset
+
+    def project(self, queryset, names):
+        """``queryset.values()`` with exactly the columns ``names`` need."""
+        columns, aliases, computed = [], {}, {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, Computed):
+                computed[name] = spec
+            elif spec is None:
+                columns.append(name)
+            else:
+                aliases[name] = F(spec)
+
+        helpers = []
+        for spec in computed.values():
+            helpers += [column for column in spec.columns if column not in columns and column not in helpers]
+        rows = queryset.values(*columns, *helpers, **aliases)
+        if not computed:
+            return list(rows)
+
+        functions = {name: spec.factory() for name, spec in computed.items()}
+        result = []
+        for row in rows:
+            for name, function in functions.items():
+                row[name] = function(row)
+            for column in helpers:
+                if column not in names:
+                    del row[column]
+            result.append(row)
+        return result
+
+
+DEPARTMENTS = Resource(
+    Department,
+    fields={'id': None, 'name': None, 'token_prefix': None},
+    default_fields=['id', 'name', 'token_prefix'],
+    filters={'id': 'id', 'name': 'name'},
+)
+
+DOCTORS = Resource(
+    Doctor,
+    fields={
+        'id': None, 'name': None, 'department_id': None, 'role': None, 'room': None, 'days': None,
+        'department_name': 'department__name',
+    },
+    default_fields=['id', 'name', 'department_id', 'role', 'room', 'days'],
+    filters={'id': 'id', 'department_id': 'department_id', 'role': 'role', 'room': 'room'},
+)
+
+PATIENTS = Resource(
+    Patient,
+    fields={
+        'id': None, 'mrn': None, 'name': None, 'age': None, 'gender': None, 'care_of': None,
+        'address': None, 'phone': None, 'department_id': None, 'doctor_id': None,
+        'emergency': None, 'created_at': None,
+    },
+    default_fields=['id', 'mrn', 'name', 'age', 'gender', 'phone', 'department_id', 'emergency'],
+    filters={
+        'id': 'id',
+        'mrn': 'mrn',
+        # Matches however the number was typed at registration
+        'phone': lambda values: {'phone_key__in': [phone_key(value) for value in values]},
+        'department_id': 'department_id',
+    },
+    groups=['Counter', 'Admin'],
+)
+
+LINES = Resource(
+    PatientLine,
+    fields={
+        'id': None, 'patient_id': None, 'department_id': None, 'doctor_id': None,
+        'queue_type': None, 'status': None, 'room': None, 'room_department_id': None,
+        'order_index': None, 'token_number': None, 'token_date': None,
+        'created_at': None, 'called_at': None, 'started_at': None, 'completed_at': None,
+        'token': Computed(['department_id', 'token_number'], _token_field),
+        'patient_name': 'patient__name',
+        'patient_mrn': 'patient__mrn',
+        'emergency': 'patient__emergency',
+    },
+    default_fields=['id', 'token', 'patient_id', 'department_id', 'queue_type', 'status', 'room', 'order_index'],
+    filters={
+        'id': 'id',
+        'department_id': 'department_id',
+        'room_department_id': 'room_department_id',
+        'queue_type': 'queue_type',
+        'status': 'status',
+        'patient_id': 'patient_id',
+        'mrn': 'patient__mrn',
+        'token_date': 'token_date',
+    },
+    groups=['Counter', 'Admin', 'Patient Care'],
+)
+
+
+# ---------------------------------------------------------
+# VIEWS
+# ---------------------------------------------------------
+
+def list_resource(request, resource):
+    params = request.GET
+    names = params['fields'].split(',') if params.get('fields') else resource.default_fields
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        return api_error(f"Unknown fields: {', '.join(unknown)}")
+
+    max_size = getattr(settings, 'QMS_API_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = min(int(params.get('limit', 100)), max_size)
+        after = decode_cursor(params['cursor']) if params.get('cursor') else 0
+    except (TypeError, ValueError):
+        return api_error('limit must be a number and cursor one returned by this API')
+    if limit < 1:
+        return api_error('limit must be at least 1')
+
+    try:
+        queryset = resource.queryset(params).filter(id__gt=after).order_by('id')[:limit + 1]
+    except (ValueError, ValidationError):
+        return api_error('Invalid filter value')
+    # The cursor needs the id even when it was not asked for
+    rows = resource.project(queryset, names if 'id' in names else [*names, 'id'])
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = params.copy()
+        query['cursor'] = encode_cursor(rows[-1]['id'])
+        next_url = f'{request.path}?{query.urlencode()}'
+    if 'id' not in names:
+        for row in rows:
+            del row['id']
+
+    return ApiResponse({'data': rows, 'next': next_url})
+
+
+def resource_view(resource):
+    @gzip_page
+    @require_GET
+    def view(request):
+        # JSON errors rather than the login page redirects the HTML views use
+        if not request.user.is_authenticated:
+            return api_error('Authentication required', status=401)
+        if resource.groups and not request.user.is_superuser and \
+                not request.user.groups.filter(name__in=resource.groups).exists():
+            return api_error('Permission denied', status=403)
+        return list_resource(request, resource)
+    return view
+
+
+departments = resource_view(DEPARTMENTS)
+doctors = resource_view(DOCTORS)
+patients = resource_view(PATIENTS)
+lines = resource_view(LINES)
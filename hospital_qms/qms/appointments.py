@@ -0,0 +1,207 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Appointment, AppointmentSlot, AvailabilityDay, Doctor, PatientLine
+from .queues import get_scheduled_order_index
+
+
+# ---------------------------------------------------------
+# SLOT GENERATION
+# ---------------------------------------------------------
+
+def _parse_time(value):
+    return datetime.datetime.strptime(value, '%H:%M').time()
+
+
+def get_room_hours(room):
+    """Opening hours of ``room``, from QMS_ROOM_HOURS or QMS_APPOINTMENT_HOURS."""
+    room_hours = getattr(settings, 'QMS_ROOM_HOURS', {})
+    start, end = room_hours.get(room, getattr(settings, 'QMS_APPOINTMENT_HOURS', ('08:00', '16:00')))
+    return _parse_time(start), _parse_time(end)
+
+
+def generate_slots(start_date, days):
+    """
+    Create bookable slots for every doctor working in the date range.
+
+    Slots follow ``Doctor.days`` and the room's hours; a room already
+    booked by another doctor of the department at the same time is
+    skipped (room labels repeat between departments). Existing slots
+    are left alone, so this can be re-run to extend the horizon. Returns
+    the number of slots created.
+    """
+    minutes = getattr(settings, 'QMS_SLOT_MINUTES', 15)
+    capacity = getattr(settings, 'QMS_SLOT_CAPACITY', 1)
+    end_date = start_date + datetime.timedelta(days=days - 1)
+
+    taken = set(AppointmentSlot.objects.filter(
+        date__range=(start_date, end_date)
+    ).values_list('department_id', 'room', 'date', 'start_time'))
+
+    slots = []
+    day_totals = {}
+    for doctor in Doctor.objects.order_by('id'):
+        opens, closes = get_room_hours(doctor.room)
+        for offset in range(days):
+            date = start_date + datetime.timedelta(days=offset)
+            if not doctor.works_on(date):
+                continue
+
+            current = datetime.datetime.combine(date, opens)
+            closing = datetime.datetime.combine(date, closes)
+            while current + datetime.timedelta(minutes=minutes) <= closing:
+                key = (doctor.department_id, doctor.room, date, current.time())
+                if key not in taken:
+                    taken.add(key)
+                    slots.append(AppointmentSlot(
+                        doctor=doctor,
+                        department_id=doctor.department_id,
+                        room=doctor.room,
+                        date=date,
+                        start_time=current.time(),
+                        capacity=capacity,
+                        available=capacity,
+                    ))
+                    totals = day_totals.setdefault((doctor.id, date), [doctor.department_id, 0])
+                    totals[1] += capacity
+                current += datetime.timedelta(minutes=minutes)
+
+    with transaction.atomic():
+        AppointmentSlot.objects.bulk_create(slots, batch_size=1000)
+        # Only days that had no slots yet get a row; extend existing ones
+        existing = set(AvailabilityDay.objects.filter(
+            date__range=(start_date, end_date)
+        ).values_list('doctor_id', 'date'))
+        AvailabilityDay.objects.bulk_create([
+            AvailabilityDay(doctor_id=doctor_id, department_id=department_id, date=date, free=free)
+            for (doctor_id, date), (department_id, free) in day_totals.items()
+            if (doctor_id, date) not in existing
+        ], batch_size=1000)
+        for (doctor_id, date), (_, free) in day_totals.items():
+            if (doctor_id, date) in existing:
+                AvailabilityDay.objects.filter(doctor_id=doctor_id, date=date).update(free=F('free') + free)
+
+    return len(slots)
+
+
+# ---------------------------------------------------------
+# AVAILABILITY SEARCH
+# ---------------------------------------------------------
+
+def search_availability(start_date, end_date, department_ids=None, doctor_id=None):
+    """Days with free slots, one row per doctor and day, read from AvailabilityDay."""
+    days = AvailabilityDay.objects.filter(date__range=(start_date, end_date), free__gt=0)
+    if department_ids:
+        days = days.filter(department_id__in=department_ids)
+    if doctor_id:
+        days = days.filter(doctor_id=doctor_id)
+
+    return days.order_by('date', 'doctor_id').values(
+        'date', 'free', 'doctor_id', 'department_id', 'doctor__name', 'doctor__role'
+    )
+
+
+def get_free_slots(doctor_id, date):
+    return AppointmentSlot.objects.filter(
+        doctor_id=doctor_id,
+        date=date,
+        available__gt=0
+    ).values('id', 'start_time', 'room', 'available')
+
+
+# ---------------------------------------------------------
+# BOOKING
+# ---------------------------------------------------------
+
+def book_slot(patient, slot_id):
+    """Book one place in a slot, or return None if it is already full."""
+    with transaction.atomic():
+        # Conditional update so two clerks can't both take the last place
+        updated = AppointmentSlot.objects.filter(
+            pk=slot_id,
+            available__gt=0
+        ).update(available=F('available') - 1)
+
+        if not updated:
+            return None
+
+        slot = AppointmentSlot.objects.get(pk=slot_id)
+        AvailabilityDay.objects.filter(
+            doctor_id=slot.doctor_id,
+            date=slot.date
+        ).update(free=F('free') - 1)
+
+        return Appointment.objects.create(patient=patient, slot=slot)
+
+
+def cancel_appointment(appointment):
+    """
+    Cancel a booked appointment and give its place back to the slot.
+
+    Returns False if the appointment was no longer booked, e.g. cancelled
+    or checked in by someone else in the meantime; the slot is then left
+    alone.
+    """
+    with transaction.atomic():
+        # Conditional update so only one of two racing requests credits the slot
+        updated = Appointment.objects.filter(
+            pk=appointment.pk,
+            status='booked'
+        ).update(status='cancelled')
+
+        if not updated:
+            return False
+
+        slot = appointment.slot
+        AppointmentSlot.objects.filter(pk=slot.pk).update(available=F('available') + 1)
+        AvailabilityDay.objects.filter(
+            doctor_id=slot.doctor_id,
+            date=slot.date
+        ).update(free=F('free') + 1)
+
+    appointment.status = 'cancelled'
+    return True
+
+
+def check_in(appointment):
+    """
+    Turn a booked appointment into a waiting PatientLine.
+
+    The line is pinned to the booked doctor and slotted behind patients
+    who were already waiting at the appointment time, ahead of later
+    walk-ins. Returns None if the appointment is not for today or is no
+    longer booked.
+    """
+    slot = appointment.slot
+    if slot.date != timezone.localdate():
+        return None
+
+    scheduled_at = timezone.make_aware(datetime.datetime.combine(slot.date, slot.start_time))
+    queue_type = slot.doctor.role
+
+    with transaction.atomic():
+        updated = Appointment.objects.filter(
+            pk=appointment.pk,
+            status='booked'
+        ).update(status='checked_in')
+
+        if not updated:
+            return None
+
+        line = PatientLine.objects.create(
+            patient=appointment.patient,
+            department_id=slot.department_id,
+            doctor_id=slot.doctor_id,
+            queue_type=queue_type,
+            status='waiting',
+            order_index=get_scheduled_order_index(slot.department_id, queue_type, scheduled_at)
+        )
+        Appointment.objects.filter(pk=appointment.pk).update(patient_line=line)
+
+    appointment.status = 'checked_in'
+    appointment.patient_line = line
+    return line
@@ -0,0 +1,44 @@
+"""
+Version counters for cached dashboard fragments.
+
+Fragments are cached under a key that includes a version number, and
+every queue change bumps the version instead of deleting keys. Versions
+start from the clock so an evicted counter never reuses an old number.
+With more than one worker process CACHES must point at a shared backend
+(memcached, redis), otherwise other workers keep serving old fragments.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _get_version(key)
+
+
+def queue_version(department_id, queue_type):
+    return _get_version(f'qms:queue-version:{department_id}:{queue_type}')
+
+
+def bump_queue_version(department_id, queue_type):
+    return _bump_version(f'qms:queue-version:{department_id}:{queue_type}')
+
+
+def registrations_version():
+    return _get_version('qms:registrations-version')
+
+
+def bump_registrations_version():
+    return _bump_version('qms:registrations-version')
@@ -0,0 +1,229 @@
+"""
+Capacity planning from queue history.
+
+``fit_history`` turns a department's PatientLine history into hourly
+arrival rates per weekday and lognormal service times per hour for the
+optometrist -> doctor flow. ``simulate_rosters`` then replays many days
+of every candidate roster at once: each replication is a row of NumPy
+arrays stepped a minute at a time, with emergencies served first as
+get_next_order_index does.
+
+Needs NumPy, which is only required for planning, not for the site.
+"""
+import calendar
+import math
+
+import numpy as np
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from .models import Doctor, PatientLine
+
+
+STAGES = ('optometrist', 'doctor')
+MIN_SAMPLES = 5
+DEFAULT_SERVICE_MINUTES = 10
+DEFAULT_SERVICE_SIGMA = 0.5
+
+
+class HistoryModel:
+    """Fitted arrivals and service times of one department."""
+
+    def __init__(self, arrivals, days, flow, emergency_share, service_mu, service_sigma):
+        # arrivals[weekday - 1, hour, stage]: patients per hour. Stage 1 only
+        # counts patients sent straight to the doctor; the rest come from
+        # optometrist completions with probability ``flow``.
+        self.arrivals = arrivals
+        self.days = days
+        self.flow = flow
+        self.emergency_share = emergency_share
+        self.service_mu = service_mu
+        self.service_sigma = service_sigma
+
+    def weekdays(self):
+        return [weekday for weekday in range(1, 8) if self.days[weekday - 1]]
+
+    def opening_hours(self, weekday):
+        """
+        ``(opens, closes)``: the first hour with arrivals and the hour after
+        the last. ``(0, 0)``, closed, if the history has none that day.
+        """
+        hours = np.flatnonzero(self.arrivals[weekday - 1].sum(axis=1))
+        if not len(hours):
+            return 0, 0
+        return int(hours[0]), int(hours[-1]) + 1
+
+
+def _fit_service(durations, hours):
+    """Lognormal ``(mu, sigma)`` per hour, falling back to the whole day."""
+    mu = np.full(24, math.log(DEFAULT_SERVICE_MINUTES))
+    sigma = np.full(24, DEFAULT_SERVICE_SIGMA)
+    if len(durations) >= MIN_SAMPLES:
+        logs = np.log(np.maximum(durations, 0.5))
+        mu[:] = logs.mean()
+        sigma[:] = max(logs.std(), 0.05)
+        for hour in range(24):
+            sample = logs[hours == hour]
+            if len(sample) >= MIN_SAMPLES:
+                mu[hour] = sample.mean()
+                sigma[hour] = max(sample.std(), 0.05)
+    return mu, sigma
+
+
+def fit_history(department, since=None):
+    lines = PatientLine.objects.filter(department=department, queue_type__in=STAGES)
+    if since:
+        lines = lines.filter(created_at__date__gte=since)
+
+    days = np.zeros(7)
+    for day in lines.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct():
+        days[day.isoweekday() - 1] += 1
+
+    seen_optometrist = PatientLine.objects.filter(patient_id=OuterRef('patient_id'), queue_type='optometrist')
+    counts = np.zeros((7, 24, 2))
+    referred = 0
+    rows = lines.annotate(
+        seen_optometrist=Exists(seen_optometrist),
+        weekday=ExtractIsoWeekDay('created_at'),
+        hour=ExtractHour('created_at'),
+    ).order_by().values('queue_type', 'seen_optometrist', 'weekday', 'hour').annotate(n=Count('id'))
+    for row in rows:
+        if row['queue_type'] == 'doctor' and row['seen_optometrist']:
+            referred += row['n']
+        else:
+            counts[row['weekday'] - 1, row['hour'], STAGES.index(row['queue_type'])] += row['n']
+
+    arrivals = counts / np.maximum(days, 1)[:, None, None]
+    optometrist_total = counts[..., 0].sum()
+    flow = min(referred / optometrist_total, 1.0) if optometrist_total else 1.0
+
+    totals = lines.aggregate(total=Count('id'), emergency=Count('id', filter=Q(patient__emergency=True)))
+    emergency_share = totals['emergency'] / totals['total'] if totals['total'] else 0.0
+
+    service_mu = np.empty((2, 24))
+    service_sigma = np.empty((2, 24))
+    for stage, queue_type in enumerate(STAGES):
+        durations, hours = [], []
+        for started_at, completed_at in lines.filter(
+            queue_type=queue_type,
+            started_at__isnull=False,
+            completed_at__isnull=False
+        ).values_list('started_at', 'completed_at').iterator():
+            durations.append((completed_at - started_at).total_seconds() / 60)
+            hours.append(timezone.localtime(started_at).hour)
+        service_mu[stage], service_sigma[stage] = _fit_service(np.array(durations), np.array(hours))
+
+    return HistoryModel(arrivals, days, flow, emergency_share, service_mu, service_sigma)
+
+
+def current_roster(department, weekday):
+    """Rooms per stage staffed on ``weekday`` according to ``Doctor.days``."""
+    day = calendar.day_abbr[weekday - 1]
+    roster = [0, 0]
+    for role, days in Doctor.objects.filter(department=department, role__in=STAGES).values_list('role', 'days'):
+        if day in [d.strip() for d in days.split(',')]:
+            roster[STAGES.index(role)] += 1
+    return tuple(roster)
+
+
+def simulate_rosters(model, weekday, rosters, days, rng, overtime=240):
+    """
+    Simulate ``days`` days of ``weekday`` for every ``(optometrists, doctors)``
+    roster in ``rosters`` and return one result dict per roster.
+
+    Waits come from the queue length integrated over time (Little's law),
+    utilization from busy room minutes within opening hours. Patients
+    still waiting ``overtime`` minutes after closing count as unserved.
+    """
+    rosters = np.asarray(rosters)
+    replications = len(rosters) * days
+    rooms = np.repeat(rosters, days, axis=0)
+    opens, closes = model.opening_hours(weekday)
+    rates = model.arrivals[weekday - 1] / 60.0
+
+    stages = []
+    for stage in range(2):
+        width = max(int(rooms[:, stage].max()), 1)
+        stages.append({
+            'staffed': np.arange(width) < rooms[:, stage, None],
+            'busy': np.zeros((replications, width), dtype=bool),
+            'remaining': np.zeros((replications, width)),
+            'emergency': np.zeros(replications, dtype=np.int64),
+            'normal': np.zeros(replications, dtype=np.int64),
+            'arrived': np.zeros(replications),
+            'started': np.zeros(replications),
+            'wait': np.zeros(replications),
+            'emergency_started': np.zeros(replications),
+            'emergency_wait': np.zeros(replications),
+            'busy_minutes': np.zeros(replications),
+        })
+
+    for minute in range(opens * 60, closes * 60 + overtime):
+        hour = min(minute // 60, 23)
+        is_open = minute < closes * 60
+
+        for stage, state in enumerate(stages):
+            arrived = rng.poisson(rates[hour, stage], replications) if is_open else np.zeros(replications, dtype=np.int64)
+            if stage == 1:
+                # Optometrist completions continue to the doctor queue
+                arrived = arrived + rng.binomial(finished, model.flow)
+            emergencies = rng.binomial(arrived, model.emergency_share)
+            state['emergency'] += emergencies
+            state['normal'] += arrived - emergencies
+            state['arrived'] += arrived
+
+            busy = state['busy']
+            state['remaining'] -= 1
+            done = busy & (state['remaining'] <= 0)
+            busy &= ~done
+            if stage == 0:
+                finished = done.sum(axis=1)
+
+            free = state['staffed'] & ~busy
+            available = free.sum(axis=1)
+            emergency_starts = np.minimum(available, state['emergency'])
+            normal_starts = np.minimum(available - emergency_starts, state['normal'])
+            starts = emergency_starts + normal_starts
+            starting = free & (np.cumsum(free, axis=1) <= starts[:, None])
+            state['remaining'][starting] = rng.lognormal(
+                model.service_mu[stage, hour], model.service_sigma[stage, hour], int(starting.sum())
+            )
+            busy |= starting
+
+            state['emergency'] -= emergency_starts
+            state['normal'] -= normal_starts
+            state['started'] += starts
+            state['emergency_started'] += emergency_starts
+            state['wait'] += state['emergency'] + state['normal']
+            state['emergency_wait'] += state['emergency']
+            if is_open:
+                state['busy_minutes'] += busy.sum(axis=1)
+
+        if not is_open and not any(
+            state['busy'].any() or state['emergency'].any() or state['normal'].any() for state in stages
+        ):
+            break
+
+    open_minutes = (closes - opens) * 60
+
+    def per_roster(values):
+        return values.reshape(len(rosters), days).sum(axis=1)
+
+    results = [{'rooms': tuple(int(n) for n in roster)} for roster in rosters]
+    for stage, queue_type in enumerate(STAGES):
+        state = stages[stage]
+        started = per_roster(state['started'])
+        emergency_started = per_roster(state['emergency_started'])
+        wait = per_roster(state['wait']) / np.maximum(started, 1)
+        emergency_wait = per_roster(state['emergency_wait']) / np.maximum(emergency_started, 1)
+        utilization = per_roster(state['busy_minutes']) / np.maximum(rosters[:, stage] * open_minutes * days, 1)
+        unserved = per_roster(state['arrived'] - state['started']) / days
+        for index, result in enumerate(results):
+            result[queue_type] = {
+                'mean_wait': float(wait[index]),
+                'emergency_wait': float(emergency_wait[index]),
+                'utilization': float(utilization[index]),
+                'unserved': float(unserved[index]),
+            }
+    return results
@@ -0,0 +1,132 @@
+"""
+Duplicate patient records.
+
+``find_duplicates`` is the online check run at registration: two indexed
+lookups (same phone, and same name code within a few birth years) fetch
+a bounded set of candidates, which are scored with qms.matching.
+
+``scan_duplicates`` checks the whole table without comparing every pair:
+patients are streamed in blocking-key order and each one is compared
+only with its next few neighbours in the same block.
+
+``merge_patients`` moves a duplicate's queue lines and appointments onto
+the record that is kept.
+"""
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_queue_version
+from .matching import BIRTH_YEAR_SLACK, birth_year, name_key, phone_key, prepare, score
+from .models import Appointment, Patient, PatientLine
+
+
+# Candidates fetched per blocking key at registration
+CANDIDATES = 200
+# Neighbours each patient is compared with in the batch scan
+WINDOW = 20
+
+FIELDS = ['id', 'mrn', 'name', 'age', 'phone', 'phone_key', 'name_key', 'birth_year', 'gender', 'address']
+
+
+def get_threshold():
+    return getattr(settings, 'QMS_DUPLICATE_THRESHOLD', 0.75)
+
+
+def find_duplicates(name, age, gender, phone, address='', exclude_id=None, threshold=None, limit=5):
+    """Likely existing records of a patient, as ``(score, patient)`` best first."""
+    threshold = get_threshold() if threshold is None else threshold
+    new = prepare({
+        'name': name,
+        'phone_key': phone_key(phone),
+        'birth_year': birth_year(age, timezone.now().year),
+        'gender': gender,
+        'address': address,
+    })
+
+    blocks = []
+    if new['phone_key']:
+        blocks.append(Patient.objects.filter(phone_key=new['phone_key']))
+    key = name_key(name)
+    if key and new['birth_year'] is not None:
+        blocks.append(Patient.objects.filter(
+            name_key=key,
+            birth_year__range=(new['birth_year'] - BIRTH_YEAR_SLACK, new['birth_year'] + BIRTH_YEAR_SLACK),
+        ))
+
+    candidates = {}
+    for block in blocks:
+        if exclude_id:
+            block = block.exclude(id=exclude_id)
+        for patient in block.only(*FIELDS).order_by('-id')[:CANDIDATES]:
+            candidates[patient.id] = patient
+
+    matches = []
+    for patient in candidates.values():
+        similarity = score(new, prepare(patient.__dict__), threshold)
+        if similarity >= threshold:
+            matches.append((similarity, patient))
+    matches.sort(key=lambda match: -match[0])
+    return matches[:limit]
+
+
+def _block_pairs(rows, threshold, by_name):
+    for i, a in enumerate(rows):
+        for b in rows[i + 1:i + 1 + WINDOW]:
+            if by_name:
+                # Name blocks are sorted by birth year, unknown ones first; a
+                # phone match ignores age
+                if a['birth_year'] is not None and b['birth_year'] is not None \
+                        and b['birth_year'] - a['birth_year'] > BIRTH_YEAR_SLACK:
+                    break
+                # Pairs sharing a phone were scored in the phone pass
+                if a['phone_key'] and a['phone_key'] == b['phone_key']:
+                    continue
+            similarity = score(a, b, threshold)
+            if similarity >= threshold:
+                yield similarity, a, b
+
+
+def scan_duplicates(threshold=None, queryset=None):
+    """
+    Yield ``(score, a, b)`` for likely duplicate pairs across the table.
+
+    ``a`` and ``b`` are dicts of FIELDS. Each patient is compared with at
+    most WINDOW neighbours per blocking key, so the scan grows linearly
+    with the number of patients.
+    """
+    threshold = get_threshold() if threshold is None else threshold
+    queryset = Patient.objects.all() if queryset is None else queryset
+
+    for key_field in ('phone_key', 'name_key'):
+        rows = queryset.exclude(**{key_field: ''}).order_by(
+            key_field, F('birth_year').asc(nulls_first=True), 'id'
+        ).values(*FIELDS).iterator(chunk_size=5000)
+        for _, block in itertools.groupby(rows, key=lambda row: row[key_field]):
+            block = list(block)
+            if len(block) > 1:
+                block = [prepare(row) for row in block]
+                yield from _block_pairs(block, threshold, by_name=key_field == 'name_key')
+
+
+@transaction.atomic
+def merge_patients(keep, duplicates):
+    """
+    Move the queue lines and appointments of ``duplicates`` onto ``keep``
+    and delete the duplicate records. Returns the number of lines moved.
+    """
+    ids = [patient.id for patient in duplicates if patient.id != keep.id]
+    lines = PatientLine.objects.filter(patient_id__in=ids)
+    queues = set(lines.values_list('department_id', 'queue_type'))
+
+    moved = lines.update(patient=keep)
+    Appointment.objects.filter(patient_id__in=ids).update(patient=keep)
+    Patient.objects.filter(id__in=ids).delete()
+
+    # Queue fragments show patient names
+    for department_id, queue_type in queues:
+        bump_queue_version(department_id, queue_type)
+    return moved
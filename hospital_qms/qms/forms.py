@@ -17,7 +17,11 @@ class DoctorForm(forms.ModelForm):
 class DepartmentForm(forms.ModelForm):
     class Meta:
         model = Department
-        fields = ['name']
+        fields = ['name', 'token_prefix']
+    
+    def clean_token_prefix(self):
+        # Saved in capitals, so "r" is checked against the other prefixes as "R"
+        return self.cleaned_data['token_prefix'].upper()
 
 class PatientCareAssignmentForm(forms.ModelForm):
     class Meta:
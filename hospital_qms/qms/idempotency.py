@@ -0,0 +1,91 @@
+"""
+Replay-safe POST actions.
+
+``@idempotent`` makes a repeated action return the first response
+instead of running again. Requests are matched on the Idempotency-Key
+header when the client sends one (kept QMS_IDEMPOTENCY_SECONDS), and
+otherwise on user, path and form body within QMS_COALESCE_SECONDS, which
+catches double clicks. Concurrent duplicates wait on a ``cache.add``
+lock for the first request's response, so only one reaches the database.
+
+Responses live in the default cache; with several server processes it
+must be a shared backend (see qms.cache).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+LOCK_SECONDS = 30
+WAIT_SECONDS = 10
+POLL_SECONDS = 0.02
+
+
+def _request_key(request):
+    """Cache key and lifetime for the response of ``request``."""
+    user = request.user.pk if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
+    key = request.headers.get('Idempotency-Key', '')[:100]
+    if key:
+        # A key reused on another endpoint must not replay this one's response
+        scope = f'key:{user}:{request.method}:{request.path}:{key}'
+        seconds = getattr(settings, 'QMS_IDEMPOTENCY_SECONDS', 600)
+    else:
+        body = sorted(
+            (name, value) for name, values in request.POST.lists() if name != 'csrfmiddlewaretoken'
+            for value in values
+        )
+        scope = f'request:{user}:{request.path}:{body!r}'
+        seconds = getattr(settings, 'QMS_COALESCE_SECONDS', 2)
+    return 'qms:idempotency:' + hashlib.sha256(scope.encode()).hexdigest(), seconds
+
+
+def _replay(stored):
+    status, content_type, content = stored
+    response = HttpResponse(content, status=status, content_type=content_type)
+    response['Idempotent-Replay'] = 'true'
+    return response
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view(request, *args, **kwargs)
+
+        key, seconds = _request_key(request)
+        if not seconds:
+            return view(request, *args, **kwargs)
+
+        stored = cache.get(key)
+        if stored:
+            return _replay(stored)
+
+        lock = key + ':lock'
+        deadline = time.monotonic() + WAIT_SECONDS
+        while not cache.add(lock, 1, LOCK_SECONDS):
+            # The same request is running; wait for its response
+            time.sleep(POLL_SECONDS)
+            stored = cache.get(key)
+            if stored:
+                return _replay(stored)
+            if time.monotonic() > deadline:
+                return JsonResponse({'success': False, 'error': 'The same request is still being processed'}, status=409)
+
+        try:
+            stored = cache.get(key)
+            if stored:
+                return _replay(stored)
+
+            response = view(request, *args, **kwargs)
+            # Only JSON results are replayed; redirects and errors run again
+            if response.status_code < 500 and response.get('Content-Type', '').startswith('application/json'):
+                cache.set(key, (response.status_code, response['Content-Type'], response.content), seconds)
+            return response
+        finally:
+            cache.delete(lock)
+
+    return wrapper
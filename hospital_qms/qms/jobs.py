@@ -0,0 +1,298 @@
+"""
+Database-backed background jobs.
+
+Functions registered with ``@job('name')`` are queued with ``enqueue``
+and run by ``manage.py qms_worker``; no broker is needed. Jobs queued
+inside a transaction only become visible when it commits.
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it. SQLite has no row locks, so there a single
+``UPDATE ... WHERE id IN (SELECT ... LIMIT n)`` leases the rows; SQLite
+runs one writer at a time, so two workers never get the same job.
+
+A running job's lease is renewed every third of its length, so only a
+job whose worker died runs out of it. Such a job is claimed again and
+counts as a failed attempt, so jobs should be safe to run twice; one
+that has used all its attempts is marked failed instead.
+"""
+import contextlib
+import datetime
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+LEASE_SECONDS = 300
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+
+_registry = {}
+
+
+def job(name):
+    """Register the decorated function as job ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, kwargs=None, run_at=None, priority=0, max_attempts=3, unique_key=None):
+    if name not in _registry:
+        raise ValueError(f'Unknown job {name!r}')
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs or {},
+        run_at=run_at or timezone.now(),
+        priority=priority,
+        max_attempts=max_attempts,
+        unique_key=unique_key,
+    )
+
+
+def schedule_recurring(now=None):
+    """
+    Queue one run of every QMS_RECURRING_JOBS entry per period.
+
+    Runs are keyed by period number, so any number of workers can call
+    this and each period is queued once.
+    """
+    now = now or timezone.now()
+    Job.objects.bulk_create([
+        Job(
+            name=spec['job'],
+            kwargs=spec.get('kwargs', {}),
+            run_at=now,
+            max_attempts=spec.get('max_attempts', 1),
+            unique_key=f"{key}:{int(now.timestamp() // spec['every'])}",
+        )
+        for key, spec in getattr(settings, 'QMS_RECURRING_JOBS', {}).items()
+    ], ignore_conflicts=True)
+
+
+# ---------------------------------------------------------
+# CLAIMING AND RUNNING
+# ---------------------------------------------------------
+
+def claim_jobs(worker_id, limit=1, lease_seconds=LEASE_SECONDS):
+    now = timezone.now()
+    locked_until = now + datetime.timedelta(seconds=lease_seconds)
+    lease = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_until': locked_until,
+        'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    expired = Job.objects.filter(status='running', locked_until__lt=now)
+    # A job that took its worker down on every attempt is not tried again
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed',
+        locked_until=None,
+        finished_at=now,
+        last_error='Lease expired on the last attempt; the worker stopped while running the job.',
+    )
+
+    # Expired leases first, then queued jobs by priority. Each query walks
+    # its own index, so claiming doesn't sort every due job.
+    sources = [
+        expired.filter(attempts__lt=F('max_attempts')).order_by('locked_until'),
+        Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id'),
+    ]
+
+    claimed = 0
+    for due in sources:
+        if claimed >= limit:
+            break
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit - claimed])
+                claimed += Job.objects.filter(id__in=ids).update(**lease)
+        else:
+            claimed += Job.objects.filter(id__in=due.values('id')[:limit - claimed]).update(**lease)
+
+    if not claimed:
+        return []
+    return list(Job.objects.filter(status='running', locked_by=worker_id, locked_until=locked_until))
+
+
+def _finish(job, **fields):
+    # Only if we still hold the lease; otherwise another worker took over
+    finish = Job.objects.filter(id=job.id, locked_by=job.locked_by, status='running')
+    for attempt in range(4):
+        try:
+            return finish.update(locked_until=None, **fields)
+        except OperationalError:
+            # SQLite "database is locked" under heavy contention
+            time.sleep(0.05 * 2 ** attempt)
+    return finish.update(locked_until=None, **fields)
+
+
+@contextlib.contextmanager
+def _keep_lease(job):
+    """Renew ``job``'s lease from another thread while the block runs."""
+    lease = job.locked_until - job.started_at if job.locked_until and job.started_at else None
+    if not lease or lease.total_seconds() <= 0:
+        yield
+        return
+
+    done = threading.Event()
+
+    def renew():
+        try:
+            while not done.wait(lease.total_seconds() / 3):
+                try:
+                    Job.objects.filter(id=job.id, locked_by=job.locked_by, status='running').update(
+                        locked_until=timezone.now() + lease
+                    )
+                except OperationalError:
+                    # Busy database; the next beat is still well inside the lease
+                    pass
+        finally:
+            connection.close()
+
+    heartbeat = threading.Thread(target=renew, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome; returns True on success."""
+    started = time.monotonic()
+    try:
+        with _keep_lease(job):
+            _registry[job.name](**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+    else:
+        _finish(
+            job,
+            status='succeeded',
+            finished_at=timezone.now(),
+            duration_ms=int((time.monotonic() - started) * 1000),
+            last_error='',
+        )
+        return True
+
+    now = timezone.now()
+    retry = job.attempts < job.max_attempts
+    delay = min(BACKOFF_SECONDS * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS) * random.uniform(0.8, 1.2)
+    _finish(
+        job,
+        status='queued' if retry else 'failed',
+        run_at=now + datetime.timedelta(seconds=delay),
+        finished_at=None if retry else now,
+        duration_ms=int((time.monotonic() - started) * 1000),
+        last_error=error[-4000:],
+    )
+    return False
+
+
+class Worker:
+    """
+    Runs jobs on ``threads`` threads until stopped.
+
+    Each thread claims up to ``batch`` jobs at a time; larger batches cut
+    claim overhead for short jobs but hold jobs other threads could run.
+    The main thread queues recurring jobs. With ``burst`` each thread
+    exits as soon as it finds nothing due.
+    """
+
+    def __init__(self, threads=4, poll=1.0, lease_seconds=LEASE_SECONDS, burst=False, name=None, batch=1):
+        self.threads = threads
+        self.batch = batch
+        self.poll = poll
+        self.lease_seconds = lease_seconds
+        self.burst = burst
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.succeeded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._loop, args=(f'{self.name}:{i}',), daemon=True)
+            for i in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                if not self.burst:
+                    schedule_recurring()
+                self.stopping.wait(self.poll)
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            connection.close()
+
+    def _loop(self, worker_id):
+        try:
+            while not self.stopping.is_set():
+                try:
+                    jobs = claim_jobs(worker_id, self.batch, self.lease_seconds)
+                except OperationalError:
+                    self.stopping.wait(random.uniform(0, self.poll))
+                    continue
+
+                if not jobs:
+                    if self.burst:
+                        break
+                    self.stopping.wait(self.poll)
+                    continue
+
+                for claimed in jobs:
+                    succeeded = run_job(claimed)
+                    with self._lock:
+                        if succeeded:
+                            self.succeeded += 1
+                        else:
+                            self.failed += 1
+        finally:
+            connection.close()
+
+
+# ---------------------------------------------------------
+# METRICS
+# ---------------------------------------------------------
+
+def job_stats(since=None):
+    """Counts per status, and per job name the outcome and run times."""
+    jobs = Job.objects.all()
+    if since:
+        jobs = jobs.filter(created_at__gte=since)
+
+    now = timezone.now()
+    oldest_due = jobs.filter(status='queued', run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'statuses': dict(jobs.order_by().values_list('status').annotate(n=Count('id'))),
+        'lag_seconds': (now - oldest_due).total_seconds() if oldest_due else 0.0,
+        'jobs': list(jobs.order_by('name').values('name').annotate(
+            total=Count('id'),
+            succeeded=Count('id', filter=Q(status='succeeded')),
+            failed=Count('id', filter=Q(status='failed')),
+            retried=Count('id', filter=Q(attempts__gt=1)),
+            avg_ms=Avg('duration_ms', filter=Q(status='succeeded')),
+            max_ms=Max('duration_ms', filter=Q(status='succeeded')),
+        )),
+    }
@@ -0,0 +1,118 @@
+"""
+Self check-in for returning patients at kiosks.
+
+Kiosks buffer check-ins locally and send them in batches; every entry
+carries a key generated on the device, so a batch that is resent after
+a timeout replays the stored results instead of queueing anyone twice.
+"""
+from django.db import IntegrityError
+
+from .models import Kiosk, KioskCheckIn, Patient, PatientLine
+from .pathways import initial_queue_types
+from .queues import enqueue_patient
+from .tokens import numbering_atomic
+
+
+OPEN_STATUSES = ['waiting', 'calling', 'processing', 'hold']
+
+
+def get_kiosk(token):
+    if not token:
+        return None
+    return Kiosk.objects.filter(token=token, active=True).first()
+
+
+def _find_patients(mrns, phones):
+    """Look up every MRN and phone number in the batch with two queries."""
+    by_mrn = Patient.objects.select_related('doctor').in_bulk(mrns, field_name='mrn') if mrns else {}
+    by_phone = {}
+    if phones:
+        # Latest registration wins when a number was used more than once
+        for patient in Patient.objects.select_related('doctor').filter(phone__in=phones).order_by('created_at'):
+            by_phone[patient.phone] = patient
+
+    return by_mrn, by_phone
+
+
+def _check_in_patient(patient):
+    line = PatientLine.objects.filter(patient=patient, status__in=OPEN_STATUSES).first()
+    if not line:
+        lines = [enqueue_patient(patient, queue_type) for queue_type in initial_queue_types(patient)]
+        line = lines[0]
+
+    return line, {
+        'success': True,
+        'mrn': patient.mrn,
+        'name': patient.name,
+        'queue_type': line.queue_type,
+        'patient_line_id': line.id,
+        'token': line.token,
+    }
+
+
+def _text(value):
+    """A stripped string entry field; '' when missing, None when not a string."""
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        return None
+    return value.strip()
+
+
+def process_batch(kiosk, entries):
+    """
+    Check in a batch of ``{'key', 'mrn' | 'phone'}`` entries.
+
+    Returns one result per entry, in order. Entries whose key was seen
+    before get the result stored the first time.
+    """
+    entries = [(
+        str(entry.get('key') or '')[:64],
+        _text(entry.get('mrn')),
+        _text(entry.get('phone')),
+    ) for entry in entries]
+
+    seen = {
+        check_in.idempotency_key: check_in.result
+        for check_in in KioskCheckIn.objects.filter(
+            kiosk=kiosk,
+            idempotency_key__in=[key for key, _, _ in entries]
+        )
+    }
+    new_entries = [entry for entry in entries if entry[0] not in seen]
+    by_mrn, by_phone = _find_patients(
+        {mrn for _, mrn, _ in new_entries if mrn},
+        {phone for _, mrn, phone in new_entries if phone and not mrn},
+    )
+
+    results = []
+    for key, mrn, phone in entries:
+        if not key:
+            results.append({'key': key, 'success': False, 'error': 'Missing idempotency key'})
+            continue
+
+        if key in seen:
+            results.append(dict(seen[key], key=key))
+            continue
+
+        if mrn is None or phone is None:
+            results.append({'key': key, 'success': False, 'error': 'mrn and phone must be strings'})
+            continue
+
+        patient = by_mrn.get(mrn) if mrn else by_phone.get(phone)
+        if not patient:
+            results.append({'key': key, 'success': False, 'error': 'Patient not found'})
+            continue
+
+        try:
+            with numbering_atomic():
+                line, result = _check_in_patient(patient)
+                KioskCheckIn.objects.create(kiosk=kiosk, idempotency_key=key, patient_line=line, result=result)
+        except IntegrityError:
+            # Another request with the same key got there first
+            result = KioskCheckIn.objects.get(kiosk=kiosk, idempotency_key=key).result
+
+        seen[key] = result
+        results.append(dict(result, key=key))
+
+    return results
@@ -0,0 +1,155 @@
+# qms/management/commands/bench_announcements.py
+
+import io
+import math
+import os
+import random
+import struct
+import tempfile
+import time
+import wave
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from qms.announcements import (
+    announcement_segments, assemble, code_words, get_announcements, get_library,
+    render_announcement, reset_libraries,
+)
+from qms.models import Announcement, Department, Doctor, Patient, PatientLine
+
+RATE = 16000
+ROOMS = [room for room, _ in Doctor.ROOM_CHOICES]
+WORDS = (
+    [str(n) for n in range(20)] + [str(n) for n in range(20, 100, 10)]
+    + ['hundred', 'thousand', 'token', 'room', 'chime', 'a', 'b']
+)
+
+
+def write_clip(path, seconds, pitch):
+    frames = int(RATE * seconds)
+    samples = (int(8000 * math.sin(2 * math.pi * pitch * i / RATE)) for i in range(frames))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(struct.pack(f'<{frames}h', *samples))
+
+
+def naive_render(directory, library, token, room):
+    # Reads each clip and writes the file with the wave module, per call
+    words = ['chime', 'token', *code_words(token, library), 'room', *code_words(room, library)]
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as result:
+        for i, word in enumerate(words):
+            with wave.open(os.path.join(directory, f'{word}.wav'), 'rb') as clip:
+                if i == 0:
+                    result.setparams(clip.getparams())
+                result.writeframes(clip.readframes(clip.getnframes()))
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Times announcement audio assembly with generated clips and a burst of calls; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--announcements', type=int, default=2000)
+        parser.add_argument('--calls', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as root:
+            os.mkdir(os.path.join(root, 'en'))
+            for i, word in enumerate(WORDS):
+                write_clip(os.path.join(root, 'en', f'{word}.wav'), 0.45, 220 + 15 * i)
+
+            with override_settings(QMS_ANNOUNCEMENT_CLIPS=root, QMS_ANNOUNCEMENT_LOCALES=['en']):
+                reset_libraries()
+                try:
+                    self.bench_assembly(os.path.join(root, 'en'), options['announcements'])
+                    self.bench_calls(options['calls'])
+                finally:
+                    reset_libraries()
+
+    def bench_assembly(self, directory, count):
+        started = time.perf_counter()
+        library = get_library('en')
+        self.stdout.write(f'Loaded {len(library.clips)} clips in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        calls = [(f'{random.choice("AB")}-{random.randint(1, 999)}', random.choice(ROOMS)) for _ in range(count)]
+
+        started = time.perf_counter()
+        naive = [naive_render(directory, library, token, room) for token, room in calls[:200]]
+        naive_us = (time.perf_counter() - started) / len(naive) * 1e6
+
+        started = time.perf_counter()
+        for token, room in calls:
+            assemble(library, announcement_segments(library, token, room))
+        assembled_us = (time.perf_counter() - started) / count * 1e6
+
+        # Calls still on the boards fit in the cache
+        recent = calls[:min(count, render_announcement.cache_info().maxsize)]
+        for token, room in recent:
+            render_announcement('en', token, room)
+        started = time.perf_counter()
+        for token, room in recent:
+            render_announcement('en', token, room)
+        cached_us = (time.perf_counter() - started) / len(recent) * 1e6
+
+        # Byte for byte the naive file, once the pause between token and room is left out
+        token, room = calls[0]
+        segments = announcement_segments(library, token, room)
+        if assemble(library, [segment for segment in segments if segment is not library.pause]) != naive[0]:
+            raise CommandError('Assembled audio does not match the clips')
+        audio = render_announcement('en', token, room)
+        with wave.open(io.BytesIO(audio), 'rb') as f:
+            seconds = f.getnframes() / f.getframerate()
+
+        self.stdout.write(f'Per announcement ({seconds:.1f}s of audio, {len(audio) / 1024:.0f} KB):')
+        self.stdout.write(f'  read clips + wave writer   {naive_us:8.1f} us')
+        self.stdout.write(f'  memoryview segments + join {assembled_us:8.1f} us')
+        self.stdout.write(f'  cached                     {cached_us:8.1f} us')
+
+    def bench_calls(self, count):
+        with transaction.atomic():
+            department = Department.objects.create(name='Bench Announcements')
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    name=f'Bench Patient {i}', age=40, gender='F', address='-',
+                    phone='0', mrn=f'BENCH-{i:07d}', department=department,
+                )
+                for i in range(count)
+            ])
+            lines = PatientLine.objects.bulk_create([
+                PatientLine(patient=patient, department=department, queue_type='doctor', order_index=i)
+                for i, patient in enumerate(patients)
+            ])
+
+            renders = render_announcement.cache_info().misses
+            started = time.perf_counter()
+            for i, line in enumerate(lines):
+                line.loaded_status = 'waiting'
+                line.status = 'calling'
+                line.room = ROOMS[i % len(ROOMS)]
+                line.called_at = timezone.now()
+                line.save()
+            elapsed = time.perf_counter() - started
+
+            per_area = {}
+            for area in sorted(set(room[0] for room in ROOMS)):
+                announcements, _ = get_announcements(area, limit=count)
+                ids = [announcement.id for announcement in announcements]
+                if ids != sorted(ids):
+                    raise CommandError(f'Area {area} announcements are out of order')
+                per_area[area] = len(announcements)
+
+            created = Announcement.objects.filter(patient_line__department=department).count()
+            transaction.set_rollback(True)
+
+        if created != count or render_announcement.cache_info().misses != renders:
+            raise CommandError('Calls should only write announcement rows')
+        self.stdout.write(
+            f'{count} calls across {len(ROOMS)} rooms in {elapsed * 1000:.0f} ms '
+            f'({elapsed / count * 1000:.2f} ms per call save, no audio built); '
+            f'queued per area: {per_area}'
+        )
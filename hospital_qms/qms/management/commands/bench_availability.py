@@ -0,0 +1,64 @@
+# qms/management/commands/bench_availability.py
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from qms.appointments import generate_slots, search_availability
+from qms.models import AppointmentSlot, Department, Doctor
+
+class Command(BaseCommand):
+    help = 'Times appointment availability search; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        start_date = timezone.localdate()
+        end_date = start_date + datetime.timedelta(days=options['days'] - 1)
+
+        with transaction.atomic():
+            departments = [Department.objects.create(name=f'Bench {i}') for i in range(5)]
+            Doctor.objects.bulk_create([
+                Doctor(
+                    name=f'Bench Doctor {i}',
+                    department=departments[i % len(departments)],
+                    role='doctor' if i % 2 else 'optometrist',
+                    # One room each, so no slots are lost to room clashes
+                    room=f'R{i}',
+                    days='Mon,Tue,Wed,Thu,Fri,Sat',
+                )
+                for i in range(options['doctors'])
+            ])
+
+            started = time.perf_counter()
+            created = generate_slots(start_date, options['days'])
+            self.stdout.write(f'Generated {created} slots in {time.perf_counter() - started:.2f}s')
+
+            def precomputed():
+                return list(search_availability(start_date, end_date))
+
+            def counted():
+                # What the search would cost without the precomputed columns
+                return list(AppointmentSlot.objects.filter(
+                    date__range=(start_date, end_date)
+                ).annotate(
+                    booked=Count('appointment')
+                ).filter(
+                    booked__lt=F('capacity')
+                ).values('date', 'doctor_id').annotate(first_time=Min('start_time')))
+
+            for label, search in (('precomputed', precomputed), ('counting', counted)):
+                rows = search()
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    search()
+                elapsed = (time.perf_counter() - started) / options['repeat']
+                self.stdout.write(f'{label:<12} {len(rows):>6} rows {elapsed * 1000:>9.2f} ms/search')
+
+            transaction.set_rollback(True)
@@ -0,0 +1,99 @@
+# qms/management/commands/bench_dashboard_render.py
+
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from qms.cache import bump_queue_version, queue_version
+from qms.models import Department, Doctor, Patient, PatientCareAssignment, PatientLine
+from qms.pathways import get_pathway, invalidate_pathway
+from qms.views import patient_care_dashboard
+
+
+def fragment_cache():
+    # The {% cache %} tag prefers this alias when it is configured
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+class Command(BaseCommand):
+    help = 'Times patient care dashboard renders with and without cached fragments; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--waiting', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            department = Department.objects.create(name='Bench Dashboard')
+            for i, room in enumerate(['A1', 'A2', 'A3', 'B1', 'B2', 'B3']):
+                Doctor.objects.create(
+                    name=f'Bench Doctor {i}', department=department,
+                    role='optometrist' if room.startswith('A') else 'doctor',
+                    room=room, days='Mon,Tue,Wed,Thu,Fri',
+                )
+
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    name=f'Bench Patient {i}', age=40, gender='F', address='-',
+                    phone='0', mrn=f'BENCH-{i:07d}', department=department,
+                    emergency=i % 25 == 0,
+                )
+                for i in range(options['waiting'])
+            ])
+            PatientLine.objects.bulk_create([
+                PatientLine(
+                    patient=patient, department=department,
+                    queue_type='optometrist' if i % 2 else 'doctor',
+                    status='waiting', order_index=i,
+                )
+                for i, patient in enumerate(patients)
+            ])
+
+            user = User.objects.create_user('bench-dashboard')
+            user.groups.add(Group.objects.get_or_create(name='Patient Care')[0])
+            PatientCareAssignment.objects.create(user=user, department=department)
+
+            factory = RequestFactory()
+
+            def render():
+                request = factory.get('/patient-care/')
+                request.user = user
+                return patient_care_dashboard(request)
+
+            def cold():
+                # Only this department's entries; the cache may be shared with a live site
+                invalidate_pathway(department.id)
+                fragment_cache().delete_many([
+                    make_template_fragment_key('queue_panel', [
+                        department.id, queue_type, queue_version(department.id, queue_type), timezone.localdate(),
+                    ])
+                    for queue_type in get_pathway(department.id)
+                ])
+
+            def one_change():
+                bump_queue_version(department.id, 'doctor')
+
+            for label, prepare in (('cold', cold), ('warm', None), ('after change', one_change)):
+                render()
+                total = 0.0
+                for _ in range(options['repeat']):
+                    if prepare:
+                        prepare()
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        render()
+                    total += time.perf_counter() - started
+                self.stdout.write(
+                    f'{label:<13} {total / options["repeat"] * 1000:>8.2f} ms/render '
+                    f'{len(queries):>3} queries'
+                )
+
+            transaction.set_rollback(True)
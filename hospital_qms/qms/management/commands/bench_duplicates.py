@@ -0,0 +1,106 @@
+# qms/management/commands/bench_duplicates.py
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from qms.duplicates import find_duplicates, scan_duplicates
+from qms.matching import birth_year, name_key, phone_key
+from qms.models import Department, Patient
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Amit', 'Anita', 'Arjun', 'Deepa', 'Divya', 'Ganesh', 'Geeta', 'Hari', 'Isha', 'Karan',
+    'Kavita', 'Lakshmi', 'Manoj', 'Meena', 'Mohan', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul', 'Rajesh',
+    'Ravi', 'Rekha', 'Rohit', 'Sanjay', 'Sita', 'Sunil', 'Sunita', 'Suresh', 'Uma', 'Vijay', 'Vikram',
+    'John', 'Mary', 'Ahmed', 'Fatima', 'Joseph', 'Grace', 'Samuel', 'Ruth', 'David', 'Sarah', 'Peter', 'Anna',
+]
+LAST_NAMES = [
+    'Sharma', 'Verma', 'Gupta', 'Kumar', 'Singh', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Menon', 'Das', 'Bose',
+    'Rao', 'Joshi', 'Mehta', 'Shah', 'Pillai', 'Khan', 'Ali', 'Thomas', 'George', 'Mathew', 'Yadav', 'Mishra',
+    'Pandey', 'Chauhan', 'Kapoor', 'Malhotra', 'Banerjee', 'Mukherjee', 'Ghosh', 'Chatterjee', 'Naidu', 'Hegde',
+]
+
+def typo(name, rng):
+    # Dropped, doubled or swapped letter, the usual re-registration slips
+    i = rng.randrange(1, len(name) - 1)
+    return rng.choice([
+        name[:i] + name[i + 1:],
+        name[:i] + name[i] + name[i:],
+        name[:i] + name[i + 1] + name[i] + name[i + 2:],
+    ])
+
+class Command(BaseCommand):
+    help = 'Times the registration duplicate check and the batch scan on synthetic patients; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1000000)
+        parser.add_argument('--duplicates', type=float, default=0.01, help='Share of patients registered twice')
+        parser.add_argument('--lookups', type=int, default=500)
+        parser.add_argument('--no-scan', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(37)
+        year = timezone.now().year
+
+        with transaction.atomic():
+            department = Department.objects.create(name='Bench duplicates')
+            people = []
+            batch = []
+            planted = 0
+            started = time.perf_counter()
+            for i in range(options['patients']):
+                if people and rng.random() < options['duplicates']:
+                    # A returning patient registered again with small differences
+                    planted += 1
+                    name, age, gender, phone, address = rng.choice(people)
+                    first, last = name.split()
+                    name = f'{typo(first, rng)} {last}' if rng.random() < 0.5 else f'{first} {typo(last, rng)}'
+                    age += rng.choice([0, 0, 1])
+                    if rng.random() < 0.3:
+                        phone = f'9{rng.randrange(10 ** 9):09d}'
+                else:
+                    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+                    age = rng.randrange(1, 90)
+                    gender = rng.choice('MF')
+                    phone = f'9{rng.randrange(10 ** 9):09d}'
+                    address = f'{rng.randrange(1, 500)} Street {rng.randrange(1, 2000)}, Ward {rng.randrange(1, 40)}'
+                    if len(people) < 10000:
+                        people.append((name, age, gender, phone, address))
+                batch.append(Patient(
+                    name=name, age=age, gender=gender, phone=phone, address=address, department=department,
+                    mrn=f'BENCH-{i}', phone_key=phone_key(phone), name_key=name_key(name),
+                    birth_year=birth_year(age, year),
+                ))
+                if len(batch) == 5000:
+                    Patient.objects.bulk_create(batch)
+                    batch = []
+            Patient.objects.bulk_create(batch)
+            self.stdout.write(f"Inserted {options['patients']} patients in {time.perf_counter() - started:.0f}s")
+
+            timings = []
+            flagged = 0
+            for _ in range(options['lookups']):
+                name, age, gender, phone, address = rng.choice(people)
+                if rng.random() < 0.5:
+                    phone = f'9{rng.randrange(10 ** 9):09d}'
+                started = time.perf_counter()
+                flagged += bool(find_duplicates(name, age, gender, phone, address))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"Registration check: p50 {statistics.median(timings):.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms; "
+                f"{flagged}/{options['lookups']} returning patients flagged"
+            )
+
+            if not options['no_scan']:
+                started = time.perf_counter()
+                pairs = sum(1 for _ in scan_duplicates(queryset=Patient.objects.filter(department=department)))
+                self.stdout.write(
+                    f'Batch scan: {pairs} likely duplicate pairs ({planted} planted) in {time.perf_counter() - started:.0f}s'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,61 @@
+# qms/management/commands/bench_export.py
+
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from qms.exports import iter_csv, iter_rows
+from qms.models import Department, Patient, PatientLine
+
+class Command(BaseCommand):
+    help = 'Exports generated queue history and checks peak memory; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--max-peak-mb', type=float, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            department = Department.objects.create(name='Bench Export')
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    name=f'Bench Patient {i}', age=40, gender='F', address='-',
+                    phone='0', mrn=f'BENCH-{i:07d}', department=department,
+                )
+                for i in range(min(options['rows'], 10000))
+            ])
+
+            batch = []
+            for i in range(options['rows']):
+                batch.append(PatientLine(
+                    patient=patients[i % len(patients)],
+                    department=department,
+                    queue_type='doctor' if i % 2 else 'optometrist',
+                    status='completed',
+                    order_index=i,
+                ))
+                if len(batch) == 10000:
+                    PatientLine.objects.bulk_create(batch)
+                    batch = []
+            PatientLine.objects.bulk_create(batch)
+            self.stdout.write(f"Generated {options['rows']} queue lines")
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            written = 0
+            for chunk in iter_csv(iter_rows('lines', department_id=department.id)):
+                written += len(chunk)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            transaction.set_rollback(True)
+
+        peak_mb = peak / 1024 / 1024
+        self.stdout.write(
+            f'Exported {written / 1024 / 1024:.1f} MB of CSV in {elapsed:.1f}s, '
+            f'peak traced memory {peak_mb:.1f} MB'
+        )
+        if peak_mb > options['max_peak_mb']:
+            raise CommandError(f"Peak memory {peak_mb:.1f} MB is above {options['max_peak_mb']} MB")
@@ -0,0 +1,76 @@
+# qms/management/commands/bench_jobs.py
+
+import collections
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from qms.jobs import Worker, job
+from qms.models import Job
+
+BENCH_JOB = 'qms.bench_job'
+
+@job(BENCH_JOB)
+def bench_job(key, path, work_ms=0):
+    if work_ms:
+        time.sleep(work_ms / 1000)
+    # O_APPEND writes of one short line don't interleave between processes
+    with open(path, 'a') as f:
+        f.write(f'{key}\n')
+
+def run_burst(threads, batch):
+    worker = Worker(threads=threads, poll=0.05, burst=True, batch=batch)
+    worker.run()
+
+class Command(BaseCommand):
+    help = 'Measures job throughput with several concurrent workers and checks each job ran once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--work-ms', type=int, default=5, help='Simulated I/O per job')
+        parser.add_argument('--configs', default='1x1,1x4,2x4,4x4',
+                            help='Comma-separated PROCESSESxTHREADS worker setups')
+        parser.add_argument('--batch', type=int, default=1, help='Jobs each thread claims at once')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'workers':<8} {'jobs':>6} {'seconds':>8} {'jobs/s':>8} {'duplicates':>11} {'missing':>8}")
+
+        for config in options['configs'].split(','):
+            processes, threads = (int(n) for n in config.split('x'))
+            fd, path = tempfile.mkstemp(prefix='qms-bench-jobs-')
+            os.close(fd)
+
+            Job.objects.filter(name=BENCH_JOB).delete()
+            now = timezone.now()
+            Job.objects.bulk_create([
+                Job(name=BENCH_JOB, kwargs={'key': i, 'path': path, 'work_ms': options['work_ms']}, run_at=now)
+                for i in range(options['jobs'])
+            ], batch_size=500)
+
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            workers = [context.Process(target=run_burst, args=(threads, options['batch'])) for _ in range(processes)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            with open(path) as f:
+                runs = collections.Counter(int(line) for line in f)
+            os.unlink(path)
+            duplicates = sum(count - 1 for count in runs.values() if count > 1)
+            missing = options['jobs'] - len(runs)
+            Job.objects.filter(name=BENCH_JOB).delete()
+
+            self.stdout.write(
+                f"{config:<8} {options['jobs']:>6} {elapsed:>8.2f} {options['jobs'] / elapsed:>8.0f} "
+                f"{duplicates:>11} {missing:>8}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Jobs ran on the configured database; bench jobs were deleted afterwards'))
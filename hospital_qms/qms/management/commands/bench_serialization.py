@@ -0,0 +1,119 @@
+# qms/management/commands/bench_serialization.py
+
+import gzip
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import JsonResponse
+from django.test import RequestFactory
+from qms import api
+from qms.models import Department, Patient, PatientLine
+from qms.tokens import format_token, hospital_date
+
+FIELDS = ['id', 'token', 'patient_id', 'patient_name', 'queue_type', 'status', 'room', 'order_index', 'created_at']
+
+
+def hand_built(department):
+    # How the existing JSON views build responses: model instances, then dicts
+    lines = PatientLine.objects.filter(department=department).select_related('patient').order_by('id')
+    return JsonResponse({'success': True, 'lines': [{
+        'id': line.id,
+        'token': format_token(department.token_prefix, line.token_number),
+        'patient_id': line.patient.id,
+        'patient_name': line.patient.name,
+        'queue_type': line.queue_type,
+        'status': line.status,
+        'room': line.room,
+        'order_index': line.order_index,
+        'created_at': line.created_at,
+    } for line in lines]})
+
+
+def projected(department):
+    rows = api.LINES.project(PatientLine.objects.filter(department=department).order_by('id'), FIELDS)
+    return api.ApiResponse({'data': rows, 'next': None})
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Times JSON serialization of a queue payload, hand-built dicts vs the v1 API; all data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        count, runs = options['lines'], options['runs']
+        with transaction.atomic():
+            department = Department.objects.create(name='Bench Serialization', token_prefix='S')
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    name=f'Bench Patient {i}', age=40, gender='F', address='-',
+                    phone='0', mrn=f'BENCH-{i:07d}', department=department,
+                )
+                for i in range(count)
+            ])
+            today = hospital_date()
+            PatientLine.objects.bulk_create([
+                PatientLine(
+                    patient=patient, department=department, queue_type='doctor', order_index=i,
+                    token_number=i + 1, token_date=today,
+                )
+                for i, patient in enumerate(patients)
+            ])
+            user = User.objects.create_superuser('bench-serialization')
+            request = RequestFactory().get('/api/v1/lines/', {
+                'department_id': department.id, 'fields': ','.join(FIELDS), 'limit': count,
+            }, HTTP_ACCEPT_ENCODING='gzip')
+            request.user = user
+
+            results = []
+            hand_ms, response = timed(lambda: hand_built(department), runs)
+            results.append(('hand-built dicts + JsonResponse', hand_ms, response.content))
+
+            projected_ms, response = timed(lambda: projected(department), runs)
+            results.append(('values() + orjson' if api.orjson else 'values() + json', projected_ms, response.content))
+            if api.orjson:
+                with mock.patch.object(api, 'orjson', None):
+                    fallback_ms, response = timed(lambda: projected(department), runs)
+                results.append(('values() + json fallback', fallback_ms, response.content))
+
+            # The encoders alone, on the same rows
+            rows = api.LINES.project(PatientLine.objects.filter(department=department).order_by('id'), FIELDS)
+            encoders = [('DjangoJSONEncoder', timed(lambda: json.dumps(rows, cls=DjangoJSONEncoder).encode(), runs)[0])]
+            with mock.patch.object(api, 'orjson', None):
+                encoders.append(('json fallback', timed(lambda: api.dumps(rows), runs)[0]))
+            if api.orjson:
+                encoders.append(('orjson', timed(lambda: api.dumps(rows), runs)[0]))
+
+            view_ms, response = timed(lambda: api.lines(request), runs)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{count} queue lines, median of {runs} runs:')
+        self.stdout.write(f"  {'':34} {'ms':>7} {'KB':>7} {'gzip KB':>8}")
+        for label, ms, content in results:
+            self.stdout.write(
+                f'  {label:34} {ms:7.1f} {len(content) / 1024:7.1f} {len(gzip.compress(content, 6)) / 1024:8.1f}'
+            )
+        self.stdout.write(f"  {'GET /api/v1/lines/ (gzipped)':34} {view_ms:7.1f} {'':7} {len(response.content) / 1024:8.1f}")
+        self.stdout.write('Encoding only:')
+        for label, ms in encoders:
+            self.stdout.write(f'  {label:34} {ms:7.2f}')
+
+        if response.get('Content-Encoding') != 'gzip' or len(json.loads(gzip.decompress(response.content))['data']) != count:
+            raise CommandError('The API response was not a gzipped page of every line')
+        self.stdout.write(self.style.SUCCESS(f'v1 API payload built {hand_ms / projected_ms:.1f}x faster than hand-built'))
@@ -0,0 +1,115 @@
+# qms/management/commands/bench_startup.py
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from qms.models import Department, PatientCareAssignment
+
+URLS = ['/counter/', '/patient-care/', '/manage/', '/register-patient/', '/admin/qms/patient/']
+
+# Runs in a fresh interpreter: loads the WSGI application the way a new
+# worker does, then sends each URL twice through it
+WORKER = '''
+import io, json, os, sys, time
+
+started = time.perf_counter()
+from hospital_qms.wsgi import application
+startup = time.perf_counter() - started
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_COOKIE': os.environ['QMS_BENCH_COOKIE'], 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    statuses = []
+    started = time.perf_counter()
+    body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+    elapsed = time.perf_counter() - started
+    assert statuses[0].startswith('200'), (path, statuses[0], body[:200])
+    return elapsed
+
+urls = json.loads(os.environ['QMS_BENCH_URLS'])
+first = {url: get(url) for url in urls}
+second = {url: get(url) for url in urls}
+print(json.dumps({'startup': startup, 'first': first, 'second': second}))
+'''
+
+class Command(BaseCommand):
+    help = 'Measures worker startup and first-request latency in fresh processes, with and without warm-up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        department = Department.objects.create(name=f'Bench startup {suffix}')
+        user = User.objects.create_superuser(f'bench-startup-{suffix}', password=None)
+        user.groups.add(Group.objects.get_or_create(name='Patient Care')[0])
+        PatientCareAssignment.objects.create(user=user, department=department)
+
+        # A ready session, so the workers don't touch the database before timing
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        env = dict(
+            os.environ,
+            QMS_BENCH_COOKIE=f'{settings.SESSION_COOKIE_NAME}={session.session_key}',
+            QMS_BENCH_URLS=json.dumps(URLS),
+            PYTHONPATH=os.pathsep.join([str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]),
+        )
+        results = {}
+        try:
+            for warmup in ('0', '1'):
+                runs = []
+                for _ in range(options['runs']):
+                    output = subprocess.run(
+                        [sys.executable, '-c', WORKER], env=dict(env, QMS_WARMUP=warmup),
+                        capture_output=True, text=True, check=True,
+                    ).stdout
+                    runs.append(json.loads(output))
+                results[warmup] = runs
+        finally:
+            session.delete()
+            user.delete()
+            department.delete()
+
+        def median_ms(runs, *keys):
+            values = []
+            for run in runs:
+                value = run
+                for key in keys:
+                    value = value[key]
+                values.append(value)
+            return statistics.median(values) * 1000
+
+        self.stdout.write(f"Median of {options['runs']} fresh processes, in ms")
+        self.stdout.write(f"{'':<22} {'no warm-up':>11} {'warm-up':>9}")
+        self.stdout.write(
+            f"{'startup':<22} {median_ms(results['0'], 'startup'):>11.0f} {median_ms(results['1'], 'startup'):>9.0f}"
+        )
+        for url in URLS:
+            self.stdout.write(
+                f"{'first ' + url:<22} {median_ms(results['0'], 'first', url):>11.1f} "
+                f"{median_ms(results['1'], 'first', url):>9.1f}"
+            )
+        for label, runs in (('first requests, total', 'first'), ('second requests, total', 'second')):
+            self.stdout.write(
+                f"{label:<22} "
+                f"{statistics.median(sum(run[runs].values()) for run in results['0']) * 1000:>11.1f} "
+                f"{statistics.median(sum(run[runs].values()) for run in results['1']) * 1000:>9.1f}"
+            )
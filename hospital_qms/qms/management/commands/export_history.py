@@ -0,0 +1,42 @@
+# qms/management/commands/export_history.py
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from qms.exports import EXPORTS, iter_csv, iter_rows
+from qms.routers import replica_reads
+
+class Command(BaseCommand):
+    help = 'Streams patient or queue history to CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--start', help='First registration date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last registration date (YYYY-MM-DD)')
+        parser.add_argument('--department', type=int)
+        parser.add_argument('--status', help='Only queue lines with this status')
+        parser.add_argument('--excel', action='store_true', help='Add a BOM so Excel reads UTF-8')
+        parser.add_argument('--output', help='File to write, defaults to stdout')
+
+    def handle(self, *args, **options):
+        # Only reads, so it can run on the replica
+        with replica_reads():
+            self.export(**options)
+
+    def export(self, **options):
+        rows = iter_rows(
+            options['kind'],
+            start_date=parse_date(options['start'] or ''),
+            end_date=parse_date(options['end'] or ''),
+            department_id=options['department'],
+            status=options['status'],
+        )
+
+        chunks = iter_csv(rows, excel=options['excel'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
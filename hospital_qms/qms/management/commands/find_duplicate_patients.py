@@ -0,0 +1,33 @@
+# qms/management/commands/find_duplicate_patients.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from qms.duplicates import get_threshold, scan_duplicates
+from qms.routers import replica_reads
+
+class Command(BaseCommand):
+    help = 'Lists likely duplicate patient records; merge them with merge_patients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, help='Minimum score, defaults to QMS_DUPLICATE_THRESHOLD')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many pairs')
+
+    def handle(self, *args, **options):
+        # Only reads, so it can run on the replica
+        with replica_reads():
+            self.scan(**options)
+
+    def scan(self, **options):
+        threshold = options['threshold'] or get_threshold()
+        started = time.perf_counter()
+        found = 0
+        for similarity, a, b in scan_duplicates(threshold):
+            self.stdout.write(f"{similarity:.2f}  {a['mrn']} {a['name']} ({a['age']})  {b['mrn']} {b['name']} ({b['age']})")
+            found += 1
+            if found == options['limit']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{found} likely duplicate pairs at score >= {threshold} in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,18 @@
+# qms/management/commands/generate_appointment_slots.py
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from qms.appointments import generate_slots
+
+class Command(BaseCommand):
+    help = 'Generates bookable appointment slots from doctor working days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--days', type=int, default=90)
+
+    def handle(self, *args, **options):
+        start_date = parse_date(options['start'] or '') or timezone.localdate()
+        created = generate_slots(start_date, options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} appointment slots from {start_date}'))
@@ -0,0 +1,24 @@
+# qms/management/commands/merge_patients.py
+
+from django.core.management.base import BaseCommand, CommandError
+from qms.duplicates import merge_patients
+from qms.models import Patient
+
+class Command(BaseCommand):
+    help = 'Merges duplicate patient records into one, moving their queue lines and appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keep', help='MRN of the record to keep')
+        parser.add_argument('duplicates', nargs='+', help='MRNs of the records to merge into it')
+
+    def handle(self, *args, **options):
+        patients = Patient.objects.in_bulk([options['keep'], *options['duplicates']], field_name='mrn')
+        missing = [mrn for mrn in [options['keep'], *options['duplicates']] if mrn not in patients]
+        if missing:
+            raise CommandError('Unknown MRN: ' + ', '.join(missing))
+
+        keep = patients[options['keep']]
+        moved = merge_patients(keep, [patients[mrn] for mrn in options['duplicates']])
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {', '.join(options['duplicates'])} into {keep.mrn}; {moved} queue lines moved"
+        ))
@@ -0,0 +1,102 @@
+# qms/management/commands/plan_capacity.py
+
+import calendar
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from qms.models import Department
+from qms.routers import replica_reads
+
+class Command(BaseCommand):
+    help = 'Simulates candidate optometrist/doctor rosters per weekday from queue history (needs NumPy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', help='Department name; all departments by default')
+        parser.add_argument('--since', help='Only fit history from this date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=30, help='Simulated days per roster and weekday')
+        parser.add_argument('--max-rooms', type=int, default=6, help='Largest number of rooms tried per stage')
+        parser.add_argument('--target-wait', type=float, default=15, help='Mean wait in minutes a roster must meet')
+        parser.add_argument('--show-all', action='store_true', help='Print every roster, not just current and recommended')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        # Only reads, so it can run on the replica
+        with replica_reads():
+            self.plan(**options)
+
+    def plan(self, **options):
+        try:
+            import numpy as np
+            from qms.capacity import STAGES, current_roster, fit_history, simulate_rosters
+        except ImportError as e:
+            raise CommandError(f'plan_capacity needs NumPy ({e})')
+
+        since = parse_date(options['since']) if options['since'] else None
+        departments = Department.objects.order_by('name')
+        if options['department']:
+            departments = departments.filter(name=options['department'])
+            if not departments:
+                raise CommandError(f"Unknown department {options['department']!r}")
+
+        rng = np.random.default_rng(options['seed'])
+        candidates = [
+            (optometrists, doctors)
+            for optometrists in range(1, options['max_rooms'] + 1)
+            for doctors in range(1, options['max_rooms'] + 1)
+        ]
+        started = time.perf_counter()
+        scenarios = 0
+
+        for department in departments:
+            model = fit_history(department, since)
+            if not model.weekdays():
+                self.stdout.write(f'{department.name}: no queue history')
+                continue
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{department.name} (emergency share {model.emergency_share:.0%}, '
+                f'{model.flow:.0%} of optometrist patients continue to the doctor)'
+            ))
+            self.stdout.write(
+                f"{'day':<4} {'':<12} {'rooms':>6} {'opt wait':>9} {'doc wait':>9} "
+                f"{'opt util':>9} {'doc util':>9} {'unserved':>9}"
+            )
+
+            for weekday in model.weekdays():
+                current = current_roster(department, weekday)
+                rosters = candidates + ([current] if current not in candidates else [])
+                results = simulate_rosters(model, weekday, rosters, options['days'], rng)
+                scenarios += len(rosters)
+                by_rooms = {result['rooms']: result for result in results}
+
+                meets_target = [
+                    result for result in results
+                    if all(result[stage]['mean_wait'] <= options['target_wait'] for stage in STAGES)
+                ]
+                recommended = min(meets_target, key=lambda result: (sum(result['rooms']), result['rooms']), default=None)
+
+                rows = [('current', by_rooms[current])]
+                if recommended:
+                    rows.append(('recommended', recommended))
+                if options['show_all']:
+                    rows.extend(('', result) for result in results)
+
+                for label, result in rows:
+                    optometrist, doctor = result['optometrist'], result['doctor']
+                    self.stdout.write(
+                        f"{calendar.day_abbr[weekday - 1]:<4} {label:<12} {'%d/%d' % result['rooms']:>6} "
+                        f"{optometrist['mean_wait']:>9.1f} {doctor['mean_wait']:>9.1f} "
+                        f"{optometrist['utilization']:>9.0%} {doctor['utilization']:>9.0%} "
+                        f"{optometrist['unserved'] + doctor['unserved']:>9.1f}"
+                    )
+                if not recommended:
+                    self.stdout.write(self.style.WARNING(
+                        f"{calendar.day_abbr[weekday - 1]}: no roster up to {options['max_rooms']} rooms "
+                        f"meets a {options['target_wait']:g} min mean wait"
+                    ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Simulated {scenarios} roster scenarios x {options["days"]} days in '
+            f'{time.perf_counter() - started:.1f}s; waits in minutes, unserved patients per day'
+        ))
@@ -0,0 +1,14 @@
+# qms/management/commands/qms_warmup.py
+
+from django.core.management.base import BaseCommand
+from qms.warmup import warm_up
+
+class Command(BaseCommand):
+    help = 'Runs the worker warm-up steps and reports what each one loaded and how long it took'
+
+    def handle(self, *args, **options):
+        total = 0
+        for step, count, seconds in warm_up():
+            self.stdout.write(f"{step:<16} {'failed' if count is None else count:>6} {seconds * 1000:>9.1f} ms")
+            total += seconds
+        self.stdout.write(self.style.SUCCESS(f'Warm-up took {total * 1000:.0f} ms'))
@@ -0,0 +1,79 @@
+# qms/management/commands/qms_worker.py
+
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from qms.jobs import LEASE_SECONDS, Worker, job_stats
+from qms.routers import replica_reads
+
+def run_worker(options):
+    worker = Worker(
+        threads=options['threads'],
+        poll=options['poll'],
+        lease_seconds=options['lease'],
+        burst=options['burst'],
+        batch=options['batch'],
+    )
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    return worker
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (see qms.jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Job threads per process')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--batch', type=int, default=1, help='Jobs each thread claims at once')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls when idle')
+        parser.add_argument('--lease', type=int, default=LEASE_SECONDS,
+                            help='Seconds before a job whose worker vanished is run again')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due')
+        parser.add_argument('--stats', action='store_true', help='Print job metrics and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            with replica_reads():
+                self.print_stats()
+            return
+
+        if options['processes'] > 1:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise CommandError('--processes needs a platform that supports fork')
+            # Children must open their own database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            children = [
+                context.Process(target=run_worker, args=(options,))
+                for _ in range(options['processes'] - 1)
+            ]
+            for child in children:
+                child.start()
+        else:
+            children = []
+
+        worker = run_worker(options)
+        for child in children:
+            child.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker {worker.name}: {worker.succeeded} succeeded, {worker.failed} failed'
+        ))
+
+    def print_stats(self):
+        stats = job_stats()
+        self.stdout.write('Statuses: ' + ', '.join(f'{status} {n}' for status, n in sorted(stats['statuses'].items())))
+        self.stdout.write(f"Oldest due job waiting: {stats['lag_seconds']:.1f}s")
+        self.stdout.write(
+            f"{'job':<28} {'total':>7} {'ok':>7} {'failed':>7} {'retried':>8} {'avg ms':>8} {'max ms':>8}"
+        )
+        for row in stats['jobs']:
+            self.stdout.write(
+                f"{row['name']:<28} {row['total']:>7} {row['succeeded']:>7} {row['failed']:>7} "
+                f"{row['retried']:>8} {row['avg_ms'] or 0:>8.0f} {row['max_ms'] or 0:>8}"
+            )
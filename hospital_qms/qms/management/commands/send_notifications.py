@@ -0,0 +1,56 @@
+# qms/management/commands/send_notifications.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from qms.notifications import claim_within_rate, send_batch
+from qms.senders import get_sender
+
+class Command(BaseCommand):
+    help = 'Sends queued patient notifications in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds to wait when nothing can be sent')
+        parser.add_argument('--rate', type=int, default=None,
+                            help='Messages per minute; defaults to QMS_NOTIFY_RATE_PER_MINUTE')
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due and the rate allows, then exit')
+
+    def handle(self, *args, **options):
+        sender = get_sender()
+        rate = options['rate'] or getattr(settings, 'QMS_NOTIFY_RATE_PER_MINUTE', 120)
+        # Never claim more than the rate allows, or leases run out while we wait.
+        # The rate is shared with the qms.send_notifications job (see
+        # qms.notifications.claim_within_rate).
+        batch_size = max(min(options['batch_size'], rate), 1)
+        seconds_per_message = 60.0 / rate
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                started = time.monotonic()
+                batch = claim_within_rate(batch_size, rate)
+                if not batch:
+                    if options['once']:
+                        break
+                    # Nothing due, or this minute's allowance is used up
+                    time.sleep(options['interval'])
+                    continue
+
+                sent, failed = send_batch(sender, batch)
+                total_sent += sent
+                total_failed += failed
+                if failed:
+                    self.stderr.write(f'{failed} of {len(batch)} notifications failed, will retry')
+
+                # Spread sends so the gateway never sees more than ``rate`` a minute
+                pause = (sent + failed) * seconds_per_message - (time.monotonic() - started)
+                if pause > 0:
+                    time.sleep(pause)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} notifications, {total_failed} failed attempts'))
@@ -0,0 +1,56 @@
+# qms/management/commands/simulate_dispatch.py
+
+import random
+
+from django.core.management.base import BaseCommand
+from qms.simulation import generate_patients, simulate_dispatch, summarize
+
+class Command(BaseCommand):
+    help = 'Compares average wait under shared and doctor-pinned dispatch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=4)
+        parser.add_argument('--hours', type=float, default=8)
+        parser.add_argument('--arrivals-per-hour', type=float, default=20)
+        parser.add_argument('--service-minutes', type=float, default=11)
+        parser.add_argument('--pinned-share', type=float, default=0.3,
+                            help='Fraction of patients who ask for a specific doctor')
+        parser.add_argument('--popular-share', type=float, default=0.5,
+                            help='Fraction of pinned patients who ask for the same doctor')
+        parser.add_argument('--runs', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        doctors = list(range(options['doctors']))
+        totals = {}
+
+        for run in range(options['runs']):
+            for policy in ('shared', 'pinned'):
+                # Same arrivals for both policies; service times come from the
+                # same stream but go to patients in the order each policy serves
+                rng = random.Random(options['seed'] + run)
+                patients = generate_patients(
+                    rng, options['hours'], options['arrivals_per_hour'],
+                    doctors=doctors,
+                    pinned_share=options['pinned_share'],
+                    popular_share=options['popular_share'],
+                )
+                simulate_dispatch(patients, doctors, options['service_minutes'], rng, policy)
+
+                pinned = [p for p in patients if p.doctor is not None]
+                unpinned = [p for p in patients if p.doctor is None]
+                row = totals.setdefault(policy, {'all': [], 'pinned': [], 'unpinned': [], 'p95': []})
+                overall = summarize(patients)
+                row['all'].append(overall['mean_wait'])
+                row['p95'].append(overall['p95_wait'])
+                row['pinned'].append(summarize(pinned)['mean_wait'])
+                row['unpinned'].append(summarize(unpinned)['mean_wait'])
+
+        self.stdout.write(f"{'policy':<8} {'mean wait':>10} {'p95 wait':>10} {'pinned':>10} {'unpinned':>10}")
+        for policy, row in totals.items():
+            mean = {key: sum(values) / len(values) for key, values in row.items()}
+            self.stdout.write(
+                f"{policy:<8} {mean['all']:>10.1f} {mean['p95']:>10.1f} "
+                f"{mean['pinned']:>10.1f} {mean['unpinned']:>10.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS('Waits in minutes, averaged over %d runs' % options['runs']))
@@ -0,0 +1,59 @@
+# qms/management/commands/simulate_overflow.py
+
+import random
+
+from django.core.management.base import BaseCommand
+from qms.simulation import generate_patients, simulate_overflow, summarize
+
+class Command(BaseCommand):
+    help = 'Compares throughput and wait with and without cross-department overflow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=8)
+        parser.add_argument('--busy-per-hour', type=float, default=16,
+                            help='Arrivals per hour in the overloaded department')
+        parser.add_argument('--busy-rooms', type=int, default=2)
+        parser.add_argument('--quiet-per-hour', type=float, default=8,
+                            help='Arrivals per hour in the partner department')
+        parser.add_argument('--quiet-rooms', type=int, default=3)
+        parser.add_argument('--service-minutes', type=float, default=10)
+        parser.add_argument('--max-imbalance', type=int, default=3)
+        parser.add_argument('--runs', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        closing = options['hours'] * 60
+        totals = {}
+
+        for run in range(options['runs']):
+            for label, max_imbalance in (('local', None), ('overflow', options['max_imbalance'])):
+                # Same arrivals and service draws for both policies
+                rng = random.Random(options['seed'] + run)
+                busy = generate_patients(rng, options['hours'], options['busy_per_hour'])
+                quiet = generate_patients(rng, options['hours'], options['quiet_per_hour'])
+                lent = simulate_overflow({
+                    'busy': (busy, options['busy_rooms']),
+                    'quiet': (quiet, options['quiet_rooms']),
+                }, options['service_minutes'], rng, max_imbalance)
+
+                patients = busy + quiet
+                row = totals.setdefault(label, {'throughput': [], 'mean': [], 'p95': [], 'busy_p95': [], 'lent': []})
+                overall = summarize(patients)
+                row['throughput'].append(sum(p.finish <= closing for p in patients) / options['hours'])
+                row['mean'].append(overall['mean_wait'])
+                row['p95'].append(overall['p95_wait'])
+                row['busy_p95'].append(summarize(busy)['p95_wait'])
+                row['lent'].append(lent['quiet'])
+
+        self.stdout.write(
+            f"{'policy':<9} {'served/h':>9} {'mean wait':>10} {'p95 wait':>9} {'busy p95':>9} {'overflowed':>11}"
+        )
+        for label, row in totals.items():
+            mean = {key: sum(values) / len(values) for key, values in row.items()}
+            self.stdout.write(
+                f"{label:<9} {mean['throughput']:>9.1f} {mean['mean']:>10.1f} {mean['p95']:>9.1f} "
+                f"{mean['busy_p95']:>9.1f} {mean['lent']:>11.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Served/h counts patients finished before closing; waits in minutes, averaged over %d runs' % options['runs']
+        ))
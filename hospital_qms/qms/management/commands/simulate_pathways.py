@@ -0,0 +1,61 @@
+# qms/management/commands/simulate_pathways.py
+
+import random
+
+from django.core.management.base import BaseCommand
+from qms.simulation import generate_patients, percentile, simulate_pathway
+
+# Eye clinic stages: (servers, mean minutes). Dilation is simulated as a
+# timed wait while the drops work, not as a queue for a room.
+STAGES = {
+    'refraction': (2, 8),
+    'dilation': (None, 25),
+    'imaging': (1, 6),
+    'doctor': (3, 12),
+    'pharmacy': (1, 4),
+}
+
+SERIAL = {
+    'refraction': [],
+    'dilation': ['refraction'],
+    'imaging': ['dilation'],
+    'doctor': ['imaging'],
+    'pharmacy': ['doctor'],
+}
+
+PARALLEL = {
+    'refraction': [],
+    'dilation': ['refraction'],
+    'imaging': ['refraction'],
+    'doctor': ['dilation', 'imaging'],
+    'pharmacy': ['doctor'],
+}
+
+class Command(BaseCommand):
+    help = 'Compares total visit time for serial and parallel care pathways'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=8)
+        parser.add_argument('--arrivals-per-hour', type=float, default=12)
+        parser.add_argument('--runs', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'pathway':<10} {'mean visit':>11} {'p95 visit':>10}")
+
+        for label, requires in (('serial', SERIAL), ('parallel', PARALLEL)):
+            stages = {
+                name: {'requires': requires[name], 'servers': servers, 'minutes': minutes}
+                for name, (servers, minutes) in STAGES.items()
+            }
+            visits = []
+            for run in range(options['runs']):
+                rng = random.Random(options['seed'] + run)
+                patients = generate_patients(rng, options['hours'], options['arrivals_per_hour'])
+                visits.extend(simulate_pathway(patients, stages, rng).values())
+
+            self.stdout.write(
+                f'{label:<10} {sum(visits) / len(visits):>11.1f} {percentile(visits, 95):>10.1f}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Visit times in minutes, averaged over %d runs' % options['runs']))
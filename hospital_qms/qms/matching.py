@@ -0,0 +1,136 @@
+"""
+Blocking keys and scores for spotting duplicate patients.
+
+Each patient stores three normalized keys: the phone's last ten digits,
+a Soundex code of the first and last name, and an estimated birth year
+(registration year minus age, so it stays put as the patient gets
+older). Candidates are found through these indexed keys and then scored
+field by field; see qms.duplicates.
+"""
+import unicodedata
+from difflib import SequenceMatcher
+
+
+PHONE_DIGITS = 10
+MIN_PHONE_DIGITS = 7
+BIRTH_YEAR_SLACK = 2
+
+TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'master', 'baby', 'smt', 'shri', 'sri'}
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+WEIGHTS = {'name': 0.45, 'phone': 0.2, 'birth_year': 0.15, 'gender': 0.05, 'address': 0.15}
+
+
+def normalize_name(name):
+    """Lowercase ASCII words without titles or punctuation."""
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    name = name.replace("'", '')
+    words = ''.join(c if c.isalpha() else ' ' for c in name).split()
+    return ' '.join(word for word in words if word not in TITLES)
+
+
+def soundex(word):
+    if not word:
+        return ''
+    code = word[0].upper()
+    last = SOUNDEX_CODES.get(word[0], '')
+    for c in word[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w don't separate letters with the same code; vowels do
+        if c not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+def name_key(name):
+    words = normalize_name(name).split()
+    if not words:
+        return ''
+    if len(words) == 1:
+        return soundex(words[0])
+    return soundex(words[0]) + soundex(words[-1])
+
+
+def phone_key(phone):
+    digits = ''.join(c for c in phone or '' if c.isdigit())
+    # Too short to tell people apart (extensions, placeholders like "0")
+    if len(digits) < MIN_PHONE_DIGITS:
+        return ''
+    return digits[-PHONE_DIGITS:]
+
+
+def birth_year(age, year):
+    if age is None:
+        return None
+    return year - age
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def prepare(patient):
+    """
+    Copy of a patient dict with the normalized text ``score`` compares.
+
+    Prepare each patient once; a scan compares it with many others.
+    """
+    name = normalize_name(patient['name'])
+    address = ''.join(c if c.isalnum() else ' ' for c in (patient['address'] or '').lower())
+    return {
+        **patient,
+        'name_words': name,
+        # Word order varies between registrations ("Kumar Ravi")
+        'name_sorted': ' '.join(sorted(name.split())),
+        'address_words': frozenset(address.split()),
+    }
+
+
+def score(a, b, threshold=0.0):
+    """
+    Similarity of two prepared patients between 0 and 1.
+
+    ``a`` and ``b`` come from ``prepare`` on dicts with 'name',
+    'phone_key', 'birth_year', 'gender' and 'address'. With a
+    ``threshold``, pairs that can't reach it skip the name comparison
+    and score lower than it.
+    """
+    phone = 1.0 if a['phone_key'] and a['phone_key'] == b['phone_key'] else 0.0
+    if a['birth_year'] is None or b['birth_year'] is None:
+        birth = 0.0
+    else:
+        # Ages entered a few months apart can differ by one
+        birth = max(0.0, 1 - max(0, abs(a['birth_year'] - b['birth_year']) - 1) / BIRTH_YEAR_SLACK)
+    gender = 1.0 if a['gender'] == b['gender'] else 0.0
+    # House numbers and street words matter more than shared spelling
+    words_a, words_b = a['address_words'], b['address_words']
+    address = len(words_a & words_b) / len(words_a | words_b) if words_a and words_b else 0.0
+
+    total = (
+        WEIGHTS['phone'] * phone
+        + WEIGHTS['birth_year'] * birth
+        + WEIGHTS['gender'] * gender
+        + WEIGHTS['address'] * address
+    )
+    # Rounded so weights that add up to the threshold reach it
+    if round(total + WEIGHTS['name'], 3) < threshold:
+        return round(total, 3)
+
+    name = _similarity(a['name_words'], b['name_words'])
+    if name < 1 and (a['name_sorted'] != a['name_words'] or b['name_sorted'] != b['name_words']):
+        name = max(name, _similarity(a['name_sorted'], b['name_sorted']))
+    return round(total + WEIGHTS['name'] * name, 3)
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_patient_fields(apps, schema_editor):
+    Patient = apps.get_model('qms', 'Patient')
+    PatientLine = apps.get_model('qms', 'PatientLine')
+
+    PatientLine.objects.update(department=Subquery(
+        Patient.objects.filter(pk=OuterRef('patient_id')).values('department_id')[:1]
+    ))
+    # Pin open lines whose queue matches the role of the doctor the patient chose
+    PatientLine.objects.exclude(status='completed').update(doctor=Subquery(
+        Patient.objects.filter(
+            pk=OuterRef('patient_id'),
+            doctor__role=OuterRef('queue_type'),
+        ).values('doctor_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientline',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='qms.department'),
+        ),
+        migrations.AddField(
+            model_name='patientline',
+            name='doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pinned_lines', to='qms.doctor'),
+        ),
+        migrations.AddIndex(
+            model_name='patientline',
+            index=models.Index(fields=['department', 'queue_type', 'status', 'order_index'], name='qms_line_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientline',
+            index=models.Index(fields=['doctor', 'status'], name='qms_line_doctor_idx'),
+        ),
+        migrations.RunPython(copy_patient_fields, migrations.RunPython.noop),
+    ]
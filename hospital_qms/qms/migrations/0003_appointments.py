@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0002_doctor_pinned_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room', models.CharField(max_length=5)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('capacity', models.PositiveSmallIntegerField(default=1)),
+                ('available', models.PositiveSmallIntegerField(default=1)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.department')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='qms.doctor')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('booked', 'Booked'), ('checked_in', 'Checked In'), ('cancelled', 'Cancelled')], default='booked', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.patient')),
+                ('patient_line', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='qms.patientline')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.appointmentslot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AvailabilityDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.department')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.doctor')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointmentslot',
+            index=models.Index(fields=['date', 'department', 'available'], name='qms_slot_search_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentslot',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'start_time'), name='qms_slot_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='availabilityday',
+            index=models.Index(fields=['date', 'department'], name='qms_availability_search_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='availabilityday',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date'), name='qms_availability_day_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0003_appointments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Kiosk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('token', models.CharField(editable=False, max_length=64, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KioskCheckIn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('kiosk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.kiosk')),
+                ('patient_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='qms.patientline')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kiosk', 'idempotency_key'), name='qms_kiosk_checkin_unique')],
+            },
+        ),
+    ]
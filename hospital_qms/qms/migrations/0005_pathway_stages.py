@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0004_kiosk'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctor',
+            name='role',
+            field=models.CharField(choices=[('doctor', 'Doctor'), ('optometrist', 'Optometrist'), ('refraction', 'Refraction'), ('dilation', 'Dilation'), ('imaging', 'Imaging'), ('pharmacy', 'Pharmacy')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='patientline',
+            name='queue_type',
+            field=models.CharField(choices=[('optometrist', 'Optometrist'), ('doctor', 'Doctor'), ('refraction', 'Refraction'), ('dilation', 'Dilation'), ('imaging', 'Imaging'), ('pharmacy', 'Pharmacy')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PathwayStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue_type', models.CharField(choices=[('optometrist', 'Optometrist'), ('doctor', 'Doctor'), ('refraction', 'Refraction'), ('dilation', 'Dilation'), ('imaging', 'Imaging'), ('pharmacy', 'Pharmacy')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('order', models.PositiveSmallIntegerField(default=0, help_text='Column order on the dashboard')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pathway_stages', to='qms.department')),
+                ('requires', models.ManyToManyField(blank=True, related_name='unlocks', to='qms.pathwaystage')),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('department', 'queue_type'), name='qms_pathway_stage_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_room_department(apps, schema_editor):
+    PatientLine = apps.get_model('qms', 'PatientLine')
+
+    # Until now every room belonged to the patient's own department
+    PatientLine.objects.exclude(room='').update(room_department=F('department'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0005_pathway_stages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientline',
+            name='room_department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hosted_lines', to='qms.department'),
+        ),
+        migrations.AddIndex(
+            model_name='patientline',
+            index=models.Index(fields=['room_department', 'queue_type', 'status'], name='qms_line_room_idx'),
+        ),
+        migrations.RunPython(copy_room_department, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0006_overflow_rooms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientline',
+            name='called_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='patientline',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='patientline',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0007_line_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('approaching', 'Approaching'), ('called', 'Called')], max_length=20)),
+                ('phone', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('dedupe_key', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('patient_line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='qms.patientline')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='qms_notification_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:22
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Copies of the qms.matching keys as they were when this migration was
+# written; migrations must not change with the app code
+TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'master', 'baby', 'smt', 'shri', 'sri'}
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(word):
+    if not word:
+        return ''
+    code = word[0].upper()
+    last = SOUNDEX_CODES.get(word[0], '')
+    for c in word[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+def name_key(name):
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    name = name.replace("'", '')
+    words = [word for word in ''.join(c if c.isalpha() else ' ' for c in name).split() if word not in TITLES]
+    if not words:
+        return ''
+    if len(words) == 1:
+        return soundex(words[0])
+    return soundex(words[0]) + soundex(words[-1])
+
+
+def phone_key(phone):
+    digits = ''.join(c for c in phone or '' if c.isdigit())
+    if len(digits) < 7:
+        return ''
+    return digits[-10:]
+
+
+def birth_year(age, year):
+    if age is None:
+        return None
+    return year - age
+
+
+def fill_match_keys(apps, schema_editor):
+    Patient = apps.get_model('qms', 'Patient')
+
+    batch = []
+    for patient in Patient.objects.only('name', 'phone', 'age', 'created_at').iterator(chunk_size=2000):
+        patient.phone_key = phone_key(patient.phone)
+        patient.name_key = name_key(patient.name)
+        # Ages were entered at registration
+        patient.birth_year = birth_year(patient.age, patient.created_at.year)
+        batch.append(patient)
+        if len(batch) == 2000:
+            Patient.objects.bulk_update(batch, ['phone_key', 'name_key', 'birth_year'])
+            batch = []
+    Patient.objects.bulk_update(batch, ['phone_key', 'name_key', 'birth_year'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0009_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='birth_year',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='phone_key',
+            field=models.CharField(blank=True, editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['phone_key'], name='qms_patient_phone_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['name_key', 'birth_year'], name='qms_patient_name_key_idx'),
+        ),
+        migrations.RunPython(fill_match_keys, migrations.RunPython.noop),
+    ]
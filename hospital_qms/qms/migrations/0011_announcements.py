@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0010_patient_match_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Announcement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area', models.CharField(max_length=20)),
+                ('token', models.PositiveIntegerField()),
+                ('room', models.CharField(max_length=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient_line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcements', to='qms.patientline')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['area', 'id'], name='qms_announcement_area_idx')],
+            },
+        ),
+    ]
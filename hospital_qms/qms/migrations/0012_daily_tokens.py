@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+import string
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_token_prefixes(apps, schema_editor):
+    Department = apps.get_model('qms', 'Department')
+
+    # The first letter of the name; a copy, so later changes to
+    # qms.tokens.default_prefix do not change what this migration does
+    for department in Department.objects.filter(token_prefix=''):
+        letters = [c.upper() for c in department.name if c in string.ascii_letters] or ['T']
+        department.token_prefix = letters[0]
+        department.save(update_fields=['token_prefix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0011_announcements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('last', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='token_prefix',
+            field=models.CharField(blank=True, help_text='Letters before daily token numbers, e.g. R for R-17; defaults to the first letter of the name', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='patientline',
+            name='token_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='patientline',
+            name='token_number',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='announcement',
+            name='token',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='patientline',
+            index=models.Index(fields=['department', 'token_date', 'token_number'], name='qms_line_token_idx'),
+        ),
+        migrations.AddField(
+            model_name='tokencounter',
+            name='department',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='qms.department'),
+        ),
+        migrations.AddConstraint(
+            model_name='tokencounter',
+            constraint=models.UniqueConstraint(fields=('department', 'date'), name='qms_token_counter_unique'),
+        ),
+        migrations.RunPython(fill_token_prefixes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:46
+
+import django.core.validators
+import itertools
+import re
+import string
+from django.db import migrations, models
+
+# Copies of qms.tokens.PREFIX_PATTERN and default_prefix as they were when
+# this migration was written; migrations must not change with the app code
+PREFIX_PATTERN = re.compile(r'^[A-Za-z]{1,3}$')
+
+
+def default_prefix(name, taken=()):
+    letters = [c.upper() for c in name if c in string.ascii_letters] or ['T']
+    first, rest = letters[0], letters[1:]
+    candidates = itertools.chain(
+        [first],
+        (first + c for c in rest),
+        (first + a + b for a, b in itertools.combinations(rest, 2)),
+        (first + c for c in string.ascii_uppercase),
+        (first + a + b for a, b in itertools.product(string.ascii_uppercase, repeat=2)),
+    )
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate
+    raise ValueError(f'No free token prefix for {name!r}')
+
+
+def dedupe_token_prefixes(apps, schema_editor):
+    Department = apps.get_model('qms', 'Department')
+
+    # The oldest department keeps a shared prefix; the others get a free one
+    taken = set()
+    for department in Department.objects.order_by('id'):
+        prefix = department.token_prefix.upper()
+        if not PREFIX_PATTERN.match(prefix) or prefix in taken:
+            prefix = default_prefix(department.name, taken)
+        if prefix != department.token_prefix:
+            department.token_prefix = prefix
+            department.save(update_fields=['token_prefix'])
+        taken.add(prefix)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qms', '0012_daily_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_token_prefixes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='department',
+            name='token_prefix',
+            field=models.CharField(blank=True, help_text='Letters before daily token numbers, e.g. R for R-17; defaults to the first letter of the name not used by another department', max_length=3, validators=[django.core.validators.RegexValidator(re.compile('^[A-Za-z]{1,3}$'), 'Use one to three letters.')]),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(condition=models.Q(('token_prefix', ''), _negated=True), fields=('token_prefix',), name='qms_department_prefix_unique'),
+        ),
+    ]
@@ -1,18 +1,47 @@
-from django.db import models
+from django.core.validators import RegexValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 import datetime
+import secrets
+
+from .matching import birth_year, name_key, phone_key
+from .tokens import PREFIX_PATTERN, default_prefix, format_token, hospital_date, numbering_atomic
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    token_prefix = models.CharField(
+        max_length=3,
+        blank=True,
+        validators=[RegexValidator(PREFIX_PATTERN, "Use one to three letters.")],
+        help_text="Letters before daily token numbers, e.g. R for R-17; defaults to the first letter of the name not used by another department"
+    )
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token_prefix'], condition=~Q(token_prefix=''), name='qms_department_prefix_unique'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        self.token_prefix = self.token_prefix.upper()
+        if not self.token_prefix:
+            taken = Department.objects.exclude(pk=self.pk).values_list('token_prefix', flat=True)
+            self.token_prefix = default_prefix(self.name, set(taken))
+        
+        super().save(*args, **kwargs)
 
 class Doctor(models.Model):
     ROLE_CHOICES = [
         ('doctor', 'Doctor'),
         ('optometrist', 'Optometrist'),
+        ('refraction', 'Refraction'),
+        ('dilation', 'Dilation'),
+        ('imaging', 'Imaging'),
+        ('pharmacy', 'Pharmacy'),
     ]
     
     ROOM_CHOICES = [
@@ -26,8 +55,28 @@ class Doctor(models.Model):
     room = models.CharField(max_length=5, choices=ROOM_CHOICES)
     days = models.CharField(max_length=20, help_text="e.g., Mon,Tue,Wed")
     
+    # The queue the doctor was in when loaded, for receivers of a move
+    loaded_department_id = None
+    loaded_role = None
+    
     def __str__(self):
         return f"{self.name} ({self.get_role_display()})"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.loaded_department_id = self.department_id
+        self.loaded_role = self.role
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_department_id = instance.__dict__.get('department_id')
+        instance.loaded_role = instance.__dict__.get('role')
+        return instance
+    
+    def works_on(self, date):
+        day = date.strftime('%a')
+        return day in [d.strip() for d in self.days.split(',')]
 
 class Patient(models.Model):
     GENDER_CHOICES = [
@@ -47,24 +96,52 @@ class Patient(models.Model):
     emergency = models.BooleanField(default=False)
     doctor = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Duplicate detection blocking keys, derived from the fields above (see qms.matching)
+    phone_key = models.CharField(max_length=10, blank=True, editable=False)
+    name_key = models.CharField(max_length=8, blank=True, editable=False)
+    birth_year = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    
+    loaded_age = None
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['phone_key'], name='qms_patient_phone_key_idx'),
+            models.Index(fields=['name_key', 'birth_year'], name='qms_patient_name_key_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.mrn})"
     
     def save(self, *args, **kwargs):
+        self.phone_key = phone_key(self.phone)
+        self.name_key = name_key(self.name)
+        # Age is as of when it was entered, so only a new age moves the birth year
+        if self.birth_year is None or self.age != self.loaded_age:
+            self.birth_year = birth_year(self.age, timezone.now().year)
+        
         if not self.mrn:
-            current_year = datetime.datetime.now().year
-            last_patient = Patient.objects.filter(mrn__startswith=f"MRN-{current_year}-").order_by('-mrn').first()
-            
-            if last_patient:
-                last_number = int(last_patient.mrn.split('-')[-1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            # The last MRN is read in the transaction that takes the next one
+            with numbering_atomic():
+                current_year = datetime.datetime.now().year
+                last_patient = Patient.objects.filter(mrn__startswith=f"MRN-{current_year}-").order_by('-mrn').first()
                 
-            self.mrn = f"MRN-{current_year}-{new_number:04d}"
-        
-        super().save(*args, **kwargs)
+                if last_patient:
+                    last_number = int(last_patient.mrn.split('-')[-1])
+                    new_number = last_number + 1
+                else:
+                    new_number = 1
+                    
+                self.mrn = f"MRN-{current_year}-{new_number:04d}"
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self.loaded_age = self.age
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_age = instance.__dict__.get('age')
+        return instance
 
 class PatientCareAssignment(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -74,9 +151,14 @@ class PatientCareAssignment(models.Model):
         return f"{self.user.username} - {self.department.name}"
 
 class PatientLine(models.Model):
+    # One queue per care stage; rooms come from doctors with the same role
     QUEUE_TYPE_CHOICES = [
         ('optometrist', 'Optometrist'),
         ('doctor', 'Doctor'),
+        ('refraction', 'Refraction'),
+        ('dilation', 'Dilation'),
+        ('imaging', 'Imaging'),
+        ('pharmacy', 'Pharmacy'),
     ]
     
     STATUS_CHOICES = [
@@ -88,15 +170,338 @@ class PatientLine(models.Model):
     ]
     
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    # Copied from the patient so queue lookups don't need to join Patient
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True)
+    # Set when the patient chose a specific doctor for this queue
+    doctor = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, blank=True, related_name='pinned_lines')
     queue_type = models.CharField(max_length=20, choices=QUEUE_TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
     room = models.CharField(max_length=5, blank=True)
+    # Department that owns ``room``; differs from ``department`` when the
+    # patient overflowed to an idle room elsewhere
+    room_department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='hosted_lines')
     order_index = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Stage timestamps, used to fit service times for capacity planning
+    called_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Daily token per department, issued when the line is created (see qms.tokens)
+    token_number = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    token_date = models.DateField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['order_index', 'created_at']
+        indexes = [
+            models.Index(fields=['department', 'token_date', 'token_number'], name='qms_line_token_idx'),
+            models.Index(fields=['department', 'queue_type', 'status', 'order_index'], name='qms_line_queue_idx'),
+            models.Index(fields=['doctor', 'status'], name='qms_line_doctor_idx'),
+            models.Index(fields=['room_department', 'queue_type', 'status'], name='qms_line_room_idx'),
+        ]
+    
+    loaded_status = None
+    
+    def __str__(self):
+        return f"{self.patient.name} - {self.get_queue_type_display()} - {self.get_status_display()}"
+    
+    def save(self, *args, **kwargs):
+        if not self.department_id and self.patient_id:
+            self.department_id = self.patient.department_id
+        if self.room and not self.room_department_id:
+            self.room_department_id = self.department_id
+        
+        # post_save receivers read loaded_status to see what changed
+        if self._state.adding and self.token_number is None and self.department_id:
+            # The number is only used if the line is saved, so the day's tokens have no gaps
+            with numbering_atomic():
+                self.assign_token()
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self.loaded_status = self.status
+    
+    def assign_token(self):
+        day = hospital_date()
+        # Later stages of the same visit keep the patient's token
+        same_visit = PatientLine.objects.filter(
+            patient_id=self.patient_id,
+            department_id=self.department_id,
+            token_date=day,
+            token_number__isnull=False
+        ).values_list('token_number', flat=True).first()
+        self.token_date = day
+        self.token_number = same_visit or TokenCounter.next_number(self.department_id, day)
+    
+    @property
+    def token(self):
+        if self.token_number is None:
+            return ''
+        # Dashboards load the department with the line; elsewhere the cached list saves a query
+        if PatientLine.department.is_cached(self):
+            department = self.department
+        else:
+            from .reference import get_department
+            department = get_department(self.department_id)
+        return format_token(department.token_prefix if department else 'T', self.token_number)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_status = instance.__dict__.get('status')
+        return instance
+
+
+class TokenCounter(models.Model):
+    """Last token number a department issued on a day."""
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    date = models.DateField()
+    last = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'date'], name='qms_token_counter_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.department.name} - {self.date} ({self.last})"
+    
+    @classmethod
+    def next_number(cls, department_id, date):
+        """
+        Take the next number; call it inside the transaction that uses it.
+        
+        The increment locks the counter row until that transaction ends, so
+        concurrent registrations wait for each other instead of reading the
+        same number, and a rollback gives the number back.
+        """
+        counter = cls.objects.filter(department_id=department_id, date=date)
+        if not counter.update(last=F('last') + 1):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(department_id=department_id, date=date, last=1)
+                return 1
+            except IntegrityError:
+                # Another registration opened the day first
+                counter.update(last=F('last') + 1)
+        return counter.values_list('last', flat=True).get()
+
+
+class PathwayStage(models.Model):
+    """
+    One stage of a department's care pathway.
+
+    Stages form a DAG through ``requires``. Departments without stages
+    use the default optometrist -> doctor pathway.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='pathway_stages')
+    queue_type = models.CharField(max_length=20, choices=PatientLine.QUEUE_TYPE_CHOICES)
+    name = models.CharField(max_length=100)
+    requires = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='unlocks')
+    order = models.PositiveSmallIntegerField(default=0, help_text="Column order on the dashboard")
+    
+    class Meta:
+        ordering = ['order', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'queue_type'], name='qms_pathway_stage_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.department.name} - {self.name}"
+
+
+class AppointmentSlot(models.Model):
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slots')
+    # Copied from the doctor so availability searches stay on one table
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    room = models.CharField(max_length=5)
+    date = models.DateField()
+    start_time = models.TimeField()
+    capacity = models.PositiveSmallIntegerField(default=1)
+    # Kept in step with bookings so searches never count appointments
+    available = models.PositiveSmallIntegerField(default=1)
+    
+    class Meta:
+        ordering = ['date', 'start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date', 'start_time'], name='qms_slot_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'department', 'available'], name='qms_slot_search_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor.name} - {self.date} {self.start_time:%H:%M}"
+
+
+class AvailabilityDay(models.Model):
+    """Free appointment count per doctor and day, maintained with the slots."""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    date = models.DateField()
+    free = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date'], name='qms_availability_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'department'], name='qms_availability_search_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor.name} - {self.date} ({self.free} free)"
+
+
+class Appointment(models.Model):
+    STATUS_CHOICES = [
+        ('booked', 'Booked'),
+        ('checked_in', 'Checked In'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    slot = models.ForeignKey(AppointmentSlot, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='booked')
+    patient_line = models.OneToOneField(PatientLine, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.patient.name} - {self.slot}"
+
+
+class Kiosk(models.Model):
+    name = models.CharField(max_length=100)
+    token = models.CharField(max_length=64, unique=True, editable=False)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        if not self.token:
+            self.token = secrets.token_urlsafe(32)
+        
+        super().save(*args, **kwargs)
+
+
+class KioskCheckIn(models.Model):
+    kiosk = models.ForeignKey(Kiosk, on_delete=models.CASCADE)
+    # Generated on the kiosk, so a retried batch maps back to the same check-in
+    idempotency_key = models.CharField(max_length=64)
+    patient_line = models.ForeignKey(PatientLine, on_delete=models.SET_NULL, null=True, blank=True)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kiosk', 'idempotency_key'], name='qms_kiosk_checkin_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kiosk.name} - {self.idempotency_key}"
+
+
+class Notification(models.Model):
+    """
+    Outbox of patient text messages.
+
+    Rows are written in the same transaction as the queue change that
+    caused them and sent later by ``manage.py send_notifications``.
+    """
+    KIND_CHOICES = [
+        ('approaching', 'Approaching'),
+        ('called', 'Called'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    
+    patient_line = models.ForeignKey(PatientLine, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    # One message per line and event, however often the trigger fires
+    dedupe_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Retry time for pending rows, lease expiry for rows being sent
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='qms_notification_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.phone} - {self.get_kind_display()} - {self.get_status_display()}"
+
+
+class Job(models.Model):
+    """
+    Deferred work for ``manage.py qms_worker``; see qms.jobs.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Set for recurring runs so only one worker enqueues each run
+    unique_key = models.CharField(max_length=150, unique=True, null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-priority', 'run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='qms_job_due_idx'),
+            models.Index(fields=['status', 'locked_until'], name='qms_job_lease_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.id} - {self.get_status_display()}"
+
+
+class Announcement(models.Model):
+    """
+    A patient call to be spoken in a waiting area; see qms.announcements.
+    """
+    area = models.CharField(max_length=20)
+    patient_line = models.ForeignKey(PatientLine, on_delete=models.CASCADE, related_name='announcements')
+    token = models.CharField(max_length=10)
+    room = models.CharField(max_length=5)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['area', 'id'], name='qms_announcement_area_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.patient.name} - {self.get_queue_type_display()} - {self.get_status_display()}"
\ No newline at end of file
+        return f"{self.area} - Token {self.token}, room {self.room}"
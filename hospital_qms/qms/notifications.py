@@ -0,0 +1,193 @@
+"""
+Patient notifications through a transactional outbox.
+
+Queue changes never talk to the SMS gateway. The PatientLine post_save
+receiver calls ``line_changed``, which writes Notification rows in the
+same transaction, and ``manage.py send_notifications`` or the
+``qms.send_notifications`` job drains them. Both take their messages from
+one QMS_NOTIFY_RATE_PER_MINUTE allowance, counted in the default cache,
+which must be a shared backend when they run in several processes.
+
+Position triggers are incremental: a line leaving the waiting list moves
+exactly one patient to the threshold position, so only that row is read,
+and a line joining the waiting list only checks its own position.
+Changes made with ``QuerySet.update()`` skip the receiver and send
+nothing.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification, PatientLine
+
+
+LEASE_SECONDS = 300
+RATE_WINDOW_SECONDS = 60
+
+
+# ---------------------------------------------------------
+# TRIGGERS
+# ---------------------------------------------------------
+
+def _waiting_queue(line):
+    return PatientLine.objects.filter(
+        department_id=line.department_id,
+        queue_type=line.queue_type,
+        status='waiting'
+    ).order_by('order_index', 'created_at')
+
+
+def _queue_notification(line, kind, dedupe_key, message):
+    if not line.patient.phone:
+        return
+    # ignore_conflicts keeps a duplicate from aborting the surrounding transaction
+    Notification.objects.bulk_create([Notification(
+        patient_line=line,
+        kind=kind,
+        phone=line.patient.phone,
+        message=message,
+        dedupe_key=dedupe_key,
+    )], ignore_conflicts=True)
+
+
+def notify_approaching(line, position):
+    _queue_notification(
+        line, 'approaching', f'line:{line.id}:approaching',
+        f'{line.patient.name}, you are number {position} in the '
+        f'{line.get_queue_type_display().lower()} queue. Please stay close by.'
+    )
+
+
+def notify_called(line):
+    called_at = line.called_at or timezone.now()
+    _queue_notification(
+        line, 'called', f'line:{line.id}:called:{called_at:%Y%m%d%H%M%S%f}',
+        f'{line.patient.name}, please go to room {line.room} now.'
+    )
+
+
+def line_changed(line, previous_status, deleted=False):
+    status = None if deleted else line.status
+    if status == previous_status:
+        return
+
+    if status == 'calling':
+        notify_called(line)
+
+    position = getattr(settings, 'QMS_NOTIFY_POSITION', 3)
+    if not position:
+        return
+
+    if previous_status == 'waiting':
+        # Everyone behind moved up one place; one patient reached the threshold
+        reached = _waiting_queue(line).select_related('patient')[position - 1:position].first()
+        if reached:
+            notify_approaching(reached, position)
+    elif status == 'waiting':
+        ahead = _waiting_queue(line).filter(
+            Q(order_index__lt=line.order_index) |
+            Q(order_index=line.order_index, created_at__lt=line.created_at)
+        )[:position].count()
+        if ahead < position:
+            notify_approaching(line, ahead + 1)
+
+
+# ---------------------------------------------------------
+# DELIVERY
+# ---------------------------------------------------------
+
+def due_notifications(now=None):
+    """Pending rows whose retry time has come and rows whose lease ran out."""
+    return Notification.objects.filter(status__in=['pending', 'sending'], next_attempt_at__lte=now or timezone.now())
+
+
+def claim_batch(size):
+    """
+    Lease up to ``size`` due notifications to this worker.
+
+    Claimed rows are marked ``sending`` with a lease; rows whose lease ran
+    out (a worker died mid-batch) become due again.
+    """
+    if size <= 0:
+        return []
+    now = timezone.now()
+    lease = now + datetime.timedelta(seconds=LEASE_SECONDS)
+    due = due_notifications(now)
+
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:size])
+    # Conditional update, so rows another worker claimed meanwhile are skipped
+    due.filter(id__in=ids).update(status='sending', next_attempt_at=lease)
+    return list(Notification.objects.filter(
+        id__in=ids, status='sending', next_attempt_at=lease
+    ).select_related('patient_line'))
+
+
+def claim_within_rate(size, rate=None):
+    """
+    ``claim_batch`` for at most what is left of this minute's allowance
+    of ``rate`` messages (QMS_NOTIFY_RATE_PER_MINUTE by default).
+
+    The count is kept in the cache, so every sender shares it. Messages
+    are counted when claimed, whether or not the gateway takes them.
+    """
+    rate = rate or getattr(settings, 'QMS_NOTIFY_RATE_PER_MINUTE', 120)
+    key = f'qms:notify:sent:{int(timezone.now().timestamp()) // RATE_WINDOW_SECONDS}'
+    # Reserve first, so two senders cannot both see the same room left
+    cache.add(key, 0, RATE_WINDOW_SECONDS * 2)
+    try:
+        used = cache.incr(key, size)
+    except ValueError:
+        # Evicted since the add
+        cache.set(key, size, RATE_WINDOW_SECONDS * 2)
+        used = size
+    batch = claim_batch(min(size, rate - (used - size)))
+    if len(batch) < size:
+        # Give back what this claim did not use
+        cache.decr(key, size - len(batch))
+    return batch
+
+
+def send_batch(sender, notifications):
+    """
+    Send claimed ``notifications`` and record the outcome.
+
+    "Approaching" messages for patients who were already called are
+    dropped. Failures are retried with exponential backoff until
+    QMS_NOTIFY_MAX_ATTEMPTS. Returns ``(sent, failed)``.
+    """
+    max_attempts = getattr(settings, 'QMS_NOTIFY_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+
+    stale = [n.id for n in notifications if n.kind == 'approaching' and n.patient_line.status != 'waiting']
+    Notification.objects.filter(id__in=stale).update(status='skipped')
+    notifications = [n for n in notifications if n.id not in stale]
+    if not notifications:
+        return 0, 0
+
+    try:
+        errors = sender.send_messages(notifications)
+    except Exception as e:
+        errors = [f'{type(e).__name__}: {e}'] * len(notifications)
+
+    sent = [n.id for n, error in zip(notifications, errors) if error is None]
+    Notification.objects.filter(id__in=sent).update(
+        status='sent', sent_at=now, attempts=F('attempts') + 1, last_error=''
+    )
+
+    failed = 0
+    for notification, error in zip(notifications, errors):
+        if error is None:
+            continue
+        failed += 1
+        attempts = notification.attempts + 1
+        Notification.objects.filter(id=notification.id).update(
+            status='failed' if attempts >= max_attempts else 'pending',
+            attempts=attempts,
+            last_error=error,
+            next_attempt_at=now + datetime.timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600)),
+        )
+
+    return len(sent), failed
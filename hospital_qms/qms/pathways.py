@@ -0,0 +1,126 @@
+"""
+Care pathways: which queues a visit goes through, and in what order.
+
+A pathway maps each stage (a queue type) to the stages it requires.
+Finishing a stage enqueues every stage it unlocks whose requirements are
+done, all in one transaction, so independent stages run in parallel.
+A requirement is done when the current visit has a completed line for
+it, or when the visit cannot reach it: patients who entered mid-pathway
+(e.g. straight to their chosen doctor) are not sent back to earlier
+stages.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import PathwayStage, Patient, PatientLine
+from .queues import enqueue_patient
+from .tokens import numbering_atomic
+
+
+DEFAULT_PATHWAY = {
+    'optometrist': set(),
+    'doctor': {'optometrist'},
+}
+
+PATHWAY_CACHE_SECONDS = 600
+
+
+def _cache_key(department_id):
+    return f'qms:pathway:{department_id}'
+
+
+def get_pathway(department_id):
+    """Return ``{queue_type: set(required queue types)}`` in dashboard order."""
+    key = _cache_key(department_id)
+    pathway = cache.get(key)
+    if pathway is None:
+        stages = PathwayStage.objects.filter(department_id=department_id).prefetch_related('requires')
+        pathway = {stage.queue_type: {required.queue_type for required in stage.requires.all()} for stage in stages}
+        cache.set(key, pathway, PATHWAY_CACHE_SECONDS)
+    return pathway or DEFAULT_PATHWAY
+
+
+def invalidate_pathway(department_id):
+    cache.delete(_cache_key(department_id))
+
+
+def entry_stages(pathway):
+    return [stage for stage, requires in pathway.items() if not requires]
+
+
+def initial_queue_types(patient):
+    """Queues a new visit starts in: the chosen doctor's role, else the pathway's entry stages."""
+    if patient.doctor:
+        return [patient.doctor.role]
+    return entry_stages(get_pathway(patient.department_id)) or ['optometrist']
+
+
+def reachable_stages(pathway, stages):
+    """``stages`` and every stage that can follow them."""
+    reachable = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage in reachable:
+            continue
+        reachable.add(stage)
+        pending.extend(later for later, requires in pathway.items() if stage in requires)
+    return reachable
+
+
+def unlocked_stages(pathway, finished, lines):
+    """
+    Stages to enqueue after ``finished`` completes.
+
+    ``lines`` maps the queue types of the visit to their status. A stage
+    is unlocked when it requires ``finished``, the visit has no line for
+    it yet, and each of its other requirements has a completed line or
+    cannot be reached from the stages the visit went through.
+    """
+    reachable = reachable_stages(pathway, lines)
+    stages = []
+    for stage, requires in pathway.items():
+        if finished not in requires or stage in lines:
+            continue
+        if any(lines.get(required) != 'completed' and required in reachable for required in requires):
+            continue
+        stages.append(stage)
+    return stages
+
+
+def visit_lines(line):
+    """
+    The lines of the visit ``line`` belongs to: the patient's lines in the
+    same department on the same token day, so stages finished on earlier
+    visits don't count.
+    """
+    lines = PatientLine.objects.filter(patient_id=line.patient_id, department_id=line.department_id)
+    if line.token_date:
+        return lines.filter(token_date=line.token_date)
+    # Lines made with bulk_create have no daily token
+    return lines.filter(created_at__date=timezone.localtime(line.created_at).date())
+
+
+def complete_stage(line):
+    """Complete ``line`` and enqueue the stages it unlocks; returns the new lines."""
+    # Stages of one patient finishing at once take turns, or each would see
+    # the other still open and neither would enqueue the stage they both
+    # unlock. SQLite has no row locks; the transaction starts with its
+    # write lock instead.
+    with numbering_atomic():
+        Patient.objects.select_for_update().values_list('id', flat=True).get(pk=line.patient_id)
+        line.status = 'completed'
+        line.completed_at = timezone.now()
+        line.save()
+
+        lines = {}
+        for queue_type, status in visit_lines(line).values_list('queue_type', 'status'):
+            # One open line is enough to keep a stage open
+            if status != 'completed' or queue_type not in lines:
+                lines[queue_type] = status
+
+        pathway = get_pathway(line.department_id)
+        return [
+            enqueue_patient(line.patient, stage)
+            for stage in unlocked_stages(pathway, line.queue_type, lines)
+        ]
@@ -0,0 +1,289 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .cache import queue_version
+from .models import Doctor, PatientLine
+from .reference import get_department_ids, get_departments
+from .tokens import hospital_date, parse_token
+
+
+ACTIVE_STATUSES = ['calling', 'processing']
+
+
+# ---------------------------------------------------------
+# QUEUE ORDER HELPER
+# ---------------------------------------------------------
+
+def get_next_order_index(department, queue_type, patient=None):
+    waiting_lines = PatientLine.objects.filter(
+        department=department,
+        queue_type=queue_type,
+        status='waiting'
+    ).order_by('order_index')
+
+    if not waiting_lines.exists():
+        return 1
+
+    # Emergency placed at front
+    if patient and getattr(patient, "emergency", False):
+        first_index = waiting_lines.first().order_index
+        return first_index / 2.0
+
+    # Normal → end of queue
+    last_index = waiting_lines.last().order_index
+    return last_index + 1
+
+
+def get_scheduled_order_index(department, queue_type, scheduled_at):
+    """
+    Order index for a patient whose turn was booked for ``scheduled_at``:
+    behind everyone already waiting by then, ahead of later arrivals.
+    """
+    waiting_lines = PatientLine.objects.filter(
+        department=department,
+        queue_type=queue_type,
+        status='waiting'
+    )
+
+    # Ties on order_index fall back to created_at, which puts the new line last
+    earlier = waiting_lines.filter(created_at__lte=scheduled_at).order_by('-order_index').first()
+    if earlier:
+        return earlier.order_index
+
+    first = waiting_lines.order_by('order_index').first()
+    if first:
+        return max(first.order_index - 1, 0)
+
+    return 1
+
+
+def pinned_doctor_for(patient, queue_type):
+    """The doctor a patient asked for, if that doctor serves ``queue_type``."""
+    doctor = patient.doctor
+    if doctor and doctor.role == queue_type:
+        return doctor
+    return None
+
+
+def enqueue_patient(patient, queue_type):
+    return PatientLine.objects.create(
+        patient=patient,
+        department_id=patient.department_id,
+        doctor=pinned_doctor_for(patient, queue_type),
+        queue_type=queue_type,
+        status='waiting',
+        order_index=get_next_order_index(patient.department_id, queue_type, patient)
+    )
+
+
+def find_line_by_token(text, day=None):
+    """The line that holds a daily token such as "R-17" today, or None."""
+    parsed = parse_token(text)
+    if not parsed:
+        return None
+
+    prefix, number = parsed
+    # Prefixes are unique, so the token names one department
+    department = next((department for department in get_departments() if department.token_prefix == prefix), None)
+    if department is None:
+        return None
+    return PatientLine.objects.filter(
+        department_id=department.id,
+        token_date=day or hospital_date(),
+        token_number=number
+    ).select_related('patient').order_by('-created_at').first()
+
+
+# ---------------------------------------------------------
+# ROOM AVAILABILITY
+# ---------------------------------------------------------
+
+def get_room_state(department_id, queue_type, today=None):
+    """
+    Return ``(doctors, free_doctors)`` for one queue in two queries.
+
+    ``free_doctors`` only has doctors who work ``today`` (the current
+    local date by default); an absent doctor's room is never free.
+    """
+    today = today or timezone.localdate()
+    doctors = list(Doctor.objects.filter(
+        department_id=department_id,
+        role=queue_type
+    ).only('id', 'room', 'days'))
+
+    # Overflow patients from other departments occupy our rooms too
+    occupied_rooms = set(PatientLine.objects.filter(
+        room_department_id=department_id,
+        queue_type=queue_type,
+        status__in=ACTIVE_STATUSES
+    ).order_by().values_list('room', flat=True))
+
+    return doctors, [
+        doctor for doctor in doctors
+        if doctor.works_on(today) and doctor.room not in occupied_rooms
+    ]
+
+
+def get_available_room(department_id, queue_type):
+    _, free_doctors = get_room_state(department_id, queue_type)
+    return free_doctors[0].room if free_doctors else None
+
+
+# ---------------------------------------------------------
+# OVERFLOW TO PARTNER DEPARTMENTS
+# ---------------------------------------------------------
+
+QUEUE_DEPTH_CACHE_SECONDS = 300
+
+
+def get_queue_depths(department_ids, queue_type):
+    """
+    Waiting patients per department for one queue type.
+
+    Depths are cached under the queue version, so a queue change makes
+    the next read recount that queue; all misses are counted with one
+    grouped query.
+    """
+    keys = {
+        f'qms:queue-depth:{department_id}:{queue_type}:{queue_version(department_id, queue_type)}': department_id
+        for department_id in department_ids
+    }
+    depths = {keys[key]: depth for key, depth in cache.get_many(list(keys)).items()}
+
+    missing = [department_id for department_id in department_ids if department_id not in depths]
+    if missing:
+        counts = dict(PatientLine.objects.filter(
+            department_id__in=missing,
+            queue_type=queue_type,
+            status='waiting'
+        ).order_by().values('department_id').annotate(depth=Count('id')).values_list('department_id', 'depth'))
+        fresh = {key: counts.get(department_id, 0) for key, department_id in keys.items() if department_id in missing}
+        cache.set_many(fresh, QUEUE_DEPTH_CACHE_SECONDS)
+        depths.update((keys[key], depth) for key, depth in fresh.items())
+
+    return depths
+
+
+def get_overflow_partners(department_id, queue_type):
+    """
+    Departments that may send ``queue_type`` patients to our idle rooms.
+
+    Returns ``(partner_ids, max_imbalance)`` from the first matching
+    entry of QMS_OVERFLOW_RULES, or ``([], 0)`` if none applies.
+    """
+    for rule in getattr(settings, 'QMS_OVERFLOW_RULES', []):
+        if queue_type not in rule['roles']:
+            continue
+        ids = get_department_ids(rule['departments'])
+        if department_id in ids:
+            return [partner_id for partner_id in ids if partner_id != department_id], rule.get('max_imbalance', 0)
+    return [], 0
+
+
+def select_overflow_line(department_id, queue_type):
+    """
+    Next line a free room in ``department_id`` should take from a partner.
+
+    The partner with the longest queue goes first, and only while it has
+    more than ``max_imbalance`` patients more waiting than we do. Patients
+    who asked for a specific doctor never overflow.
+    """
+    try:
+        department_id = int(department_id)
+    except (TypeError, ValueError):
+        # No department, nothing to balance against
+        return None
+    partner_ids, max_imbalance = get_overflow_partners(department_id, queue_type)
+    if not partner_ids:
+        return None
+
+    depths = get_queue_depths([department_id, *partner_ids], queue_type)
+    own_depth = depths.pop(department_id)
+    for partner_id in sorted(depths, key=depths.get, reverse=True):
+        if depths[partner_id] - own_depth <= max_imbalance:
+            break
+        line = get_waiting_lines(partner_id, queue_type).filter(doctor__isnull=True).first()
+        if line:
+            return line
+    return None
+
+
+# ---------------------------------------------------------
+# DISPATCH
+# ---------------------------------------------------------
+
+def get_waiting_lines(department_id, queue_type):
+    # With parallel pathway stages a patient can wait in several queues;
+    # skip anyone who is already being called or seen elsewhere
+    busy = PatientLine.objects.filter(patient_id=OuterRef('patient_id'), status__in=ACTIVE_STATUSES)
+    return PatientLine.objects.filter(
+        ~Exists(busy),
+        department_id=department_id,
+        queue_type=queue_type,
+        status='waiting'
+    ).select_related('patient').order_by('order_index', 'created_at')
+
+
+def _spare_room(waiting, free_rooms, free_doctors):
+    # Keep rooms whose doctor has pinned patients waiting for those patients
+    demanded = set(waiting.filter(
+        doctor_id__in=list(free_rooms)
+    ).order_by().values_list('doctor_id', flat=True).distinct())
+    for doctor_id, room in free_rooms.items():
+        if doctor_id not in demanded:
+            return room
+    return free_doctors[0].room
+
+
+def select_next_line(department_id, queue_type, now=None):
+    """
+    Pick the next waiting line and the room it should go to.
+
+    Patients pinned to a doctor go to that doctor's room. With the
+    ``pinned`` policy they only become eligible once that room is free,
+    unless ``QMS_PINNED_FALLBACK`` lets them overflow to any room. When a
+    partner department's queue is too far ahead of ours (QMS_OVERFLOW_RULES)
+    its next patient is taken first. Returns ``(line, room)``, or
+    ``(None, None)`` if nobody can be called.
+    """
+    now = now or timezone.now()
+    policy = getattr(settings, 'QMS_DOCTOR_DISPATCH', 'pinned')
+    fallback = getattr(settings, 'QMS_PINNED_FALLBACK', 'absent')
+
+    today = timezone.localtime(now).date()
+    doctors, free_doctors = get_room_state(department_id, queue_type, today)
+    if not free_doctors:
+        return None, None
+
+    free_rooms = {doctor.id: doctor.room for doctor in free_doctors}
+    waiting = get_waiting_lines(department_id, queue_type)
+
+    overflow = select_overflow_line(department_id, queue_type)
+    if overflow:
+        return overflow, _spare_room(waiting, free_rooms, free_doctors)
+
+    if policy == 'shared':
+        line = waiting.first()
+        if not line:
+            return None, None
+        return line, free_rooms.get(line.doctor_id, free_doctors[0].room)
+
+    eligible = Q(doctor__isnull=True) | Q(doctor_id__in=list(free_rooms))
+    if fallback in ('absent', 'timeout'):
+        absent_ids = [doctor.id for doctor in doctors if not doctor.works_on(today)]
+        eligible |= Q(doctor_id__in=absent_ids)
+    if fallback == 'timeout':
+        minutes = getattr(settings, 'QMS_PINNED_FALLBACK_MINUTES', 30)
+        eligible |= Q(created_at__lte=now - datetime.timedelta(minutes=minutes))
+
+    line = waiting.filter(eligible).first()
+    if not line:
+        return None, None
+
+    if line.doctor_id in free_rooms:
+        return line, free_rooms[line.doctor_id]
+    return line, _spare_room(waiting, free_rooms, free_doctors)
@@ -0,0 +1,39 @@
+"""
+Reference data that rarely changes but is read on most requests.
+
+Departments are kept in the cache and dropped by signals whenever one
+is saved or deleted; qms.warmup loads them before the first request.
+"""
+from django.core.cache import cache
+
+from .models import Department
+
+
+DEPARTMENTS_KEY = 'qms:departments'
+DEPARTMENTS_CACHE_SECONDS = 3600
+
+
+def get_departments():
+    """All departments, in the order ``Department.objects.all()`` returns them."""
+    departments = cache.get(DEPARTMENTS_KEY)
+    if departments is None:
+        # From the primary: a lagging replica would stay cached until the next change
+        departments = list(Department.objects.using('default').order_by('id'))
+        cache.set(DEPARTMENTS_KEY, departments, DEPARTMENTS_CACHE_SECONDS)
+    return departments
+
+
+def get_department(department_id):
+    for department in get_departments():
+        if department.id == department_id:
+            return department
+    return None
+
+
+def get_department_ids(names):
+    ids = {department.name: department.id for department in get_departments()}
+    return [ids[name] for name in names if name in ids]
+
+
+def invalidate_departments():
+    cache.delete(DEPARTMENTS_KEY)
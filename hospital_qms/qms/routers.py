@@ -0,0 +1,177 @@
+"""
+Read replica routing.
+
+Queue actions always use the ``default`` database. Heavy read paths run
+their reads on the ``replica`` alias when one is configured: views
+decorated with ``@replica_view``, GET requests under QMS_REPLICA_PATHS
+(the Django admin) and code inside ``with replica_reads():`` (reports
+and exports). The queue dashboards stay on the primary: their fragments
+are cached per queue version, and a lagging replica would cache old rows
+under the new version.
+
+After a user's POST succeeds, ReplicaMiddleware sets a cookie that
+lasts QMS_REPLICA_PIN_SECONDS; while it is present that user reads from
+the primary, so they see their own change before it has replicated.
+
+The replica is checked with a cheap query at most every
+QMS_REPLICA_RETRY_SECONDS. When it is unreachable reads fall back to the
+primary, and a read-only view that fails on the replica is run again on
+the primary.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+REPLICA = 'replica'
+PIN_COOKIE = 'qms_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Sessions and logins must see writes made a moment ago
+PRIMARY_APPS = {'sessions', 'auth', 'contenttypes'}
+
+_use_replica = contextvars.ContextVar('qms_use_replica', default=False)
+_health = {'checked_at': None, 'available': False}
+_health_lock = threading.Lock()
+
+
+def replica_configured():
+    return REPLICA in connections
+
+
+def replica_available():
+    """Whether the replica answered its last health check."""
+    if not replica_configured():
+        return False
+
+    retry = getattr(settings, 'QMS_REPLICA_RETRY_SECONDS', 30)
+    now = time.monotonic()
+    with _health_lock:
+        if _health['checked_at'] is not None and now - _health['checked_at'] < retry:
+            return _health['available']
+        _health['checked_at'] = now
+
+    try:
+        with connections[REPLICA].cursor() as cursor:
+            cursor.execute('SELECT 1 FROM qms_department LIMIT 1')
+        available = True
+    except DatabaseError:
+        connections[REPLICA].close()
+        available = False
+
+    with _health_lock:
+        _health['available'] = available
+    return available
+
+
+def mark_replica_down():
+    with _health_lock:
+        _health['checked_at'] = time.monotonic()
+        _health['available'] = False
+
+
+def reset_replica_health():
+    with _health_lock:
+        _health['checked_at'] = None
+
+
+@contextmanager
+def replica_reads():
+    """Run the reads in the block on the replica if it is available."""
+    token = _use_replica.set(replica_available())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_APPS:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA
+
+
+# ---------------------------------------------------------
+# REQUESTS
+# ---------------------------------------------------------
+
+def _pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def _stream_on_replica(chunks):
+    # Streamed responses are read after the view has returned
+    token = _use_replica.set(True)
+    try:
+        yield from chunks
+    finally:
+        _use_replica.reset(token)
+
+
+def _read_from_replica(request, view, *args, **kwargs):
+    if request.method not in SAFE_METHODS or _pinned(request) or not replica_available():
+        return view(request, *args, **kwargs)
+
+    token = _use_replica.set(True)
+    try:
+        response = view(request, *args, **kwargs)
+    except DatabaseError:
+        # Lost the replica mid-request
+        mark_replica_down()
+        connections[REPLICA].close()
+        response = None
+    finally:
+        _use_replica.reset(token)
+
+    if response is None:
+        # The view only reads, so it is safe to run again
+        return view(request, *args, **kwargs)
+    if response.streaming:
+        response.streaming_content = _stream_on_replica(response.streaming_content)
+    return response
+
+
+def replica_view(view):
+    """Serve a read-only view from the replica unless the user is pinned to the primary."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _read_from_replica(request, view, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """
+    Routes GET requests under QMS_REPLICA_PATHS to the replica and pins a
+    user to the primary after each successful write request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, 'QMS_REPLICA_PATHS', ()))
+        self.pin_seconds = getattr(settings, 'QMS_REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        if self.paths and request.path.startswith(self.paths):
+            response = _read_from_replica(request, self.get_response)
+        else:
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,56 @@
+"""
+Backends that deliver patient notifications.
+
+QMS_NOTIFY_BACKEND names the class to use, like Django's EMAIL_BACKEND.
+An SMS gateway backend subclasses BaseSender and implements
+``send_messages``; the console and file backends here stand in for one
+during development and testing.
+"""
+import sys
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class BaseSender:
+    def send_messages(self, notifications):
+        """
+        Deliver ``notifications`` and return one entry per message:
+        ``None`` when it was sent, otherwise an error description.
+        """
+        raise NotImplementedError
+
+
+class ConsoleSender(BaseSender):
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def write_message(self, notification):
+        self.stream.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} to {notification.phone}: {notification.message}\n')
+
+    def send_messages(self, notifications):
+        with self._lock:
+            for notification in notifications:
+                self.write_message(notification)
+            self.stream.flush()
+        return [None] * len(notifications)
+
+
+class FileSender(ConsoleSender):
+    """Appends messages to QMS_NOTIFY_FILE_PATH."""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or settings.QMS_NOTIFY_FILE_PATH
+
+    def send_messages(self, notifications):
+        with open(self.path, 'a', encoding='utf-8') as self.stream:
+            return super().send_messages(notifications)
+
+
+def get_sender():
+    backend = getattr(settings, 'QMS_NOTIFY_BACKEND', 'qms.senders.ConsoleSender')
+    return import_string(backend)()
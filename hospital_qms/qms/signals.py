@@ -0,0 +1,64 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .announcements import announce_call
+from .cache import bump_queue_version, bump_registrations_version
+from .models import Department, Doctor, PathwayStage, Patient, PatientLine
+from .notifications import line_changed
+from .pathways import invalidate_pathway
+from .reference import invalidate_departments
+
+
+@receiver([post_save, post_delete], sender=PatientLine)
+def patient_line_changed(sender, instance, **kwargs):
+    bump_queue_version(instance.department_id, instance.queue_type)
+    # Overflow patients also show up on the dashboard of the room's department
+    if instance.room_department_id and instance.room_department_id != instance.department_id:
+        bump_queue_version(instance.room_department_id, instance.queue_type)
+
+
+@receiver(post_save, sender=PatientLine)
+def patient_line_saved(sender, instance, **kwargs):
+    line_changed(instance, instance.loaded_status)
+    announce_call(instance, instance.loaded_status)
+
+
+@receiver(post_delete, sender=PatientLine)
+def patient_line_deleted(sender, instance, **kwargs):
+    line_changed(instance, instance.loaded_status, deleted=True)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    # Rooms are part of the queue fragments
+    bump_queue_version(instance.department_id, instance.role)
+    # A doctor who moved department or role also leaves the old queue
+    if instance.loaded_department_id and \
+            (instance.loaded_department_id, instance.loaded_role) != (instance.department_id, instance.role):
+        bump_queue_version(instance.loaded_department_id, instance.loaded_role)
+
+
+@receiver([post_save, post_delete], sender=Patient)
+def patient_changed(sender, instance, created=False, **kwargs):
+    bump_registrations_version()
+    if created:
+        return
+    # Names and emergency flags are shown on the queues the patient waits in
+    open_queues = PatientLine.objects.filter(patient_id=instance.id).exclude(
+        status='completed'
+    ).order_by().values_list('department_id', 'room_department_id', 'queue_type').distinct()
+    for department_id, room_department_id, queue_type in open_queues:
+        bump_queue_version(department_id, queue_type)
+        if room_department_id and room_department_id != department_id:
+            bump_queue_version(room_department_id, queue_type)
+
+
+@receiver([post_save, post_delete], sender=PathwayStage)
+@receiver(m2m_changed, sender=PathwayStage.requires.through)
+def pathway_changed(sender, instance, **kwargs):
+    invalidate_pathway(instance.department_id)
+
+
+@receiver([post_save, post_delete], sender=Department)
+def department_changed(sender, instance, **kwargs):
+    invalidate_departments()
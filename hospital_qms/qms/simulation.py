@@ -0,0 +1,241 @@
+"""
+Small discrete-event simulations of the patient queues.
+
+Used by the ``simulate_*`` management commands to compare dispatch
+policies before changing settings. All times are minutes after opening.
+"""
+import heapq
+import math
+
+
+class SimPatient:
+    __slots__ = ('id', 'arrival', 'emergency', 'doctor', 'start', 'finish')
+
+    def __init__(self, id, arrival, emergency=False, doctor=None):
+        self.id = id
+        self.arrival = arrival
+        self.emergency = emergency
+        self.doctor = doctor
+        self.start = None
+        self.finish = None
+
+    @property
+    def wait(self):
+        return self.start - self.arrival
+
+
+def generate_patients(rng, hours, per_hour, doctors=(), pinned_share=0.0,
+                      popular_share=0.0, emergency_share=0.0):
+    """
+    Poisson arrivals over ``hours``. A ``pinned_share`` of patients ask for
+    a specific doctor; ``popular_share`` of those ask for the first one.
+    """
+    patients = []
+    t = rng.expovariate(per_hour / 60.0)
+    while t < hours * 60:
+        doctor = None
+        if doctors and rng.random() < pinned_share:
+            if rng.random() < popular_share:
+                doctor = doctors[0]
+            else:
+                doctor = rng.choice(doctors)
+        patients.append(SimPatient(
+            len(patients), t,
+            emergency=rng.random() < emergency_share,
+            doctor=doctor,
+        ))
+        t += rng.expovariate(per_hour / 60.0)
+    return patients
+
+
+def _enqueue(queue, patient):
+    # Emergencies go ahead of everyone else but behind earlier emergencies;
+    # get_next_order_index puts a new emergency ahead of those too
+    if patient.emergency:
+        position = 0
+        while position < len(queue) and queue[position].emergency:
+            position += 1
+        queue.insert(position, patient)
+    else:
+        queue.append(patient)
+
+
+def simulate_dispatch(patients, doctors, service_minutes, rng, policy='pinned'):
+    """
+    Serve ``patients`` with one room per doctor and exponential service
+    times averaging ``service_minutes``.
+
+    Whenever a patient arrives or a room frees up, each free doctor, in
+    ``doctors`` order, takes the first patient in the queue they may see.
+    ``shared`` lets any doctor see anyone. ``pinned`` lets a doctor skip
+    patients waiting for another doctor; patients who did not ask for
+    anyone go to any room. Fills in ``start`` and ``finish`` on every
+    patient and returns them.
+    """
+    queue = []
+    free = list(doctors)
+    completions = []
+    arrivals = sorted(patients, key=lambda p: p.arrival)
+    i = 0
+
+    while i < len(arrivals) or completions:
+        next_arrival = arrivals[i].arrival if i < len(arrivals) else math.inf
+        next_completion = completions[0][0] if completions else math.inf
+        now = min(next_arrival, next_completion)
+
+        while completions and completions[0][0] == now:
+            _, doctor = heapq.heappop(completions)
+            free.append(doctor)
+        while i < len(arrivals) and arrivals[i].arrival == now:
+            _enqueue(queue, arrivals[i])
+            i += 1
+
+        for doctor in sorted(free, key=doctors.index):
+            for position, patient in enumerate(queue):
+                if policy == 'shared' or patient.doctor in (None, doctor):
+                    del queue[position]
+                    free.remove(doctor)
+                    patient.start = now
+                    patient.finish = now + rng.expovariate(1.0 / service_minutes)
+                    heapq.heappush(completions, (patient.finish, doctor))
+                    break
+
+    return patients
+
+
+def simulate_overflow(departments, service_minutes, rng, max_imbalance=None):
+    """
+    Serve several departments that may lend idle rooms to each other.
+
+    ``departments`` maps a name to ``(patients, rooms)``. A free room takes
+    the head of the longest partner queue when it is more than
+    ``max_imbalance`` patients longer than its own; ``None`` disables
+    overflow. Fills in ``start`` and ``finish`` and returns the number of
+    patients each department's rooms served for other departments.
+    """
+    queues = {name: [] for name in departments}
+    free = {name: rooms for name, (_, rooms) in departments.items()}
+    lent = dict.fromkeys(departments, 0)
+    events = []
+    sequence = 0
+
+    for name, (patients, _) in departments.items():
+        for patient in patients:
+            sequence += 1
+            heapq.heappush(events, (patient.arrival, sequence, 'arrive', name, patient))
+
+    while events:
+        now, _, kind, name, patient = heapq.heappop(events)
+        if kind == 'arrive':
+            _enqueue(queues[name], patient)
+        else:
+            free[name] += 1
+
+        for host in departments:
+            while free[host]:
+                source = host
+                if max_imbalance is not None:
+                    longest = max(queues, key=lambda other: len(queues[other]))
+                    if len(queues[longest]) - len(queues[host]) > max_imbalance:
+                        source = longest
+                if not queues[source]:
+                    break
+                waiting = queues[source].pop(0)
+                free[host] -= 1
+                if source != host:
+                    lent[host] += 1
+                waiting.start = now
+                waiting.finish = now + rng.expovariate(1.0 / service_minutes)
+                sequence += 1
+                heapq.heappush(events, (waiting.finish, sequence, 'finish', host, waiting))
+
+    return lent
+
+
+def simulate_pathway(patients, stages, rng):
+    """
+    Send every patient through a pathway of ``stages``.
+
+    ``stages`` maps a stage name to ``{'requires', 'servers', 'minutes'}``;
+    a stage starts once every stage it requires is done. A staffed stage
+    (``servers`` set) is a queue for that many rooms, and a patient is in
+    at most one room at a time. An unstaffed stage is not a queue: it is a
+    timed wait that starts at once, during which the patient can still be
+    in a room for another stage. The app queues every stage, dilation
+    included, so set ``servers`` for a stage to model it that way. Times
+    are exponential with mean ``minutes``. Returns
+    ``{patient.id: visit_minutes}``.
+    """
+    free = {name: stage['servers'] for name, stage in stages.items() if stage['servers']}
+    queues = {name: [] for name in free}
+    done = {p.id: set() for p in patients}
+    started = {p.id: set() for p in patients}
+    busy = set()
+    visit = {}
+    events = []
+    sequence = 0
+
+    def schedule(time, kind, patient, name=None):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (time, sequence, kind, patient, name))
+
+    def begin(patient, name, now):
+        started[patient.id].add(name)
+        if stages[name]['servers']:
+            _enqueue(queues[name], patient)
+        else:
+            schedule(now + rng.expovariate(1.0 / stages[name]['minutes']), 'finish', patient, name)
+
+    for patient in patients:
+        schedule(patient.arrival, 'arrive', patient)
+
+    while events:
+        now, _, kind, patient, name = heapq.heappop(events)
+
+        if kind == 'arrive':
+            for stage, spec in stages.items():
+                if not spec['requires']:
+                    begin(patient, stage, now)
+        else:
+            done[patient.id].add(name)
+            if stages[name]['servers']:
+                free[name] += 1
+                busy.discard(patient.id)
+            for stage, spec in stages.items():
+                if (name in spec['requires'] and stage not in started[patient.id]
+                        and set(spec['requires']) <= done[patient.id]):
+                    begin(patient, stage, now)
+            if len(done[patient.id]) == len(stages):
+                visit[patient.id] = now - patient.arrival
+
+        for stage, queue in queues.items():
+            position = 0
+            while free[stage] and position < len(queue):
+                waiting = queue[position]
+                if waiting.id in busy:
+                    position += 1
+                    continue
+                del queue[position]
+                free[stage] -= 1
+                busy.add(waiting.id)
+                schedule(now + rng.expovariate(1.0 / stages[stage]['minutes']), 'finish', waiting, stage)
+
+    return visit
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(math.ceil(pct / 100.0 * len(ordered))) - 1)
+    return ordered[max(index, 0)]
+
+
+def summarize(patients):
+    waits = [p.wait for p in patients]
+    return {
+        'served': len(waits),
+        'mean_wait': sum(waits) / len(waits) if waits else 0.0,
+        'p95_wait': percentile(waits, 95),
+    }
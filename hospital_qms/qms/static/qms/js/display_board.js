@@ -0,0 +1,98 @@
+// Waiting area display board. New calls are polled in id order and
+// played one at a time, each in every configured locale, so calls made
+// together are spoken one after another instead of over each other.
+document.addEventListener('DOMContentLoaded', function() {
+    const configElement = document.getElementById('display-config');
+    const pollUrl = configElement.dataset.url;
+    const pollInterval = parseFloat(configElement.dataset.pollSeconds) * 1000;
+    const RECENT = 5;
+
+    const player = new Audio();
+    const pending = [];
+    let lastId = 0;
+    let playing = false;
+    let soundEnabled = false;
+    let firstPoll = true;
+
+    // Browsers only play audio after the page was interacted with
+    document.getElementById('enableSound').addEventListener('click', function() {
+        soundEnabled = true;
+        this.classList.add('d-none');
+        playNext();
+    });
+
+    function showCall(announcement) {
+        document.getElementById('currentCall').textContent =
+            `Token ${announcement.token} → Room ${announcement.room}`;
+        const recent = document.getElementById('recentCalls');
+        const item = document.createElement('li');
+        item.textContent = `Token ${announcement.token} → Room ${announcement.room}`;
+        recent.prepend(item);
+        while (recent.children.length > RECENT) {
+            recent.removeChild(recent.lastChild);
+        }
+    }
+
+    function playNext() {
+        if (playing || !pending.length) {
+            return;
+        }
+        const announcement = pending.shift();
+        showCall(announcement);
+        if (!soundEnabled) {
+            playNext();
+            return;
+        }
+
+        playing = true;
+        const clips = announcement.audio.slice();
+        function playClip() {
+            if (!clips.length) {
+                playing = false;
+                playNext();
+                return;
+            }
+            // A failed clip can both reject play() and fire error; move on once
+            let done = false;
+            const next = () => {
+                if (!done) {
+                    done = true;
+                    playClip();
+                }
+            };
+            player.onended = next;
+            player.onerror = next;
+            player.src = clips.shift();
+            player.play().catch(next);
+        }
+        playClip();
+    }
+
+    function poll() {
+        let delay = pollInterval;
+        fetch(`${pollUrl}?after=${lastId}`)
+            .then(response => response.json())
+            .then(data => {
+                data.announcements.forEach(announcement => {
+                    lastId = Math.max(lastId, announcement.id);
+                    if (firstPoll) {
+                        // Calls made before the page loaded are shown, not spoken
+                        showCall(announcement);
+                    } else {
+                        pending.push(announcement);
+                    }
+                });
+                if (data.more) {
+                    // The rest of a burst of calls
+                    delay = 0;
+                } else {
+                    firstPoll = false;
+                }
+                playNext();
+            })
+            .catch(error => console.error('Error:', error))
+            .finally(() => setTimeout(poll, delay));
+    }
+
+    poll();
+});
@@ -0,0 +1,150 @@
+// Kiosk self check-in. Check-ins go into a localStorage outbox first and
+// are sent in batches, so a slow or unreachable server never loses one.
+// Every entry keeps the key it was created with; the server uses it to
+// answer resent entries without queueing the patient twice.
+document.addEventListener('DOMContentLoaded', function() {
+    const configElement = document.getElementById('kiosk-config');
+    const checkInUrl = configElement.dataset.url;
+    const batchLimit = parseInt(configElement.dataset.batchLimit, 10);
+    const OUTBOX = 'qmsKioskOutbox';
+    const TOKEN = 'qmsKioskToken';
+    const REQUEST_TIMEOUT = 8000;
+
+    // A one-off ?token= link registers the device, then is removed from the URL
+    const url = new URL(window.location.href);
+    if (url.searchParams.get('token')) {
+        localStorage.setItem(TOKEN, url.searchParams.get('token'));
+        url.searchParams.delete('token');
+        window.history.replaceState({}, '', url.toString());
+    }
+    const token = localStorage.getItem(TOKEN);
+    if (!token) {
+        document.getElementById('kioskSetup').classList.remove('d-none');
+    }
+
+    let sending = false;
+    let retryDelay = 1000;
+    let lastKey = null;
+
+    function loadOutbox() {
+        return JSON.parse(localStorage.getItem(OUTBOX) || '[]');
+    }
+
+    function saveOutbox(entries) {
+        localStorage.setItem(OUTBOX, JSON.stringify(entries));
+        const pending = entries.length;
+        document.getElementById('pendingCount').textContent =
+            pending ? `${pending} check-in(s) waiting to be sent` : '';
+    }
+
+    function newKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    }
+
+    function paragraph(className, text) {
+        const element = document.createElement('p');
+        element.className = className;
+        element.textContent = text;
+        return element;
+    }
+
+    // Names are typed in at registration, so results are set as text, never as HTML
+    function showResult(result) {
+        const alertDiv = document.createElement('div');
+        if (result.success) {
+            alertDiv.className = 'alert alert-success';
+            alertDiv.append(
+                paragraph('mb-1', `Welcome, ${result.name}`),
+                paragraph('ticket-number mb-1', result.token || result.patient_line_id),
+                paragraph('mb-0', 'Please wait to be called.')
+            );
+        } else {
+            alertDiv.className = 'alert alert-danger';
+            alertDiv.textContent = result.error || 'Check-in failed. Please see the counter.';
+        }
+        document.getElementById('checkInResult').replaceChildren(alertDiv);
+        if (result.success) {
+            window.print();
+        }
+    }
+
+    function flush() {
+        const outbox = loadOutbox();
+        if (sending || !outbox.length || !token) {
+            return;
+        }
+
+        sending = true;
+        const batch = outbox.slice(0, batchLimit);
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), REQUEST_TIMEOUT);
+
+        fetch(checkInUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Kiosk-Token': token
+            },
+            body: JSON.stringify({check_ins: batch}),
+            signal: controller.signal
+        })
+        .then(response => {
+            if (!response.ok && response.status >= 500) {
+                throw new Error(`Server error ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            const done = new Set(data.results.map(result => result.key));
+            saveOutbox(loadOutbox().filter(entry => !done.has(entry.key)));
+            data.results.forEach(result => {
+                if (result.key === lastKey) {
+                    showResult(result);
+                }
+            });
+            retryDelay = 1000;
+        })
+        .catch(error => {
+            console.error('Check-in batch failed, will retry:', error);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        })
+        .finally(() => {
+            clearTimeout(timer);
+            sending = false;
+            if (loadOutbox().length) {
+                setTimeout(flush, retryDelay);
+            }
+        });
+    }
+
+    document.getElementById('checkInForm').addEventListener('submit', function(e) {
+        e.preventDefault();
+        const mrn = document.getElementById('mrn').value.trim();
+        const phone = document.getElementById('phone').value.trim();
+        if (!mrn && !phone) {
+            alert('Please enter your MRN or phone number');
+            return;
+        }
+
+        lastKey = newKey();
+        const outbox = loadOutbox();
+        outbox.push({key: lastKey, mrn: mrn, phone: phone});
+        saveOutbox(outbox);
+        this.reset();
+
+        document.getElementById('checkInResult').innerHTML = `
+            <div class="alert alert-info">Checking you in...</div>
+        `;
+        flush();
+    });
+
+    window.addEventListener('online', flush);
+    saveOutbox(loadOutbox());
+    flush();
+});
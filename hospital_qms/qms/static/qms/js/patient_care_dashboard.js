@@ -0,0 +1,93 @@
+// Patient care dashboard actions. Page data comes from the
+// #dashboard-config JSON block so this file can be served statically.
+document.addEventListener('DOMContentLoaded', function() {
+    const config = JSON.parse(document.getElementById('dashboard-config').textContent);
+
+    // Helper function to force a hard reload, bypassing cache
+    function forceReload() {
+        const url = new URL(window.location.href);
+        url.searchParams.set('t', new Date().getTime());
+        window.location.href = url.toString();
+    }
+
+    function newKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    }
+
+    // One key per click, reused by the retry, so the server runs the
+    // action once however often the request reaches it
+    function sendAction(url, body, key, retries) {
+        return fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-CSRFToken': config.csrfToken,
+                'Idempotency-Key': key
+            },
+            body: new URLSearchParams(body).toString()
+        })
+        .catch(error => {
+            if (retries > 0) {
+                return new Promise(resolve => setTimeout(resolve, 500))
+                    .then(() => sendAction(url, body, key, retries - 1));
+            }
+            throw error;
+        });
+    }
+
+    function postAction(button, url, body, failureMessage, errorMessage) {
+        button.disabled = true;
+        sendAction(url, body, newKey(), 2)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                forceReload();
+            } else {
+                alert(data.error || failureMessage);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert(errorMessage);
+        })
+        .finally(() => {
+            button.disabled = false;
+        });
+    }
+
+    // --- Event Listeners for Action Buttons ---
+
+    const lineActions = [
+        ['.start-btn', '/api/start-processing/', 'Failed to start processing', 'An error occurred while starting processing'],
+        ['.complete-btn', '/api/complete-patient/', 'Failed to complete patient', 'An error occurred while completing patient'],
+        ['.hold-btn', '/api/hold-patient/', 'Failed to put patient on hold', 'An error occurred while putting patient on hold'],
+        ['.return-btn, .cancel-btn', '/api/return-to-queue/', 'Failed to return patient to queue', 'An error occurred while returning patient to queue'],
+    ];
+
+    lineActions.forEach(([selector, url, failureMessage, errorMessage]) => {
+        document.querySelectorAll(selector).forEach(button => {
+            button.addEventListener('click', function() {
+                const card = this.closest('.patient-card');
+                if (!card || !card.dataset.id) {
+                    console.error(`Could not find patient card ID for ${selector}.`);
+                    return;
+                }
+                postAction(this, url, {patient_line_id: card.dataset.id}, failureMessage, errorMessage);
+            });
+        });
+    });
+
+    // --- Event Listeners for "Call Next" Buttons ---
+
+    document.querySelectorAll('.call-next-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            postAction(this, '/api/call-next/', {
+                queue_type: this.dataset.queueType,
+                department_id: config.departmentId
+            }, 'Failed to call next patient', 'An error occurred while calling the next patient');
+        });
+    });
+});
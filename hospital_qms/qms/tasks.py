@@ -0,0 +1,59 @@
+"""
+Built-in background jobs, run by ``manage.py qms_worker``.
+
+Queue one with ``qms.jobs.enqueue('qms.export_history', {...})`` or
+schedule it in QMS_RECURRING_JOBS.
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .exports import iter_csv, iter_rows
+from .jobs import job
+from .models import Announcement, Job, Notification
+from .notifications import claim_within_rate, send_batch
+from .routers import replica_reads
+from .senders import get_sender
+
+
+@job('qms.send_notifications')
+def send_notifications(limit=None):
+    """
+    Send up to ``limit`` outbox messages, QMS_NOTIFY_RATE_PER_MINUTE by
+    default, within the allowance it shares with ``manage.py send_notifications``.
+    """
+    limit = limit or getattr(settings, 'QMS_NOTIFY_RATE_PER_MINUTE', 120)
+    sender = get_sender()
+    while limit > 0:
+        batch = claim_within_rate(min(limit, 50))
+        if not batch:
+            break
+        send_batch(sender, batch)
+        limit -= len(batch)
+
+
+@job('qms.export_history')
+def export_history(kind, path, excel=False, **filters):
+    """Write a history export to ``path`` instead of streaming it to a browser."""
+    with replica_reads(), open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in iter_csv(iter_rows(kind, **filters), excel=excel):
+            f.write(chunk)
+
+
+@job('qms.purge_jobs')
+def purge_jobs(days=7):
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    Job.objects.filter(status__in=['succeeded', 'failed'], finished_at__lt=cutoff).delete()
+
+
+@job('qms.purge_notifications')
+def purge_notifications(days=30):
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    Notification.objects.filter(status__in=['sent', 'skipped', 'failed'], created_at__lt=cutoff).delete()
+
+
+@job('qms.purge_announcements')
+def purge_announcements(days=1):
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    Announcement.objects.filter(created_at__lt=cutoff).delete()
@@ -0,0 +1,97 @@
+import io
+import os
+import shutil
+import tempfile
+import wave
+
+from django.test import TestCase, override_settings
+
+from qms.announcements import get_library, number_words, reset_libraries
+from qms.models import Announcement, Department, Patient, PatientLine
+from qms.queues import enqueue_patient
+
+WORDS = [str(n) for n in range(20)] + [str(n) for n in range(20, 100, 10)] + ['hundred', 'thousand', 'token', 'room', 'a', 'b']
+
+
+class AnnouncementTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.clips = tempfile.mkdtemp()
+        os.mkdir(os.path.join(cls.clips, 'en'))
+        for word in WORDS:
+            with wave.open(os.path.join(cls.clips, 'en', f'{word}.wav'), 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(8000)
+                f.writeframes(b'\x01\x00' * 400)
+        cls.settings_override = override_settings(QMS_ANNOUNCEMENT_CLIPS=cls.clips, QMS_WAITING_AREAS={'east': ['B2']})
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.clips)
+        super().tearDownClass()
+
+    def setUp(self):
+        reset_libraries()
+        self.addCleanup(reset_libraries)
+        self.department = Department.objects.create(name='General', token_prefix='A')
+
+    def call(self, room, count=1):
+        lines = []
+        for i in range(count):
+            line = enqueue_patient(Patient.objects.create(
+                name=f'Patient {i}', age=30, gender='M', address='-', phone='1', department=self.department,
+            ), 'doctor')
+            line.status = 'calling'
+            line.room = room
+            line.save()
+            lines.append(line)
+        return lines
+
+    def poll(self, area, after=0):
+        return self.client.get(f'/api/announcements/{area}/', {'after': after}).json()
+
+    def test_calls_are_announced_in_their_area(self):
+        [line] = self.call('B1')
+        self.call('B2')
+        self.assertEqual(set(Announcement.objects.values_list('area', flat=True)), {'B', 'east'})
+
+        data = self.poll('B')
+        [announcement] = data['announcements']
+        self.assertEqual((announcement['token'], announcement['room'], data['more']), ('A-1', 'B1', False))
+        self.assertEqual(self.poll('B', announcement['id'])['announcements'], [])
+
+        # Saving a line that is already calling doesn't announce it again
+        PatientLine.objects.get(pk=line.pk).save()
+        self.assertEqual(Announcement.objects.count(), 2)
+
+    def test_burst_is_read_out_in_full(self):
+        self.call('B1', 25)
+
+        first = self.poll('B')
+        self.assertEqual((len(first['announcements']), first['more']), (20, True))
+        second = self.poll('B', first['announcements'][-1]['id'])
+        self.assertEqual((len(second['announcements']), second['more']), (5, False))
+
+        tokens = [announcement['token'] for announcement in first['announcements'] + second['announcements']]
+        self.assertEqual(tokens, [f'A-{number}' for number in range(1, 26)])
+
+    def test_audio(self):
+        self.call('B1')
+        [announcement] = self.poll('B')['announcements']
+        response = self.client.get(announcement['audio'][0])
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'audio/wav'))
+        with wave.open(io.BytesIO(response.content)) as f:
+            self.assertGreater(f.getnframes(), 0)
+
+        self.assertEqual(self.client.get('/api/announcements/audio/fr/A-1/B1.wav').status_code, 404)
+        self.assertEqual(self.client.get('/api/announcements/audio/en/A-1/Z1.wav').status_code, 404)
+
+    def test_number_words(self):
+        library = get_library('en')
+        self.assertEqual(number_words(42, library), ['40', '2'])
+        self.assertEqual(number_words(300, library), ['3', 'hundred'])
+        self.assertEqual(number_words(1215, library), ['1', 'thousand', '2', 'hundred', '15'])
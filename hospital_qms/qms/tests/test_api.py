@@ -0,0 +1,131 @@
+import datetime
+import gzip
+import json
+import unittest
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from qms import api
+from qms.models import Department, Patient
+from qms.queues import enqueue_patient
+
+
+class DumpsTests(SimpleTestCase):
+    data = [{
+        'id': 1,
+        'name': 'Zoë Ñúñez 李',
+        'created_at': datetime.datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2026, 1, 2),
+        'next': None,
+    }]
+
+    def fallback(self):
+        with mock.patch.object(api, 'orjson', None):
+            return api.dumps(self.data)
+
+    def test_fallback_writes_utf8(self):
+        body = self.fallback()
+        self.assertIn('Zoë Ñúñez 李'.encode(), body)
+        self.assertEqual(json.loads(body)[0]['name'], 'Zoë Ñúñez 李')
+
+    @unittest.skipIf(api.orjson is None, 'orjson is not installed')
+    def test_fallback_matches_orjson(self):
+        self.assertEqual(self.fallback(), api.orjson.dumps(self.data))
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.departments = [Department.objects.create(name=f'Department {i}') for i in range(5)]
+        self.user = User.objects.create_user('counter')
+        self.user.groups.add(Group.objects.create(name='Counter'))
+        self.client.force_login(self.user)
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        return response.status_code, json.loads(response.content)
+
+
+class AccessTests(ApiTestCase):
+    def test_needs_a_login(self):
+        self.client.logout()
+        self.assertEqual(self.get('/api/v1/departments/'), (401, {'error': 'Authentication required'}))
+
+    def test_patients_and_lines_need_a_group(self):
+        self.client.force_login(User.objects.create_user('visitor'))
+        self.assertEqual(self.get('/api/v1/departments/')[0], 200)
+        self.assertEqual(self.get('/api/v1/patients/'), (403, {'error': 'Permission denied'}))
+        self.assertEqual(self.get('/api/v1/lines/')[0], 403)
+
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.assertEqual(self.get('/api/v1/patients/')[0], 200)
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post('/api/v1/departments/').status_code, 405)
+
+
+class PaginationTests(ApiTestCase):
+    def test_cursor_walks_every_row_once(self):
+        path, params, ids = '/api/v1/departments/', {'limit': 2}, []
+        while path:
+            status, body = self.get(path, **params)
+            self.assertEqual(status, 200)
+            self.assertLessEqual(len(body['data']), 2)
+            ids += [row['id'] for row in body['data']]
+            path, params = body['next'], {}
+        self.assertEqual(ids, [department.id for department in self.departments])
+
+    @override_settings(QMS_API_MAX_PAGE_SIZE=3)
+    def test_limit_is_capped(self):
+        status, body = self.get('/api/v1/departments/', limit=1000)
+        self.assertEqual(len(body['data']), 3)
+        self.assertIsNotNone(body['next'])
+
+    def test_bad_paging_is_rejected(self):
+        for params in [{'limit': 'abc'}, {'limit': '0'}, {'limit': '-5'}, {'cursor': 'not-a-cursor'}, {'cursor': '!!'}]:
+            with self.subTest(params):
+                status, body = self.get('/api/v1/departments/', **params)
+                self.assertEqual(status, 400)
+                self.assertIn('error', body)
+
+    def test_bad_filter_is_rejected(self):
+        self.assertEqual(self.get('/api/v1/departments/', id='abc')[0], 400)
+        self.assertEqual(self.get('/api/v1/lines/', token_date='yesterday')[0], 400)
+
+
+class FieldsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        patient = Patient.objects.create(
+            name='Zoë', age=30, gender='F', address='-', phone='9876543210', department=self.departments[0],
+        )
+        self.line = enqueue_patient(patient, 'optometrist')
+
+    def test_only_the_asked_fields(self):
+        status, body = self.get('/api/v1/departments/', fields='name')
+        self.assertEqual(body['data'][0], {'name': 'Department 0'})
+
+        status, body = self.get('/api/v1/lines/', fields='token,patient_name,emergency')
+        self.assertEqual(body['data'], [{'token': self.line.token, 'patient_name': 'Zoë', 'emergency': False}])
+
+    def test_defaults_and_filters(self):
+        status, body = self.get('/api/v1/patients/', phone='+91 98765 43210')
+        self.assertEqual(set(body['data'][0]), set(api.PATIENTS.default_fields))
+        self.assertEqual(self.get('/api/v1/patients/', phone='000')[1]['data'], [])
+
+    def test_unknown_field(self):
+        self.assertEqual(self.get('/api/v1/lines/', fields='id,password'), (400, {'error': 'Unknown fields: password'}))
+
+
+class GzipTests(ApiTestCase):
+    def test_compressed_for_clients_that_accept_it(self):
+        plain = self.client.get('/api/v1/departments/')
+        compressed = self.client.get('/api/v1/departments/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertIn('Accept-Encoding', compressed['Vary'])
@@ -0,0 +1,96 @@
+import datetime
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from qms.appointments import book_slot, cancel_appointment, check_in, generate_slots
+from qms.models import Appointment, AppointmentSlot, AvailabilityDay, Department, Doctor, Patient, PatientLine
+
+ALL_DAYS = 'Mon,Tue,Wed,Thu,Fri,Sat,Sun'
+
+
+@override_settings(QMS_SLOT_MINUTES=60, QMS_APPOINTMENT_HOURS=('08:00', '12:00'))
+class AppointmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.department = Department.objects.create(name='General')
+        self.doctor = Doctor.objects.create(name='D1', department=self.department, role='doctor', room='B1', days=ALL_DAYS)
+        generate_slots(self.today, 2)
+        self.patient = Patient.objects.create(
+            name='Patient', age=30, gender='F', address='-', phone='1', department=self.department,
+        )
+
+    def book(self, date):
+        slot = AppointmentSlot.objects.filter(doctor=self.doctor, date=date).order_by('start_time').first()
+        return book_slot(self.patient, slot.id)
+
+    def free(self, date):
+        return AvailabilityDay.objects.get(doctor=self.doctor, date=date).free
+
+    def test_generates_slots_per_working_day(self):
+        self.assertEqual(self.free(self.today), 4)
+        self.assertEqual(generate_slots(self.today, 2), 0)
+
+    def test_room_label_is_per_department(self):
+        retina = Department.objects.create(name='Retina')
+        other = Doctor.objects.create(name='R1', department=retina, role='doctor', room='B1', days=ALL_DAYS)
+        same_room = Doctor.objects.create(name='D2', department=self.department, role='doctor', room='B1', days=ALL_DAYS)
+
+        self.assertEqual(generate_slots(self.today, 1), 4)
+        self.assertEqual(AppointmentSlot.objects.filter(doctor=other).count(), 4)
+        # The department's own B1 is still taken by D1
+        self.assertFalse(AppointmentSlot.objects.filter(doctor=same_room).exists())
+
+    def test_cancel_credits_the_slot_once(self):
+        appointment = self.book(self.today)
+        self.assertEqual(self.free(self.today), 3)
+
+        # Two requests that both loaded the appointment while it was booked
+        stale = Appointment.objects.select_related('slot').get(pk=appointment.pk)
+        self.assertTrue(cancel_appointment(appointment))
+        self.assertFalse(cancel_appointment(stale))
+
+        self.assertEqual(self.free(self.today), 4)
+        self.assertEqual(AppointmentSlot.objects.get(pk=appointment.slot_id).available, 1)
+
+    def test_check_in_after_cancel_is_refused(self):
+        appointment = self.book(self.today)
+        stale = Appointment.objects.select_related('slot__doctor', 'patient').get(pk=appointment.pk)
+        self.assertTrue(cancel_appointment(appointment))
+
+        self.assertIsNone(check_in(stale))
+        self.assertFalse(PatientLine.objects.filter(patient=self.patient).exists())
+        self.assertEqual(self.free(self.today), 4)
+
+    def test_check_in_only_on_the_appointment_date(self):
+        tomorrow = self.book(self.today + datetime.timedelta(days=1))
+        self.assertIsNone(check_in(tomorrow))
+        self.assertEqual(Appointment.objects.get(pk=tomorrow.pk).status, 'booked')
+
+        line = check_in(self.book(self.today))
+        self.assertEqual((line.doctor_id, line.queue_type, line.status), (self.doctor.id, 'doctor', 'waiting'))
+
+
+class AppointmentDateTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('counter', password='x')
+        user.groups.add(Group.objects.create(name='Counter'))
+        self.client.login(username='counter', password='x')
+        self.doctor = Doctor.objects.create(
+            name='D1', department=Department.objects.create(name='General'), role='doctor', room='B1', days=ALL_DAYS,
+        )
+
+    def test_invalid_dates_are_bad_requests(self):
+        for date in ['2026-13-45', 'tomorrow']:
+            with self.subTest(date=date):
+                response = self.client.get(f'/api/appointments/slots/{self.doctor.id}/{date}/')
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get('/api/appointments/availability/', {'start': date})
+                self.assertEqual(response.status_code, 400)
+
+    def test_valid_date(self):
+        response = self.client.get(f'/api/appointments/slots/{self.doctor.id}/{timezone.localdate().isoformat()}/')
+        self.assertEqual(response.json(), {'success': True, 'slots': []})
@@ -0,0 +1,107 @@
+import datetime
+import unittest
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from qms.models import Department, Doctor, Patient, PatientLine
+
+try:
+    import numpy as np
+    from qms.capacity import HistoryModel, current_roster, fit_history, simulate_rosters
+except ImportError:
+    np = None
+
+MONDAY = 1
+
+
+def history(arrivals_by_hour, weekday=MONDAY):
+    """A model with ``{hour: (optometrist, doctor) arrivals}`` on ``weekday`` only."""
+    arrivals = np.zeros((7, 24, 2))
+    for hour, rates in arrivals_by_hour.items():
+        arrivals[weekday - 1, hour] = rates
+    days = np.zeros(7)
+    days[weekday - 1] = 1
+    return HistoryModel(
+        arrivals, days, flow=0.8, emergency_share=0.1,
+        service_mu=np.full((2, 24), np.log(10)), service_sigma=np.full((2, 24), 0.3),
+    )
+
+
+@unittest.skipIf(np is None, 'capacity planning needs NumPy')
+class SimulationTests(unittest.TestCase):
+    def test_opening_hours(self):
+        model = history({9: (6, 1), 12: (3, 0)})
+        self.assertEqual(model.opening_hours(MONDAY), (9, 13))
+        self.assertEqual(model.opening_hours(MONDAY + 1), (0, 0))
+
+    def test_day_without_arrivals_is_closed(self):
+        [result] = simulate_rosters(history({}), MONDAY, [(1, 1)], 5, np.random.default_rng(0))
+        for stage in ['optometrist', 'doctor']:
+            self.assertEqual(result[stage], {'mean_wait': 0.0, 'emergency_wait': 0.0, 'utilization': 0.0, 'unserved': 0.0})
+
+    def test_more_rooms_shorter_waits(self):
+        model = history({hour: (6, 1) for hour in range(9, 13)})
+        rosters = [(1, 1), (2, 2), (3, 3)]
+        results = simulate_rosters(model, MONDAY, rosters, 20, np.random.default_rng(1))
+
+        self.assertEqual([result['rooms'] for result in results], rosters)
+        waits = [result['optometrist']['mean_wait'] for result in results]
+        self.assertEqual(waits, sorted(waits, reverse=True))
+        self.assertGreater(waits[0], 2 * waits[-1])
+        for result in results:
+            for stage in ['optometrist', 'doctor']:
+                self.assertTrue(0 <= result[stage]['utilization'] <= 1)
+        # Emergencies go first
+        self.assertLess(results[0]['optometrist']['emergency_wait'], waits[0])
+
+    def test_same_seed_same_results(self):
+        model = history({10: (5, 2)})
+        run = lambda: simulate_rosters(model, MONDAY, [(1, 2)], 10, np.random.default_rng(7))
+        self.assertEqual(run(), run())
+
+
+@unittest.skipIf(np is None, 'capacity planning needs NumPy')
+class FitHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Eye')
+        # A Monday, in the current time zone
+        self.monday = timezone.make_aware(datetime.datetime(2026, 1, 5, 9, 15))
+
+    def add_line(self, patient, queue_type, minutes_in=0, service_minutes=12):
+        start = self.monday + datetime.timedelta(minutes=minutes_in)
+        line = PatientLine.objects.create(patient=patient, queue_type=queue_type, status='completed')
+        PatientLine.objects.filter(id=line.id).update(
+            created_at=start, started_at=start, completed_at=start + datetime.timedelta(minutes=service_minutes),
+        )
+
+    def test_rates_flow_and_service_times(self):
+        for i in range(6):
+            patient = Patient.objects.create(
+                name=f'P{i}', age=30, gender='M', address='-', phone='1', department=self.department, emergency=i == 0,
+            )
+            self.add_line(patient, 'optometrist', minutes_in=i)
+            if i % 2:
+                self.add_line(patient, 'doctor', minutes_in=30 + i)
+
+        model = fit_history(self.department)
+        self.assertEqual(model.weekdays(), [MONDAY])
+        self.assertEqual(model.arrivals[MONDAY - 1, 9, 0], 6)
+        self.assertEqual(model.arrivals[MONDAY - 1, :, 1].sum(), 0)
+        self.assertEqual(model.flow, 0.5)
+        self.assertAlmostEqual(model.emergency_share, 1 / 9)
+        self.assertAlmostEqual(np.exp(model.service_mu[0, 9]), 12)
+        self.assertEqual(model.opening_hours(MONDAY), (9, 10))
+
+    def test_no_history(self):
+        model = fit_history(self.department)
+        self.assertEqual(model.weekdays(), [])
+        self.assertEqual(model.opening_hours(MONDAY), (0, 0))
+
+    def test_current_roster(self):
+        Doctor.objects.create(name='O', department=self.department, role='optometrist', room='A1', days='Mon,Tue')
+        Doctor.objects.create(name='D', department=self.department, role='doctor', room='B1', days='Tue')
+        self.assertEqual(current_roster(self.department, MONDAY), (1, 0))
+        self.assertEqual(current_roster(self.department, MONDAY + 1), (1, 1))
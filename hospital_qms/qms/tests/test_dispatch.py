@@ -0,0 +1,61 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from qms.models import Department, Doctor, Patient
+from qms.queues import enqueue_patient, select_next_line
+
+ALL_DAYS = 'Mon,Tue,Wed,Thu,Fri,Sat,Sun'
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+        self.b1 = Doctor.objects.create(name='D1', department=self.department, role='doctor', room='B1', days=ALL_DAYS)
+        self.b2 = Doctor.objects.create(name='D2', department=self.department, role='doctor', room='B2', days=ALL_DAYS)
+
+    def enqueue(self, name, doctor=None):
+        patient = Patient.objects.create(
+            name=name, age=30, gender='M', address='-', phone='1', department=self.department, doctor=doctor,
+        )
+        return enqueue_patient(patient, 'doctor')
+
+    def call(self, line, room):
+        line.status = 'calling'
+        line.room = room
+        line.save()
+
+    def test_pinned_patient_waits_for_their_doctor(self):
+        first = self.enqueue('First', self.b2)
+        second = self.enqueue('Second', self.b2)
+        other = self.enqueue('Other', self.b1)
+
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (first, 'B2'))
+        self.call(first, 'B2')
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (other, 'B1'))
+        self.call(other, 'B1')
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (None, None))
+        self.assertEqual(second.status, 'waiting')
+
+    def test_unpinned_patient_leaves_demanded_room_free(self):
+        unpinned = self.enqueue('Unpinned')
+        self.enqueue('Pinned', self.b1)
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (unpinned, 'B2'))
+
+    def test_absent_doctor_room_is_never_used(self):
+        today = timezone.localdate()
+        self.b1.days = ','.join(
+            (today + datetime.timedelta(days=offset)).strftime('%a') for offset in range(1, 7)
+        )
+        self.b1.save()
+
+        pinned = self.enqueue('Pinned', self.b1)
+        unpinned = self.enqueue('Unpinned')
+        # The absent doctor's patient falls back to a working doctor's room
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (pinned, 'B2'))
+        self.call(pinned, 'B2')
+        self.assertEqual(select_next_line(self.department.id, 'doctor'), (None, None))
+        self.assertEqual(unpinned.status, 'waiting')
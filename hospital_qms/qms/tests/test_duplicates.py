@@ -0,0 +1,121 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from qms.duplicates import _block_pairs, find_duplicates, merge_patients, scan_duplicates
+from qms.matching import name_key, normalize_name, phone_key, prepare, score, soundex
+from qms.models import Appointment, AppointmentSlot, Department, Doctor, Patient, PatientLine
+from qms.queues import enqueue_patient
+
+
+def patient_dict(name, phone='', birth_year=1990, gender='M', address=''):
+    return prepare({
+        'name': name, 'phone_key': phone_key(phone), 'birth_year': birth_year, 'gender': gender, 'address': address,
+    })
+
+
+class MatchingTests(SimpleTestCase):
+    def test_keys(self):
+        self.assertEqual(normalize_name("Dr. Ravi  O'Neil-Kumar"), 'ravi oneil kumar')
+        self.assertEqual(soundex('robert'), soundex('rupert'))
+        self.assertEqual(soundex('ashcraft'), 'A261')
+        self.assertEqual(name_key('Mr Ravi Kumar'), name_key('Ravee Kumaar'))
+        self.assertEqual(name_key('Mr'), '')
+        self.assertEqual(phone_key('+91 98765-43210'), '9876543210')
+        self.assertEqual(phone_key('0'), '')
+
+    def test_score(self):
+        a = patient_dict('Ravi Kumar', '9876543210', address='12 Gandhi Road')
+        self.assertEqual(score(a, patient_dict('Kumar Ravi', '09876543210', address='12, Gandhi Road')), 1.0)
+        self.assertLess(score(a, patient_dict('Sita Devi', '9000000000', 1950, 'F', 'Lake View')), 0.2)
+
+    def test_unknown_birth_year_scores_nothing_for_age(self):
+        a = patient_dict('Ravi Kumar', '9876543210', birth_year=None)
+        b = patient_dict('Ravi Kumar', '9876543210')
+        self.assertEqual(score(a, b), 0.7)
+
+
+class DuplicateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+
+    def create(self, name, phone='', age=30, address='-'):
+        return Patient.objects.create(
+            name=name, age=age, gender='M', address=address, phone=phone, department=self.department,
+        )
+
+    def test_find_duplicates_at_registration(self):
+        existing = self.create('Ravi Kumar', '9876543210', address='12 Gandhi Road')
+        self.create('Sita Devi', '9000000000')
+
+        [(similarity, match)] = find_duplicates('Ravi Kumaar', 31, 'M', '', address='12 Gandhi Road')
+        self.assertEqual(match, existing)
+        self.assertGreaterEqual(similarity, 0.75)
+        self.assertEqual(find_duplicates('Ravi Kumar', 30, 'M', '9876543210', exclude_id=existing.id), [])
+
+    def test_scan_handles_missing_birth_years(self):
+        a = self.create('Ravi Kumar', '9876543210', address='12 Gandhi Road')
+        b = self.create('Ravi Kumar', address='12 Gandhi Road')
+        self.create('Ravi Kumar', age=80, address='Lake View')
+        Patient.objects.filter(id=a.id).update(birth_year=None)
+
+        pairs = {frozenset([x['id'], y['id']]) for _, x, y in scan_duplicates(threshold=0.6)}
+        self.assertEqual(pairs, {frozenset([a.id, b.id])})
+
+    def test_block_with_unknown_birth_year_last(self):
+        # Where the database sorts NULL last
+        rows = [dict(patient_dict('Ravi Kumar', address='12 Gandhi Road', birth_year=year), id=i) for i, year in enumerate([1990, None])]
+        self.assertEqual([(x['id'], y['id']) for _, x, y in _block_pairs(rows, 0.6, by_name=True)], [(0, 1)])
+
+    def test_merge_moves_lines_and_appointments(self):
+        keep = self.create('Ravi Kumar', '9876543210')
+        duplicate = self.create('Ravi Kumar', '9876543210')
+        enqueue_patient(duplicate, 'optometrist')
+        doctor = Doctor.objects.create(name='D', department=self.department, role='doctor', room='B1', days='Mon')
+        slot = AppointmentSlot.objects.create(doctor=doctor, department=self.department, room='B1', date='2026-01-05', start_time='09:00')
+        Appointment.objects.create(patient=duplicate, slot=slot)
+
+        self.assertEqual(merge_patients(keep, [keep, duplicate]), 1)
+        self.assertFalse(Patient.objects.filter(id=duplicate.id).exists())
+        self.assertEqual(PatientLine.objects.get().patient, keep)
+        self.assertEqual(Appointment.objects.get().patient, keep)
+
+
+class MergeActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        department = Department.objects.create(name='General')
+        self.patients = [
+            Patient.objects.create(name='Ravi Kumar', age=30, gender='M', address='-', phone='9876543210', department=department)
+            for _ in range(3)
+        ]
+        enqueue_patient(self.patients[2], 'optometrist')
+        User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+
+    def post(self, **data):
+        return self.client.post('/admin/qms/patient/', {
+            'action': 'merge_into_oldest',
+            ACTION_CHECKBOX_NAME: [patient.id for patient in self.patients],
+            **data,
+        })
+
+    def test_asks_before_merging(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin/qms/patient/merge_confirmation.html')
+        self.assertContains(response, self.patients[0].mrn)
+        self.assertContains(response, '(1 queue lines)')
+        self.assertEqual(Patient.objects.count(), 3)
+
+        response = self.post(post='yes')
+        self.assertRedirects(response, '/admin/qms/patient/')
+        self.assertEqual(list(Patient.objects.all()), self.patients[:1])
+        self.assertEqual(PatientLine.objects.get().patient, self.patients[0])
+
+    def test_needs_two_patients(self):
+        self.patients = self.patients[:1]
+        self.post(post='yes')
+        self.assertEqual(Patient.objects.count(), 3)
@@ -0,0 +1,110 @@
+import os
+import tracemalloc
+import unittest
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from qms.exports import iter_csv, iter_rows
+from qms.models import Department, Doctor, Patient, PatientLine
+from qms.queues import enqueue_patient
+
+
+def insert_lines(patient, count):
+    """``count`` completed lines for ``patient``, generated by the database."""
+    meta = PatientLine._meta
+    quote = connection.ops.quote_name
+    columns = ['queue_type', 'status', 'room', 'order_index', 'created_at', 'updated_at', 'patient_id', 'department_id']
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s) "
+            "SELECT %s, %s, %s, i, %s, %s, %s, %s FROM n",
+            [count, 'doctor', 'completed', 'B1', now, now, patient.id, patient.department_id],
+        )
+
+
+def export_peak(department):
+    """Bytes of CSV written and peak traced memory while exporting ``department``."""
+    tracemalloc.start()
+    try:
+        written = sum(len(chunk) for chunk in iter_csv(iter_rows('lines', department_id=department.id)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return written, peak
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='General')
+        doctor = Doctor.objects.create(name='D1', department=self.department, role='doctor', room='B1', days='Mon')
+        for i in range(5):
+            patient = Patient.objects.create(
+                name=f'Patient {i}', age=30, gender='M', address='-', phone='1',
+                department=self.department, doctor=doctor,
+            )
+            enqueue_patient(patient, 'doctor')
+        User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+
+    def test_export_view(self):
+        response = self.client.get('/manage/export/lines/', {'status': 'waiting', 'format': 'excel'})
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('﻿Line ID,MRN,Patient,Department,Doctor'))
+        self.assertEqual(body.count('\n'), 6)
+        self.assertIn('General,D1,doctor,waiting', body)
+
+        self.assertEqual(self.client.get('/manage/export/lines/', {'status': 'completed'}).getvalue().count(b'\n'), 1)
+        self.assertEqual(self.client.get('/manage/export/other/').status_code, 404)
+        self.assertEqual(self.client.get('/manage/export/lines/', {'start': '2026-13-45'}).status_code, 400)
+
+    def test_bad_filters_are_rejected_before_streaming(self):
+        for params in [{'department': 'abc'}, {'department': '-1'}, {'status': 'gone'}]:
+            with self.subTest(params):
+                self.assertEqual(self.client.get('/manage/export/lines/', params).status_code, 400)
+
+        response = self.client.get('/manage/export/lines/', {'department': str(self.department.id)})
+        self.assertEqual(b''.join(response.streaming_content).count(b'\n'), 6)
+
+    def test_rows_query_runs_before_streaming(self):
+        with self.assertNumQueries(1):
+            rows = iter_rows('lines', status='waiting')
+        self.assertEqual(len(list(rows)), 6)
+
+    def test_export_command(self):
+        output = StringIO()
+        call_command('export_history', 'patients', stdout=output)
+        self.assertEqual(output.getvalue().count('\n'), 6)
+
+
+class ExportMemoryTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Export')
+        self.patient = Patient.objects.create(
+            name='Patient', age=30, gender='M', address='-', phone='1', department=self.department,
+        )
+
+    def test_memory_does_not_grow_with_rows(self):
+        insert_lines(self.patient, 10000)
+        small_written, small_peak = export_peak(self.department)
+        insert_lines(self.patient, 40000)
+        written, peak = export_peak(self.department)
+
+        self.assertGreater(written, 4 * small_written)
+        self.assertLess(peak, small_peak * 1.5)
+        self.assertLess(peak, 10 * 1024 * 1024)
+
+    @tag('slow')
+    @unittest.skipUnless(os.environ.get('QMS_SLOW_TESTS'), 'set QMS_SLOW_TESTS=1 to export a million rows')
+    def test_million_rows(self):
+        insert_lines(self.patient, 1000000)
+        written, peak = export_peak(self.department)
+
+        self.assertGreater(written, 100 * 1024 * 1024)
+        self.assertLess(peak, 20 * 1024 * 1024)
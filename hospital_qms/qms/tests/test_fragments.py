@@ -0,0 +1,78 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from qms.cache import queue_version
+from qms.models import Department, Doctor, Patient, PatientCareAssignment
+from qms.queues import enqueue_patient
+
+ALL_DAYS = 'Mon,Tue,Wed,Thu,Fri,Sat,Sun'
+
+
+class FragmentInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+        self.other = Department.objects.create(name='Retina')
+        self.doctor = Doctor.objects.create(name='D1', department=self.department, role='doctor', room='B1', days=ALL_DAYS)
+
+        user = User.objects.create_user('care', password='x')
+        user.groups.add(Group.objects.create(name='Patient Care'))
+        PatientCareAssignment.objects.create(user=user, department=self.department)
+        self.client.login(username='care', password='x')
+
+    def dashboard(self):
+        return self.client.get('/patient-care/').content.decode()
+
+    def test_doctor_moving_department_leaves_the_old_queue(self):
+        self.assertIn('doctor-room-B1', self.dashboard())
+
+        doctor = Doctor.objects.get(pk=self.doctor.pk)
+        doctor.department = self.other
+        doctor.save()
+        self.assertNotIn('doctor-room-B1', self.dashboard())
+
+    def test_doctor_changing_role_bumps_both_queues(self):
+        before = queue_version(self.department.id, 'doctor'), queue_version(self.department.id, 'optometrist')
+        doctor = Doctor.objects.get(pk=self.doctor.pk)
+        doctor.role = 'optometrist'
+        doctor.save()
+        after = queue_version(self.department.id, 'doctor'), queue_version(self.department.id, 'optometrist')
+        self.assertTrue(after[0] > before[0] and after[1] > before[1])
+
+    def test_patient_edit_refreshes_their_queue(self):
+        patient = Patient.objects.create(
+            name='Old Name', age=30, gender='F', address='-', phone='1', department=self.department,
+        )
+        enqueue_patient(patient, 'doctor')
+        self.assertIn('Old Name', self.dashboard())
+
+        patient.name = 'New Name'
+        patient.emergency = True
+        patient.save()
+        self.assertIn('New Name', self.dashboard())
+
+    def test_absent_doctors_room_is_not_shown(self):
+        today = timezone.localdate()
+        Doctor.objects.create(
+            name='D2', department=self.department, role='doctor', room='B2',
+            days=(today + datetime.timedelta(days=1)).strftime('%a'),
+        )
+        self.assertIn('doctor-room-B1', self.dashboard())
+        self.assertNotIn('doctor-room-B2', self.dashboard())
+
+
+class DashboardBenchTests(TestCase):
+    def test_cold_renders_leave_other_cache_entries(self):
+        cache.set('qms:unrelated', 1)
+        output = StringIO()
+        call_command('bench_dashboard_render', waiting=5, repeat=2, stdout=output)
+        self.assertEqual(cache.get('qms:unrelated'), 1)
+
+        queries = {line[:13].strip(): int(line.split()[-2]) for line in output.getvalue().splitlines()}
+        self.assertGreater(queries['cold'], queries['warm'])
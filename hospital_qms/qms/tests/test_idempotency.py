@@ -0,0 +1,110 @@
+import threading
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from qms import views
+from qms.models import Department, Doctor, Patient, PatientLine
+from qms.queues import enqueue_patient
+
+ALL_DAYS = 'Mon,Tue,Wed,Thu,Fri,Sat,Sun'
+
+
+class IdempotencyMixin:
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+        Doctor.objects.create(name='O1', department=self.department, role='optometrist', room='A1', days=ALL_DAYS)
+        self.user = User.objects.create_user('care', password='x')
+        self.user.groups.add(Group.objects.create(name='Patient Care'))
+        self.call_next = {'queue_type': 'optometrist', 'department_id': self.department.id}
+
+    def enqueue(self, count):
+        return [
+            enqueue_patient(Patient.objects.create(
+                name=f'Patient {i}', age=30, gender='M', address='-', phone='1', department=self.department,
+            ), 'optometrist')
+            for i in range(count)
+        ]
+
+    def calling(self):
+        return PatientLine.objects.filter(department=self.department, status='calling').count()
+
+
+class IdempotencyKeyTests(IdempotencyMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='care', password='x')
+        self.enqueue(3)
+
+    def test_repeated_key_replays_the_response(self):
+        first = self.client.post('/api/call-next/', self.call_next, headers={'Idempotency-Key': 'k1'})
+        repeat = self.client.post('/api/call-next/', self.call_next, headers={'Idempotency-Key': 'k1'})
+        self.assertEqual(repeat.content, first.content)
+        self.assertEqual(repeat['Idempotent-Replay'], 'true')
+        self.assertEqual(self.calling(), 1)
+
+        other = self.client.post('/api/call-next/', self.call_next, headers={'Idempotency-Key': 'k2'})
+        self.assertFalse(other.has_header('Idempotent-Replay'))
+
+    def test_key_is_scoped_to_the_endpoint(self):
+        called = self.client.post('/api/call-next/', self.call_next, headers={'Idempotency-Key': 'k1'}).json()
+        line = PatientLine.objects.get(status='calling')
+
+        response = self.client.post('/api/start-processing/', {'patient_line_id': line.id}, headers={'Idempotency-Key': 'k1'})
+        self.assertFalse(response.has_header('Idempotent-Replay'))
+        self.assertNotEqual(response.json(), called)
+        line.refresh_from_db()
+        self.assertEqual(line.status, 'processing')
+
+
+class ConcurrentRequestTests(IdempotencyMixin, TransactionTestCase):
+    REQUESTS = 100
+
+    def fire(self, view, path, data, headers=None):
+        """Send ``REQUESTS`` identical requests at once; returns the responses."""
+        factory = RequestFactory()
+        barrier = threading.Barrier(self.REQUESTS)
+        responses = []
+
+        def send():
+            request = factory.post(path, data, headers=headers or {})
+            request.user = self.user
+            barrier.wait()
+            try:
+                responses.append(view(request))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send) for _ in range(self.REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_identical_requests_change_state_once(self):
+        for label, headers in [('coalesced', None), ('keyed', {'Idempotency-Key': 'burst'})]:
+            with self.subTest(label):
+                cache.clear()
+                PatientLine.objects.all().delete()
+                self.enqueue(5)
+
+                responses = self.fire(views.call_next_patient, '/api/call-next/', self.call_next, headers)
+                self.assertEqual(len(responses), self.REQUESTS)
+                self.assertEqual(self.calling(), 1)
+                self.assertEqual(len({response.content for response in responses}), 1)
+                self.assertEqual(sum(response.has_header('Idempotent-Replay') for response in responses), self.REQUESTS - 1)
+
+    def test_repeated_complete_creates_one_next_stage(self):
+        [line] = self.enqueue(1)
+        line.status = 'processing'
+        line.save()
+
+        self.fire(
+            views.complete_patient, '/api/complete-patient/', {'patient_line_id': line.id},
+            {'Idempotency-Key': 'complete'},
+        )
+        self.assertEqual(PatientLine.objects.filter(patient=line.patient, queue_type='doctor').count(), 1)
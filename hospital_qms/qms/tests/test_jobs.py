@@ -0,0 +1,162 @@
+import collections
+import datetime
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from qms.jobs import Worker, claim_jobs, enqueue, job, job_stats, run_job, schedule_recurring
+from qms.models import Job
+
+runs = collections.Counter()
+runs_lock = threading.Lock()
+
+
+@job('tests.record')
+def record(key, work_ms=0):
+    if work_ms:
+        time.sleep(work_ms / 1000)
+    with runs_lock:
+        runs[key] += 1
+
+
+@job('tests.fail')
+def fail():
+    raise RuntimeError('job failed')
+
+
+class JobTests(TransactionTestCase):
+    def setUp(self):
+        runs.clear()
+
+    def test_claims_due_jobs_by_priority(self):
+        enqueue('tests.record', {'key': 1})
+        enqueue('tests.record', {'key': 2}, priority=5)
+        enqueue('tests.record', {'key': 3}, run_at=timezone.now() + datetime.timedelta(hours=1))
+
+        claimed = claim_jobs('w1', 5)
+        self.assertEqual([claimed_job.kwargs['key'] for claimed_job in claimed], [2, 1])
+        self.assertEqual(claim_jobs('w2', 5), [])
+        for claimed_job in claimed:
+            self.assertTrue(run_job(claimed_job))
+        self.assertEqual(runs, {1: 1, 2: 1})
+
+    def test_retries_with_backoff_then_fails(self):
+        queued = enqueue('tests.fail', max_attempts=2)
+        self.assertFalse(run_job(claim_jobs('w', 1)[0]))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: job failed', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now() + datetime.timedelta(seconds=20))
+
+        Job.objects.update(run_at=timezone.now())
+        run_job(claim_jobs('w', 1)[0])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue('tests.record', {'key': 1})
+        [dead] = claim_jobs('dead', 1, lease_seconds=-1)
+        [alive] = claim_jobs('alive', 1)
+        self.assertEqual((alive.id, alive.attempts), (dead.id, 2))
+
+        # The worker that lost its lease can't overwrite the new one
+        run_job(dead)
+        self.assertEqual(Job.objects.get().locked_by, 'alive')
+        self.assertTrue(run_job(alive))
+
+    def test_job_that_kills_its_worker_runs_out_of_attempts(self):
+        queued = enqueue('tests.record', {'key': 1}, max_attempts=2)
+        for worker_id in ['dead1', 'dead2']:
+            claim_jobs(worker_id, 1, lease_seconds=-1)
+
+        self.assertEqual(claim_jobs('alive', 1), [])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.locked_until), ('failed', 2, None))
+        self.assertIn('Lease expired', queued.last_error)
+        self.assertEqual(runs, {})
+
+    def test_long_job_keeps_its_lease(self):
+        enqueue('tests.record', {'key': 1, 'work_ms': 1000})
+        [claimed] = claim_jobs('slow', 1, lease_seconds=0.3)
+        runner = threading.Thread(target=run_job, args=(claimed,))
+        runner.start()
+        try:
+            time.sleep(0.6)
+            self.assertEqual(claim_jobs('other', 1), [])
+        finally:
+            runner.join()
+
+        self.assertEqual(runs, {1: 1})
+        finished = Job.objects.get()
+        self.assertEqual((finished.status, finished.attempts, finished.locked_by), ('succeeded', 1, 'slow'))
+
+    @override_settings(QMS_RECURRING_JOBS={'tick': {'job': 'tests.record', 'every': 60, 'kwargs': {'key': 0}}})
+    def test_recurring_jobs_are_queued_once_per_period(self):
+        now = timezone.now()
+        schedule_recurring(now)
+        schedule_recurring(now)
+        self.assertEqual(Job.objects.count(), 1)
+        schedule_recurring(now + datetime.timedelta(seconds=61))
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_stats(self):
+        for key in range(3):
+            enqueue('tests.record', {'key': key})
+        enqueue('tests.fail', max_attempts=1)
+        worker = Worker(threads=2, poll=0.05, burst=True)
+        worker.run()
+
+        self.assertEqual((worker.succeeded, worker.failed), (3, 1))
+        self.assertEqual(job_stats()['statuses'], {'succeeded': 3, 'failed': 1})
+        output = StringIO()
+        call_command('qms_worker', '--stats', stdout=output)
+        self.assertIn('tests.record', output.getvalue())
+
+
+class WorkerThroughputTests(TransactionTestCase):
+    JOBS = 120
+    WORK_MS = 20
+
+    def setUp(self):
+        runs.clear()
+
+    def run_workers(self, count, threads, batch=1):
+        """Seconds for ``count`` concurrent workers to drain the queue."""
+        now = timezone.now()
+        Job.objects.bulk_create([
+            Job(name='tests.record', kwargs={'key': key, 'work_ms': self.WORK_MS}, run_at=now)
+            for key in range(self.JOBS)
+        ])
+        workers = [Worker(threads=threads, poll=0.05, burst=True, batch=batch, name=f'w{i}') for i in range(count)]
+        runners = [threading.Thread(target=worker.run) for worker in workers]
+        started = time.perf_counter()
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(sum(worker.succeeded for worker in workers), self.JOBS)
+        self.assertEqual(sum(worker.failed for worker in workers), 0)
+        return elapsed
+
+    def test_every_job_runs_exactly_once(self):
+        for count, threads, batch in [(1, 1, 1), (3, 4, 1), (3, 4, 10)]:
+            with self.subTest(workers=count, threads=threads, batch=batch):
+                runs.clear()
+                Job.objects.all().delete()
+                self.run_workers(count, threads, batch)
+                self.assertEqual(set(runs), set(range(self.JOBS)))
+                self.assertEqual(set(runs.values()), {1})
+                self.assertEqual(Job.objects.exclude(status='succeeded').count(), 0)
+
+    def test_concurrent_workers_raise_throughput(self):
+        single = self.run_workers(1, 1)
+        Job.objects.all().delete()
+        concurrent = self.run_workers(3, 4)
+        # Jobs wait on I/O, so twelve threads finish far sooner than one
+        self.assertLess(concurrent, single / 2)
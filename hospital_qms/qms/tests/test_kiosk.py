@@ -0,0 +1,52 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from qms.models import Department, Kiosk, KioskCheckIn, Patient, PatientLine
+
+
+class KioskCheckInTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+        self.kiosk = Kiosk.objects.create(name='Lobby')
+        self.patient = Patient.objects.create(
+            name='Patient', age=30, gender='M', address='-', phone='0123 456', department=self.department,
+        )
+
+    def post(self, entries, token=None):
+        return self.client.post(
+            '/api/kiosk/check-in/', json.dumps({'check_ins': entries}),
+            content_type='application/json', HTTP_X_KIOSK_TOKEN=token or self.kiosk.token,
+        )
+
+    def test_batch(self):
+        self.assertEqual(self.post([], token='unknown').status_code, 401)
+
+        results = self.post([
+            {'key': 'k1', 'mrn': self.patient.mrn},
+            {'key': 'k2', 'phone': ' 0123 456'},
+            {'key': 'k3', 'mrn': 'MRN-0000-0000'},
+            {'mrn': self.patient.mrn},
+        ]).json()['results']
+        self.assertEqual([result['success'] for result in results], [True, True, False, False])
+        self.assertEqual(results[0]['patient_line_id'], results[1]['patient_line_id'])
+        self.assertEqual(PatientLine.objects.filter(patient=self.patient).count(), 1)
+
+        # A resent batch replays the stored result
+        replay = self.post([{'key': 'k1', 'mrn': self.patient.mrn}]).json()['results']
+        self.assertEqual(replay[0]['patient_line_id'], results[0]['patient_line_id'])
+        self.assertEqual(KioskCheckIn.objects.count(), 2)
+
+    def test_non_string_fields_fail_only_their_entry(self):
+        response = self.post([
+            {'key': 'k1', 'mrn': 42},
+            {'key': 'k2', 'phone': ['0123 456']},
+            {'key': 'k3', 'mrn': {'value': self.patient.mrn}},
+            {'key': 'k4', 'mrn': self.patient.mrn},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['success'] for result in results], [False, False, False, True])
+        self.assertEqual(results[0]['error'], 'mrn and phone must be strings')
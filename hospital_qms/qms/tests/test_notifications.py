@@ -0,0 +1,154 @@
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from qms import tasks
+from qms.models import Department, Notification, Patient
+from qms.notifications import claim_batch, claim_within_rate, notify_approaching, send_batch
+from qms.queues import enqueue_patient
+from qms.senders import BaseSender
+
+
+class RecordingSender(BaseSender):
+    """Keeps what it was asked to send; ``errors`` are returned for each batch in turn."""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = list(errors or [])
+
+    def send_messages(self, notifications):
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return [error] * len(notifications)
+        self.sent.extend(notification.message for notification in notifications)
+        return [None] * len(notifications)
+
+
+@override_settings(QMS_NOTIFY_POSITION=3)
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='General')
+
+    def enqueue(self, count, phone='9000000000'):
+        return [
+            enqueue_patient(Patient.objects.create(
+                name=f'Patient {i}', age=30, gender='M', address='-', phone=phone, department=self.department,
+            ), 'optometrist')
+            for i in range(count)
+        ]
+
+    def kinds(self, line):
+        return sorted(line.notifications.values_list('kind', flat=True))
+
+
+class TriggerTests(NotificationTestCase):
+    def test_first_places_are_told_they_are_close(self):
+        lines = self.enqueue(4)
+        self.assertEqual([self.kinds(line) for line in lines], [['approaching']] * 3 + [[]])
+
+    def test_calling_moves_the_next_patient_up(self):
+        lines = self.enqueue(4)
+        lines[0].status = 'calling'
+        lines[0].room = 'A1'
+        lines[0].called_at = timezone.now()
+        lines[0].save()
+
+        self.assertEqual(self.kinds(lines[0]), ['approaching', 'called'])
+        self.assertIn('room A1', lines[0].notifications.get(kind='called').message)
+        self.assertEqual(self.kinds(lines[3]), ['approaching'])
+        self.assertIn('you are number 3 in the optometrist queue', lines[3].notifications.get().message)
+
+    def test_repeated_triggers_are_deduplicated(self):
+        [line] = self.enqueue(1)
+        notify_approaching(line, 1)
+        line.save()
+        self.assertEqual(self.kinds(line), ['approaching'])
+
+    def test_no_phone_no_message(self):
+        self.enqueue(2, phone='')
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(QMS_NOTIFY_POSITION=None)
+    def test_position_messages_can_be_turned_off(self):
+        self.enqueue(2)
+        self.assertFalse(Notification.objects.exists())
+
+
+class DeliveryTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lines = self.enqueue(3)
+
+    def test_claimed_rows_are_leased(self):
+        first = claim_batch(2)
+        self.assertEqual(len(first), 2)
+        self.assertTrue(all(notification.status == 'sending' for notification in first))
+        self.assertEqual(len(claim_batch(5)), 1)
+        self.assertEqual(claim_batch(5), [])
+
+        # A worker died holding the lease
+        Notification.objects.filter(id=first[0].id).update(next_attempt_at=timezone.now())
+        self.assertEqual([notification.id for notification in claim_batch(5)], [first[0].id])
+
+    def test_failures_back_off_then_give_up(self):
+        sender = RecordingSender(errors=['gateway busy'])
+        self.assertEqual(send_batch(sender, claim_batch(5)), (0, 3))
+        notification = Notification.objects.first()
+        self.assertEqual((notification.status, notification.attempts, notification.last_error), ('pending', 1, 'gateway busy'))
+        self.assertGreater(notification.next_attempt_at, timezone.now() + datetime.timedelta(seconds=25))
+        self.assertEqual(claim_batch(5), [])
+
+        with override_settings(QMS_NOTIFY_MAX_ATTEMPTS=2):
+            Notification.objects.update(next_attempt_at=timezone.now())
+            send_batch(RecordingSender(errors=[RuntimeError('down')]), claim_batch(5))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 2))
+        self.assertEqual(notification.last_error, 'RuntimeError: down')
+
+    def test_sends_and_skips_stale_messages(self):
+        self.lines[0].status = 'processing'
+        self.lines[0].save()
+        sender = RecordingSender()
+
+        self.assertEqual(send_batch(sender, claim_batch(5)), (2, 0))
+        self.assertEqual(len(sender.sent), 2)
+        self.assertEqual(Notification.objects.get(patient_line=self.lines[0]).status, 'skipped')
+        self.assertEqual(Notification.objects.filter(status='sent', attempts=1).count(), 2)
+
+
+class RateLimitTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enqueue(3)
+        for line in self.enqueue(3):
+            line.status = 'calling'
+            line.save()
+        self.assertEqual(Notification.objects.count(), 6)
+
+    def test_claims_share_one_allowance(self):
+        self.assertEqual(len(claim_within_rate(4, rate=5)), 4)
+        self.assertEqual(len(claim_within_rate(4, rate=5)), 1)
+        self.assertEqual(claim_within_rate(4, rate=5), [])
+
+    def test_unused_allowance_is_given_back(self):
+        Notification.objects.update(status='sent')
+        self.assertEqual(claim_within_rate(5, rate=5), [])
+        Notification.objects.update(status='pending')
+        self.assertEqual(len(claim_within_rate(5, rate=5)), 5)
+
+    @override_settings(QMS_NOTIFY_RATE_PER_MINUTE=4, QMS_NOTIFY_BACKEND='qms.tests.test_notifications.RecordingSender')
+    def test_job_and_command_do_not_double_the_rate(self):
+        tasks.send_notifications()
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 4)
+
+        output = StringIO()
+        call_command('send_notifications', '--once', stdout=output)
+        self.assertIn('Sent 0 notifications', output.getvalue())
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 4)
@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from qms.models import Department, Doctor, Patient
+from qms.queues import enqueue_patient, get_queue_depths, select_next_line, select_overflow_line
+
+ALL_DAYS = 'Mon,Tue,Wed,Thu,Fri,Sat,Sun'
+
+
+@override_settings(QMS_OVERFLOW_RULES=[
+    {'roles': ['optometrist'], 'departments': ['Retina', 'General'], 'max_imbalance': 2},
+])
+class OverflowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.retina = Department.objects.create(name='Retina')
+        self.general = Department.objects.create(name='General')
+        Doctor.objects.create(name='R', department=self.retina, role='optometrist', room='A1', days=ALL_DAYS)
+        Doctor.objects.create(name='G', department=self.general, role='optometrist', room='A1', days=ALL_DAYS)
+
+    def enqueue(self, count):
+        return [
+            enqueue_patient(Patient.objects.create(
+                name=f'Patient {i}', age=30, gender='M', address='-', phone='1', department=self.retina,
+            ), 'optometrist')
+            for i in range(count)
+        ]
+
+    def test_idle_room_takes_from_the_longer_queue(self):
+        lines = self.enqueue(5)
+        self.assertEqual(
+            get_queue_depths([self.retina.id, self.general.id], 'optometrist'),
+            {self.retina.id: 5, self.general.id: 0},
+        )
+        self.assertEqual(select_next_line(self.general.id, 'optometrist'), (lines[0], 'A1'))
+
+    def test_within_imbalance_nothing_overflows(self):
+        self.enqueue(2)
+        self.assertEqual(select_next_line(self.general.id, 'optometrist'), (None, None))
+
+    def test_missing_department(self):
+        self.enqueue(5)
+        self.assertIsNone(select_overflow_line(None, 'optometrist'))
+        self.assertIsNone(select_overflow_line('', 'optometrist'))
@@ -0,0 +1,118 @@
+import datetime
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from qms.models import Department, PathwayStage, Patient, PatientLine
+from qms.pathways import complete_stage, get_pathway, unlocked_stages
+from qms.queues import enqueue_patient
+
+
+class PathwayMixin:
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Eye')
+        self.patient = Patient.objects.create(
+            name='Patient', age=30, gender='M', address='-', phone='1', department=self.department,
+        )
+
+    def create_pathway(self, stages):
+        """``stages`` is a list of ``(queue_type, required queue types)``."""
+        created = {}
+        for order, (queue_type, requires) in enumerate(stages):
+            created[queue_type] = PathwayStage.objects.create(
+                department=self.department, queue_type=queue_type, name=queue_type.title(), order=order,
+            )
+            created[queue_type].requires.set([created[required] for required in requires])
+        return get_pathway(self.department.id)
+
+
+PARALLEL_PATHWAY = [
+    ('refraction', []), ('dilation', ['refraction']), ('imaging', ['refraction']),
+    ('doctor', ['dilation', 'imaging']),
+]
+
+
+class PathwayTests(PathwayMixin, TestCase):
+
+    def test_default_pathway(self):
+        line = enqueue_patient(self.patient, 'optometrist')
+        self.assertEqual([line.queue_type for line in complete_stage(line)], ['doctor'])
+
+        # Straight to the doctor: nothing to unlock
+        other = Patient.objects.create(name='Other', age=30, gender='M', address='-', phone='2', department=self.department)
+        self.assertEqual(complete_stage(enqueue_patient(other, 'doctor')), [])
+
+    def test_parallel_stages_wait_for_each_other(self):
+        self.create_pathway(PARALLEL_PATHWAY)
+
+        unlocked = complete_stage(enqueue_patient(self.patient, 'refraction'))
+        self.assertEqual(sorted(line.queue_type for line in unlocked), ['dilation', 'imaging'])
+        dilation, imaging = sorted(unlocked, key=lambda line: line.queue_type)
+        self.assertEqual(complete_stage(dilation), [])
+        self.assertEqual([line.queue_type for line in complete_stage(imaging)], ['doctor'])
+
+    def test_returning_patient_goes_through_the_pathway_again(self):
+        doctor_line = complete_stage(enqueue_patient(self.patient, 'optometrist'))[0]
+        complete_stage(doctor_line)
+        # Move the first visit to yesterday
+        yesterday = doctor_line.token_date - datetime.timedelta(days=1)
+        PatientLine.objects.filter(patient=self.patient).update(
+            token_date=yesterday, created_at=doctor_line.created_at - datetime.timedelta(days=1),
+        )
+
+        unlocked = complete_stage(enqueue_patient(self.patient, 'optometrist'))
+        self.assertEqual([line.queue_type for line in unlocked], ['doctor'])
+        self.assertEqual(PatientLine.objects.filter(patient=self.patient, queue_type='doctor').count(), 2)
+
+    def test_skipped_stage_still_has_to_be_completed(self):
+        # The doctor needs refraction directly and, through imaging, dilation
+        pathway = self.create_pathway([
+            ('refraction', []), ('dilation', ['refraction']), ('imaging', ['dilation']),
+            ('doctor', ['refraction', 'imaging']),
+        ])
+        self.assertEqual(unlocked_stages(pathway, 'refraction', {'refraction': 'completed'}), ['dilation'])
+
+        line = enqueue_patient(self.patient, 'refraction')
+        for queue_type in ['dilation', 'imaging', 'doctor']:
+            [line] = complete_stage(line)
+            self.assertEqual(line.queue_type, queue_type)
+        self.assertEqual(complete_stage(line), [])
+
+    def test_patient_who_entered_later_skips_earlier_stages(self):
+        pathway = self.create_pathway(PARALLEL_PATHWAY)
+        # Sent straight to imaging: refraction and dilation are not part of the visit
+        self.assertEqual(unlocked_stages(pathway, 'imaging', {'imaging': 'completed'}), ['doctor'])
+        # Imaging still open after a refraction: the doctor waits
+        self.assertEqual(
+            unlocked_stages(pathway, 'dilation', {'refraction': 'completed', 'dilation': 'completed'}),
+            [],
+        )
+
+
+class ConcurrentCompletionTests(PathwayMixin, TransactionTestCase):
+    def test_parallel_stages_finishing_together_unlock_the_join(self):
+        self.create_pathway(PARALLEL_PATHWAY)
+        lines = complete_stage(enqueue_patient(self.patient, 'refraction'))
+        barrier = threading.Barrier(len(lines))
+        errors = []
+
+        def complete(line):
+            barrier.wait()
+            try:
+                complete_stage(line)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=complete, args=(line,)) for line in lines]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(PatientLine.objects.filter(patient=self.patient, queue_type='doctor').count(), 1)
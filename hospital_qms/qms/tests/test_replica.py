@@ -0,0 +1,97 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TransactionTestCase
+
+from qms.models import Department, Doctor
+from qms.routers import PIN_COOKIE, REPLICA, reset_replica_health
+
+
+@unittest.skipIf(REPLICA in connections, 'the test sets up its own replica')
+@unittest.skipUnless(connections['default'].vendor == 'sqlite', 'the replica is a copy of an SQLite database')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The primary is the test database and the replica a file copied from
+    it; rows written after the copy exist on the primary only, as if
+    replication lagged.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'replica.sqlite3')
+        connections.settings[REPLICA] = connections.configure_settings({
+            'default': connections.settings['default'],
+            REPLICA: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': f'file:{cls.path}?mode=ro',
+                # Holds the same rows as the primary, so it is never flushed
+                'TEST': {'MIRROR': 'default'},
+            },
+        })[REPLICA]
+        # Only now, as the test runner sets up and checks the aliases it
+        # finds on test classes before the replica exists
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        reset_replica_health()
+        self.addCleanup(reset_replica_health)
+        self.department = Department.objects.create(name='General')
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        self.snapshot()
+        Doctor.objects.create(name='Only On Primary', department=self.department, role='doctor', room='B1', days='Mon')
+
+    def snapshot(self):
+        # Stands in for replication: a consistent copy of the primary
+        connections[REPLICA].close()
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(self.path)
+        try:
+            connections['default'].connection.backup(replica)
+            replica.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            replica.close()
+
+    def sees_new_doctor(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return 'Only On Primary' in response.content.decode()
+
+    def test_reads_go_to_the_replica(self):
+        self.assertFalse(self.sees_new_doctor('/manage/'))
+        self.assertFalse(self.sees_new_doctor('/admin/qms/doctor/'))
+
+    def test_own_write_pins_reads_to_the_primary(self):
+        self.client.post('/manage/doctors/', {
+            'name': 'Added By Me', 'department': self.department.id, 'role': 'doctor', 'room': 'B2', 'days': 'Mon',
+        })
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        self.assertTrue(self.sees_new_doctor('/manage/'))
+
+        # Once the pin expires reads go back to the replica
+        del self.client.cookies[PIN_COOKIE]
+        self.assertFalse(self.sees_new_doctor('/manage/'))
+
+    def test_falls_back_to_the_primary(self):
+        os.rename(self.path, self.path + '.offline')
+        connections[REPLICA].close()
+
+        # Still marked healthy: the view fails on the replica and runs again on the primary
+        self.assertTrue(self.sees_new_doctor('/manage/'))
+        # Now marked down, so reads skip the replica
+        self.assertTrue(self.sees_new_doctor('/manage/'))
+        self.assertTrue(self.sees_new_doctor('/admin/qms/doctor/'))
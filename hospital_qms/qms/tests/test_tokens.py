@@ -0,0 +1,134 @@
+import datetime
+import threading
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from qms import views
+from qms.forms import DepartmentForm
+from qms.models import Department, Patient, PatientLine, TokenCounter
+from qms.pathways import complete_stage
+from qms.queues import enqueue_patient, find_line_by_token
+from qms.tokens import default_prefix, hospital_date
+
+
+class TokenPrefixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_default_prefix_skips_taken_ones(self):
+        radiology = Department.objects.create(name='Radiology')
+        retina = Department.objects.create(name='Retina')
+        rehab = Department.objects.create(name='Re-hab')
+        self.assertEqual(radiology.token_prefix, 'R')
+        self.assertEqual(retina.token_prefix, 'RE')
+        self.assertEqual(rehab.token_prefix, 'RH')
+        self.assertEqual(default_prefix('R', {'R'}), 'RA')
+
+    def test_prefixes_are_unique(self):
+        Department.objects.create(name='Radiology')
+        with self.assertRaises(IntegrityError):
+            Department.objects.create(name='Retina', token_prefix='r')
+
+    def test_form_takes_letters_only(self):
+        Department.objects.create(name='Radiology')
+        form = DepartmentForm(data={'name': 'Retina', 'token_prefix': 'R1'})
+        self.assertIn('token_prefix', form.errors)
+        form = DepartmentForm(data={'name': 'Retina', 'token_prefix': 'r'})
+        self.assertFalse(form.is_valid())
+        form = DepartmentForm(data={'name': 'Retina', 'token_prefix': 'rt'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().token_prefix, 'RT')
+
+    def test_token_names_its_department(self):
+        radiology = Department.objects.create(name='Radiology')
+        retina = Department.objects.create(name='Retina')
+        lines = {}
+        for department in [retina, radiology]:
+            patient = Patient.objects.create(
+                name=department.name, age=30, gender='M', address='-', phone='1', department=department,
+            )
+            lines[department.token_prefix] = enqueue_patient(patient, 'optometrist')
+
+        self.assertEqual(lines['R'].token, 'R-1')
+        self.assertEqual(lines['RE'].token, 'RE-1')
+        self.assertEqual(find_line_by_token('r-1'), lines['R'])
+        self.assertEqual(find_line_by_token('RE1'), lines['RE'])
+        self.assertIsNone(find_line_by_token('X-1'))
+
+
+class RegistrationTokenTests(TransactionTestCase):
+    REGISTRATIONS = 50
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Queue', token_prefix='Q')
+        self.user = User.objects.create_user('counter')
+
+    def register_at_once(self):
+        """Register ``REGISTRATIONS`` patients at the same moment; returns the responses."""
+        factory = RequestFactory()
+        barrier = threading.Barrier(self.REGISTRATIONS)
+        responses = []
+
+        def register(i):
+            request = factory.post('/register-patient/', {
+                'name': f'Patient {i}', 'age': 20 + i % 60, 'gender': 'O', 'address': f'{i} Main Street',
+                'phone': f'9{i:09d}', 'department': self.department.id, 'confirm_new': '1',
+            })
+            request.user = self.user
+            barrier.wait()
+            try:
+                responses.append(views.register_patient(request))
+            except Exception as e:
+                responses.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=register, args=(i,)) for i in range(self.REGISTRATIONS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_parallel_registrations_get_gapless_tokens(self):
+        responses = self.register_at_once()
+
+        self.assertEqual([r for r in responses if isinstance(r, Exception)], [])
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(Patient.objects.values('mrn').distinct().count(), self.REGISTRATIONS)
+        tokens = sorted(PatientLine.objects.filter(department=self.department).values_list('patient_id', 'token_number').distinct())
+        self.assertEqual(sorted(number for _, number in tokens), list(range(1, self.REGISTRATIONS + 1)))
+
+    def test_visit_keeps_its_token(self):
+        patient = Patient.objects.create(name='Visit', age=30, gender='O', address='-', phone='', department=self.department)
+        line = enqueue_patient(patient, 'optometrist')
+        line.status = 'processing'
+        line.save()
+
+        next_lines = complete_stage(line)
+        self.assertTrue(next_lines)
+        self.assertEqual({next_line.token for next_line in next_lines}, {'Q-1'})
+        self.assertEqual(find_line_by_token('q-1').patient, patient)
+
+    def test_rolled_back_number_is_reissued(self):
+        with transaction.atomic():
+            patient = Patient.objects.create(name='Back', age=30, gender='O', address='-', phone='', department=self.department)
+            taken = enqueue_patient(patient, 'optometrist').token_number
+            transaction.set_rollback(True)
+
+        patient = Patient.objects.create(name='Next', age=30, gender='O', address='-', phone='', department=self.department)
+        self.assertEqual(enqueue_patient(patient, 'optometrist').token_number, taken)
+
+    @override_settings(QMS_HOSPITAL_TIME_ZONE='Asia/Kolkata')
+    def test_numbers_restart_at_the_hospitals_midnight(self):
+        # 00:30 in Kolkata is still the previous day in UTC
+        midnight = datetime.datetime(2026, 1, 2, 0, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30)))
+        day = hospital_date(midnight)
+        self.assertEqual(day, datetime.date(2026, 1, 2))
+
+        TokenCounter.objects.create(department=self.department, date=day - datetime.timedelta(days=1), last=40)
+        self.assertEqual(TokenCounter.next_number(self.department.id, day), 1)
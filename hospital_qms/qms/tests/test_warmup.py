@@ -0,0 +1,24 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase
+
+from qms import warmup
+
+
+class WarmUpTests(TestCase):
+    def test_runs_every_step(self):
+        timings = warmup.warm_up()
+        self.assertEqual([step for step, _, _ in timings], [name for name, _ in warmup.STEPS])
+        self.assertTrue(all(count is not None for _, count, _ in timings))
+
+    def test_failed_step_is_logged_and_skipped(self):
+        def missing_tables():
+            raise OperationalError('no such table: qms_department')
+
+        steps = [('first', lambda: 1), ('reference data', missing_tables), ('last', lambda: 2)]
+        with mock.patch.object(warmup, 'STEPS', steps), self.assertLogs('qms.warmup', 'ERROR') as logs:
+            timings = warmup.warm_up()
+
+        self.assertEqual([(step, count) for step, count, _ in timings], [('first', 1), ('reference data', None), ('last', 2)])
+        self.assertIn("Warm-up step 'reference data' failed", logs.output[0])
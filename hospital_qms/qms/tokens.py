@@ -0,0 +1,93 @@
+"""
+Short daily token numbers ("R-17") for calling patients.
+
+Each department numbers its patients from 1 every day, by the hospital's
+calendar (QMS_HOSPITAL_TIME_ZONE). A new PatientLine takes the next
+number from its department's TokenCounter row in the transaction that
+creates the line, so numbers are never skipped or handed out twice and
+no queue rows are counted. A patient keeps their token for the rest of
+the day's visit to the department, across pathway stages.
+"""
+import contextlib
+import itertools
+import re
+import string
+import zoneinfo
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+TOKEN_PATTERN = re.compile(r'^\s*([A-Za-z]{1,3})\s*-?\s*(\d+)\s*$')
+# Department prefixes; digits would run into the number ("R1-7")
+PREFIX_PATTERN = re.compile(r'^[A-Za-z]{1,3}$')
+
+
+def hospital_date(now=None):
+    """Today's date where the hospital is, which is when tokens start again."""
+    time_zone = getattr(settings, 'QMS_HOSPITAL_TIME_ZONE', None) or settings.TIME_ZONE
+    return timezone.localtime(now or timezone.now(), zoneinfo.ZoneInfo(time_zone)).date()
+
+
+def default_prefix(name, taken=()):
+    """
+    The first letter of ``name``, or if another department has it, the
+    first letter followed by later letters of the name ("RE" for Retina
+    next to Radiology), and failing those, by any other letters.
+    """
+    letters = [c.upper() for c in name if c in string.ascii_letters] or ['T']
+    first, rest = letters[0], letters[1:]
+    candidates = itertools.chain(
+        [first],
+        (first + c for c in rest),
+        (first + a + b for a, b in itertools.combinations(rest, 2)),
+        (first + c for c in string.ascii_uppercase),
+        (first + a + b for a, b in itertools.product(string.ascii_uppercase, repeat=2)),
+    )
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate
+    raise ValueError(f'No free token prefix for {name!r}')
+
+
+@contextlib.contextmanager
+def numbering_atomic(using=None):
+    """
+    ``transaction.atomic()`` for blocks that read the last MRN or token
+    number before writing the next one.
+
+    On SQLite a plain transaction that has read cannot always take the
+    write lock later and fails with "database is locked"; this one starts
+    with BEGIN IMMEDIATE, so concurrent registrations wait their turn
+    (up to the connection timeout) instead. Nested in another atomic block
+    it is a savepoint, and the outer block decides.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # The mode is read from the settings on connect, so connect first
+    connection.ensure_connection()
+    mode, connection.transaction_mode = connection.transaction_mode, 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def format_token(prefix, number):
+    if number is None:
+        return ''
+    return f'{prefix}-{number}'
+
+
+def parse_token(text):
+    """``(prefix, number)`` for input such as "R-17" or "r17", else None."""
+    match = TOKEN_PATTERN.match(text or '')
+    if not match:
+        return None
+    return match.group(1).upper(), int(match.group(2))
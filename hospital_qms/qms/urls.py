@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Authentication
@@ -24,6 +24,8 @@ urlpatterns = [
     path('edit/doctor/<int:pk>/', views.edit_doctor, name='edit_doctor'),
     path('delete/doctor/<int:pk>/', views.delete_doctor, name='delete_doctor'),
     
+    path('manage/export/<str:kind>/', views.export_history, name='export_history'),
+    
     path('manage/patient-care/', views.manage_patient_care_assignments, name='manage_patient_care_assignments'),
     path('delete/patient-care/<int:pk>/', views.delete_patient_care_assignment, name='delete_patient_care_assignment'),
     
@@ -33,4 +35,26 @@ urlpatterns = [
     path('api/complete-patient/', views.complete_patient, name='complete_patient'),
     path('api/hold-patient/', views.hold_patient, name='hold_patient'),
     path('api/return-to-queue/', views.return_to_queue, name='return_to_queue'),
-]
\ No newline at end of file
+    
+    # Kiosk self check-in
+    path('kiosk/', views.kiosk_view, name='kiosk'),
+    path('api/kiosk/check-in/', views.kiosk_check_in, name='kiosk_check_in'),
+    
+    # Waiting area display boards
+    path('display/<slug:area>/', views.display_board, name='display_board'),
+    path('api/announcements/<slug:area>/', views.poll_announcements, name='poll_announcements'),
+    path('api/announcements/audio/<slug:locale>/<slug:token>/<slug:room>.wav', views.announcement_audio, name='announcement_audio'),
+    
+    # Appointments
+    path('api/appointments/availability/', views.appointment_availability, name='appointment_availability'),
+    path('api/appointments/slots/<int:doctor_id>/<str:date>/', views.appointment_slots, name='appointment_slots'),
+    path('api/appointments/book/', views.book_appointment, name='book_appointment'),
+    path('api/appointments/cancel/', views.cancel_appointment_view, name='cancel_appointment'),
+    path('api/appointments/check-in/', views.check_in_appointment, name='check_in_appointment'),
+    
+    # Read API, version 1
+    path('api/v1/departments/', api.departments, name='api_departments'),
+    path('api/v1/doctors/', api.doctors, name='api_doctors'),
+    path('api/v1/patients/', api.patients, name='api_patients'),
+    path('api/v1/lines/', api.lines, name='api_lines'),
+]
@@ -1,13 +1,36 @@
+import datetime
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.models import User, Group
-from django.http import JsonResponse
+from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
-from .models import Department, Doctor, Patient, PatientCareAssignment, PatientLine
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+from django.middleware.csrf import get_token
+from django.conf import settings
+from .models import Appointment, Department, Doctor, Patient, PatientCareAssignment, PatientLine
 from .forms import PatientForm, DoctorForm, DepartmentForm, PatientCareAssignmentForm
+from .queues import ACTIVE_STATUSES, enqueue_patient, find_line_by_token, select_next_line
+from .pathways import complete_stage, get_pathway, initial_queue_types
+from .announcements import MissingClip, get_announcements, get_locales, render_announcement
+from .cache import queue_version, registrations_version
+from .exports import iter_csv, iter_rows
+from .duplicates import find_duplicates
+from .idempotency import idempotent
+from .kiosk import OPEN_STATUSES, get_kiosk, process_batch
+from .reference import get_departments
+from .routers import replica_view
+from .appointments import book_slot, cancel_appointment, check_in, get_free_slots, search_availability
+from .tokens import numbering_atomic
 
 
 # ---------------------------------------------------------
@@ -51,12 +74,17 @@ def logout_view(request):
 # DASHBOARD VIEWS
 # ---------------------------------------------------------
 
+FRAGMENT_CACHE_SECONDS = getattr(settings, 'QMS_FRAGMENT_CACHE_SECONDS', 600)
+QUEUE_LABELS = dict(PatientLine.QUEUE_TYPE_CHOICES)
+
+
 @login_required
+@replica_view
 def admin_dashboard(request):
     if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
         return redirect('login')
 
-    departments = Department.objects.all()
+    departments = get_departments()
     doctors = Doctor.objects.all()
 
     return render(request, 'qms/admin_dashboard.html', {
@@ -70,60 +98,85 @@ def counter_dashboard(request):
     if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
         return redirect('login')
 
-    recent_patients = Patient.objects.all().order_by('-created_at')[:10]
-    departments = Department.objects.all()
+    # Lazy: only evaluated when the cached fragment has expired
+    recent_patients = Patient.objects.select_related('department').order_by('-created_at')[:10]
+    departments = get_departments()
 
     return render(request, 'qms/counter_dashboard.html', {
         'recent_patients': recent_patients,
         'departments': departments,
+        'registrations_version': registrations_version(),
+        'fragment_cache_seconds': FRAGMENT_CACHE_SECONDS,
     })
 
+
+class QueuePanel:
+    """
+    One queue column of the patient care dashboard.
+
+    Everything is computed on first access from the template, so a cached
+    fragment costs no queries at all. Rooms are those of doctors working
+    ``today``, which is part of the fragment key.
+    """
+
+    def __init__(self, department, queue_type, label, today=None):
+        self.department = department
+        self.queue_type = queue_type
+        self.label = label
+        self.today = today or timezone.localdate()
+
+    @property
+    def version(self):
+        return queue_version(self.department.id, self.queue_type)
+
+    @cached_property
+    def lines(self):
+        # Includes patients from partner departments seen in our rooms
+        return list(PatientLine.objects.filter(
+            Q(department=self.department, status__in=['waiting', 'calling', 'processing']) |
+            Q(room_department=self.department, status__in=ACTIVE_STATUSES),
+            queue_type=self.queue_type,
+        ).select_related('patient', 'doctor', 'department', 'room_department').order_by('order_index', 'created_at'))
+
+    @cached_property
+    def rooms(self):
+        occupants = {
+            line.room: line for line in self.lines
+            if line.room and line.status in ACTIVE_STATUSES and line.room_department_id == self.department.id
+        }
+        doctors = Doctor.objects.filter(
+            department=self.department,
+            role=self.queue_type
+        ).only('room', 'days')
+        # An absent doctor's room is not shown unless a patient is still in it
+        rooms = [doctor.room for doctor in doctors if doctor.works_on(self.today) or doctor.room in occupants]
+        return [{'room': room, 'line': occupants.get(room)} for room in dict.fromkeys(rooms)]
+
+    @cached_property
+    def available(self):
+        return any(room['line'] is None for room in self.rooms)
+
+
 @login_required
 def patient_care_dashboard(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
     
     try:
-        assignment = PatientCareAssignment.objects.get(user=request.user)
+        assignment = PatientCareAssignment.objects.select_related('department').get(user=request.user)
         department = assignment.department
         
-        # Get the queues for this department
-        # --- THIS IS THE CORRECTED CODE ---
-        optometrist_queue = PatientLine.objects.filter(
-            patient__department=department,
-            queue_type='optometrist',
-            status__in=['waiting', 'calling', 'processing']
-        ).order_by('order_index', 'created_at')
-        
-        doctor_queue = PatientLine.objects.filter(
-            patient__department=department,
-            queue_type='doctor',
-            status__in=['waiting', 'calling', 'processing']
-        ).order_by('order_index', 'created_at')
-        
-        # Get available rooms
-        optometrist_rooms = Doctor.objects.filter(
-            department=department,
-            role='optometrist'
-        ).values_list('room', flat=True)
-        
-        doctor_rooms = Doctor.objects.filter(
-            department=department,
-            role='doctor'
-        ).values_list('room', flat=True)
-
-        # Check if there is at least one available room for each queue type
-        optometrist_available_room = get_available_room(department.id, 'optometrist')
-        doctor_available_room = get_available_room(department.id, 'doctor')
-        
         context = {
             'department': department,
-            'optometrist_queue': optometrist_queue,
-            'doctor_queue': doctor_queue,
-            'optometrist_rooms': optometrist_rooms,
-            'doctor_rooms': doctor_rooms,
-            'optometrist_available': optometrist_available_room is not None,
-            'doctor_available': doctor_available_room is not None,
+            'queues': [
+                QueuePanel(department, queue_type, f'{QUEUE_LABELS[queue_type]} Queue')
+                for queue_type in get_pathway(department.id)
+            ],
+            'fragment_cache_seconds': FRAGMENT_CACHE_SECONDS,
+            'dashboard_config': {
+                'departmentId': department.id,
+                'csrfToken': get_token(request),
+            },
         }
         
         return render(request, 'qms/patient_care_dashboard.html', context)
@@ -136,67 +189,71 @@ def patient_care_dashboard(request):
 # ---------------------------------------------------------
 
 @login_required
+@idempotent
 def register_patient(request):
     if request.method == 'POST':
-        form = PatientForm(request.POST)
+        # A returning patient loaded by MRN keeps their record
+        existing = None
+        if request.POST.get('existing_mrn'):
+            existing = Patient.objects.filter(mrn=request.POST['existing_mrn']).first()
+            if existing is None:
+                return JsonResponse({'success': False, 'errors': {'mrn': ['Patient not found']}})
+
+        form = PatientForm(request.POST, instance=existing)
         if form.is_valid():
-            patient = form.save()
-
-            # If specific doctor selected
-            if patient.doctor:
-                PatientLine.objects.create(
-                    patient=patient,
-                    queue_type=patient.doctor.role,
-                    status='waiting',
-                    order_index=get_next_order_index(
-                        patient.department,
-                        patient.doctor.role,
-                        patient
-                    )
-                )
-            else:
-                # Default: optometrist queue
-                PatientLine.objects.create(
-                    patient=patient,
-                    queue_type='optometrist',
-                    status='waiting',
-                    order_index=get_next_order_index(
-                        patient.department,
-                        'optometrist',
-                        patient
-                    )
-                )
-
-            return JsonResponse({'success': True, 'mrn': patient.mrn})
+            if existing is None and not request.POST.get('confirm_new'):
+                duplicates = find_duplicates(**{
+                    field: form.cleaned_data[field] for field in ('name', 'age', 'gender', 'phone', 'address')
+                })
+                if duplicates:
+                    return JsonResponse({'success': False, 'duplicates': [
+                        {
+                            'mrn': patient.mrn,
+                            'name': patient.name,
+                            'age': patient.age,
+                            'phone': patient.phone,
+                            'score': round(similarity, 2),
+                        }
+                        for similarity, patient in duplicates
+                    ]})
+
+            # Takes the write lock first: registration reads the last MRN and token
+            with numbering_atomic():
+                patient = form.save()
+
+                line = PatientLine.objects.filter(patient=patient, status__in=OPEN_STATUSES).first()
+                if not line:
+                    lines = [enqueue_patient(patient, queue_type) for queue_type in initial_queue_types(patient)]
+                    line = lines[0]
+
+            return JsonResponse({'success': True, 'mrn': patient.mrn, 'token': line.token})
 
         return JsonResponse({'success': False, 'errors': form.errors})
 
-    departments = Department.objects.all()
+    departments = get_departments()
     return render(request, 'qms/register_patient.html', {'departments': departments})
 
 
+# Fields the registration form is filled from
+PATIENT_FORM_FIELDS = ['mrn', 'name', 'age', 'gender', 'care_of', 'address', 'phone', 'department_id', 'doctor_id']
+
+
 @login_required
 def get_patient_by_mrn(request, mrn):
-    if not Group.objects.get(name='Counter') in request.user.groups.all() and not request.user.is_superuser:
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
         return redirect('login')
 
-    try:
-        patient = Patient.objects.get(mrn=mrn)
+    patient = Patient.objects.filter(mrn=mrn).values(*PATIENT_FORM_FIELDS).first()
+    if patient is None:
+        # Patients in today's queues can also be found by their token
+        line = find_line_by_token(mrn)
+        if line:
+            patient = {field: getattr(line.patient, field) for field in PATIENT_FORM_FIELDS}
 
-        return JsonResponse({
-            'success': True,
-            'name': patient.name,
-            'age': patient.age,
-            'gender': patient.gender,
-            'care_of': patient.care_of,
-            'address': patient.address,
-            'phone': patient.phone,
-            'department_id': patient.department.id,
-            'doctor_id': patient.doctor.id if patient.doctor else None,
-        })
+    if patient:
+        return JsonResponse({'success': True, **patient})
 
-    except Patient.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Patient not found'})
+    return JsonResponse({'success': False, 'error': 'Patient not found'})
 
 
 # ---------------------------------------------------------
@@ -325,6 +382,8 @@ def delete_patient_care_assignment(request, pk):
 
 @login_required
 @require_http_methods(["POST"])
+@idempotent
+@transaction.atomic
 def call_next_patient(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
@@ -332,32 +391,31 @@ def call_next_patient(request):
     queue_type = request.POST.get('queue_type')
     department_id = request.POST.get('department_id')
 
-    next_patient_line = PatientLine.objects.filter(
-        patient__department_id=department_id,
-        queue_type=queue_type,
-        status='waiting'
-    ).order_by('order_index', 'created_at').first()
+    # Prefers the room of the patient's chosen doctor and may take a patient
+    # from an overloaded partner department, see queues.select_next_line
+    next_patient_line, available_room = select_next_line(department_id, queue_type)
 
     if next_patient_line:
-        available_room = get_available_room(department_id, queue_type)
-
-        if available_room:
-            next_patient_line.status = 'calling'
-            next_patient_line.room = available_room
-            next_patient_line.save()
+        next_patient_line.status = 'calling'
+        next_patient_line.room = available_room
+        next_patient_line.room_department_id = department_id
+        next_patient_line.called_at = timezone.now()
+        next_patient_line.save()
 
-            return JsonResponse({
-                'success': True,
-                'patient_id': next_patient_line.patient.id,
-                'patient_name': next_patient_line.patient.name,
-                'room': available_room,
-            })
+        return JsonResponse({
+            'success': True,
+            'patient_id': next_patient_line.patient.id,
+            'patient_name': next_patient_line.patient.name,
+            'room': available_room,
+        })
 
     return JsonResponse({'success': False, 'error': 'No patients or rooms available'})
 
 
 @login_required
 @require_http_methods(["POST"])
+@idempotent
+@transaction.atomic
 def start_processing(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
@@ -367,6 +425,7 @@ def start_processing(request):
     try:
         patient_line = PatientLine.objects.get(id=patient_line_id)
         patient_line.status = 'processing'
+        patient_line.started_at = timezone.now()
         patient_line.save()
 
         return JsonResponse({'success': True})
@@ -377,6 +436,7 @@ def start_processing(request):
 
 @login_required
 @require_http_methods(["POST"])
+@idempotent
 def complete_patient(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
@@ -384,33 +444,13 @@ def complete_patient(request):
     patient_line_id = request.POST.get('patient_line_id')
 
     try:
-        patient_line = PatientLine.objects.select_related('patient').get(id=patient_line_id)
-
-        # If patient finished optometrist → send to doctor queue
-        if patient_line.queue_type == 'optometrist':
-
-            already_in_doctor_queue = PatientLine.objects.filter(
-                patient=patient_line.patient,
-                queue_type='doctor',
-                status__in=['waiting', 'calling', 'processing']
-            ).exists()
-
-            if not already_in_doctor_queue:
-                PatientLine.objects.create(
-                    patient=patient_line.patient,
-                    queue_type='doctor',
-                    status='waiting',
-                    order_index=get_next_order_index(
-                        patient_line.patient.department,
-                        'doctor',
-                        patient_line.patient
-                    )
-                )
-
-        patient_line.status = 'completed'
-        patient_line.save()
+        patient_line = PatientLine.objects.select_related('patient__doctor').get(id=patient_line_id)
 
-        return JsonResponse({'success': True})
+        # Completes the stage and enqueues the next ones of the department's
+        # pathway (by default optometrist → doctor)
+        next_lines = complete_stage(patient_line)
+
+        return JsonResponse({'success': True, 'next_queues': [line.queue_type for line in next_lines]})
 
     except PatientLine.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Patient not found'})
@@ -418,6 +458,8 @@ def complete_patient(request):
 
 @login_required
 @require_http_methods(["POST"])
+@idempotent
+@transaction.atomic
 def hold_patient(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
@@ -438,6 +480,8 @@ def hold_patient(request):
 
 @login_required
 @require_http_methods(["POST"])
+@idempotent
+@transaction.atomic
 def return_to_queue(request):
     if not request.user.groups.filter(name='Patient Care').exists():
         return redirect('login')
@@ -457,64 +501,285 @@ def return_to_queue(request):
 
 
 # ---------------------------------------------------------
-# QUEUE ORDER HELPER
+# API ENDPOINT – Doctors by Department
 # ---------------------------------------------------------
 
-def get_next_order_index(department, queue_type, patient=None):
-    waiting_lines = PatientLine.objects.filter(
-        patient__department=department,
-        queue_type=queue_type,
-        status='waiting'
-    ).order_by('order_index')
-
-    if not waiting_lines.exists():
-        return 1
+@login_required
+def get_doctors_by_department(request, department_id):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
+        return redirect('login')
 
-    # Emergency placed at front
-    if patient and getattr(patient, "emergency", False):
-        first_index = waiting_lines.first().order_index
-        return first_index / 2.0
+    doctors = Doctor.objects.filter(department_id=department_id).values('id', 'name', 'role')
 
-    # Normal → end of queue
-    last_index = waiting_lines.last().order_index
-    return last_index + 1
+    return JsonResponse({
+        'success': True,
+        'doctors': list(doctors)
+    })
 
 
 # ---------------------------------------------------------
-# ROOM AVAILABILITY
+# APPOINTMENTS
 # ---------------------------------------------------------
 
-def get_available_room(department_id, queue_type):
-    all_rooms = Doctor.objects.filter(
-        department_id=department_id,
-        role=queue_type
-    ).values_list('room', flat=True)
+MAX_AVAILABILITY_DAYS = 92
+
+
+def parse_date_param(value):
+    """
+    A YYYY-MM-DD request value as a date, or None if it is empty.
 
-    occupied_rooms = PatientLine.objects.filter(
-        patient__department_id=department_id,
-        queue_type=queue_type,
-        status__in=['calling', 'processing']
-    ).values_list('room', flat=True)
+    Raises ValueError for anything else, including impossible dates such
+    as 2026-13-45.
+    """
+    if not value:
+        return None
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(value)
+    return date
 
-    for room in all_rooms:
-        if room not in occupied_rooms:
-            return room
 
-    return None
+@login_required
+@replica_view
+def appointment_availability(request):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
+        return redirect('login')
+
+    try:
+        start_date = parse_date_param(request.GET.get('start')) or timezone.localdate()
+        end_date = parse_date_param(request.GET.get('end')) or start_date + datetime.timedelta(days=13)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    if (end_date - start_date).days >= MAX_AVAILABILITY_DAYS:
+        return JsonResponse({'success': False, 'error': f'Date range is limited to {MAX_AVAILABILITY_DAYS} days'})
+
+    days = search_availability(
+        start_date,
+        end_date,
+        department_ids=request.GET.getlist('department'),
+        doctor_id=request.GET.get('doctor'),
+    )
+
+    return JsonResponse({
+        'success': True,
+        'days': [{
+            'date': day['date'].isoformat(),
+            'doctor_id': day['doctor_id'],
+            'doctor_name': day['doctor__name'],
+            'role': day['doctor__role'],
+            'department_id': day['department_id'],
+            'free': day['free'],
+        } for day in days]
+    })
+
+
+@login_required
+def appointment_slots(request, doctor_id, date):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
+        return redirect('login')
+
+    try:
+        date = parse_date_param(date)
+    except ValueError:
+        date = None
+    if date is None:
+        return JsonResponse({'success': False, 'error': 'Dates must be YYYY-MM-DD'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'slots': [{
+            'id': slot['id'],
+            'time': slot['start_time'].strftime('%H:%M'),
+            'room': slot['room'],
+            'available': slot['available'],
+        } for slot in get_free_slots(doctor_id, date)]
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+@idempotent
+def book_appointment(request):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
+        return redirect('login')
+
+    try:
+        patient = Patient.objects.get(mrn=request.POST.get('mrn'))
+    except Patient.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Patient not found'})
+
+    appointment = book_slot(patient, request.POST.get('slot_id'))
+    if not appointment:
+        return JsonResponse({'success': False, 'error': 'Slot is no longer available'})
+
+    return JsonResponse({'success': True, 'appointment_id': appointment.id})
+
+
+@login_required
+@require_http_methods(["POST"])
+@idempotent
+def cancel_appointment_view(request):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
+        return redirect('login')
+
+    try:
+        appointment = Appointment.objects.select_related('slot').get(
+            id=request.POST.get('appointment_id'),
+            status='booked'
+        )
+    except Appointment.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Appointment not found'})
+
+    if not cancel_appointment(appointment):
+        return JsonResponse({'success': False, 'error': 'Appointment not found'})
+    return JsonResponse({'success': True})
+
+
+@login_required
+@require_http_methods(["POST"])
+@idempotent
+def check_in_appointment(request):
+    if not request.user.is_superuser and not request.user.groups.filter(name='Counter').exists():
+        return redirect('login')
+
+    try:
+        appointment = Appointment.objects.select_related('patient', 'slot__doctor').get(
+            id=request.POST.get('appointment_id'),
+            status='booked'
+        )
+    except Appointment.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Appointment not found'})
+
+    if appointment.slot.date != timezone.localdate():
+        return JsonResponse({
+            'success': False,
+            'error': f'Appointment is for {appointment.slot.date.isoformat()}, not today'
+        })
+
+    line = check_in(appointment)
+    if not line:
+        return JsonResponse({'success': False, 'error': 'Appointment not found'})
+    return JsonResponse({'success': True, 'patient_line_id': line.id, 'queue_type': line.queue_type})
 
 
 # ---------------------------------------------------------
-# API ENDPOINT – Doctors by Department
+# EXPORTS
 # ---------------------------------------------------------
 
 @login_required
-def get_doctors_by_department(request, department_id):
+@replica_view
+def export_history(request, kind):
     if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
         return redirect('login')
 
-    doctors = Doctor.objects.filter(department_id=department_id)
+    if kind not in ('patients', 'lines'):
+        raise Http404
+
+    try:
+        start_date = parse_date_param(request.GET.get('start'))
+        end_date = parse_date_param(request.GET.get('end'))
+    except ValueError:
+        return HttpResponseBadRequest('Dates must be YYYY-MM-DD')
+
+    department_id = request.GET.get('department') or None
+    if department_id is not None and not department_id.isdigit():
+        return HttpResponseBadRequest('Department must be a department id')
+    status = request.GET.get('status') or None
+    if status is not None and status not in dict(PatientLine.STATUS_CHOICES):
+        return HttpResponseBadRequest('Unknown status')
+
+    # Runs the query now: once streaming starts, errors can only cut the file short
+    excel = request.GET.get('format') == 'excel'
+    rows = iter_rows(kind, start_date=start_date, end_date=end_date, department_id=department_id, status=status)
+
+    response = StreamingHttpResponse(
+        iter_csv(rows, excel=excel),
+        content_type='application/vnd.ms-excel' if excel else 'text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.csv"'
+    return response
+
+
+# ---------------------------------------------------------
+# KIOSK SELF CHECK-IN
+# ---------------------------------------------------------
+
+KIOSK_BATCH_LIMIT = getattr(settings, 'QMS_KIOSK_BATCH_LIMIT', 50)
+
+
+def kiosk_view(request):
+    # The page itself is public; check-ins need the device token
+    return render(request, 'qms/kiosk.html', {'batch_limit': KIOSK_BATCH_LIMIT})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def kiosk_check_in(request):
+    kiosk = get_kiosk(request.headers.get('X-Kiosk-Token'))
+    if not kiosk:
+        return JsonResponse({'success': False, 'error': 'Unknown kiosk'}, status=401)
+
+    try:
+        entries = json.loads(request.body).get('check_ins', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return JsonResponse({'success': False, 'error': 'check_ins must be a list of objects'}, status=400)
+    if len(entries) > KIOSK_BATCH_LIMIT:
+        return JsonResponse({'success': False, 'error': f'At most {KIOSK_BATCH_LIMIT} check-ins per batch'}, status=400)
+
+    return JsonResponse({'success': True, 'results': process_batch(kiosk, entries)})
+
+
+# ---------------------------------------------------------
+# DISPLAY BOARDS
+# ---------------------------------------------------------
+
+def display_board(request, area):
+    # Public like the kiosk; boards show tokens and rooms, never names
+    return render(request, 'qms/display_board.html', {
+        'area': area,
+        'poll_seconds': getattr(settings, 'QMS_ANNOUNCEMENT_POLL_SECONDS', 2),
+    })
+
+
+@require_http_methods(["GET"])
+def poll_announcements(request, area):
+    try:
+        after = int(request.GET.get('after') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'after must be an announcement id'}, status=400)
+
+    announcements, more = get_announcements(area, after)
 
     return JsonResponse({
         'success': True,
-        'doctors': [{'id': d.id, 'name': d.name, 'role': d.role} for d in doctors]
+        # Set when a burst didn't fit; the board asks again right away
+        'more': more,
+        'announcements': [{
+            'id': announcement.id,
+            'token': announcement.token,
+            'room': announcement.room,
+            'audio': [
+                reverse('announcement_audio', args=[locale, announcement.token, announcement.room])
+                for locale in get_locales()
+            ],
+        } for announcement in announcements],
     })
+
+
+@require_http_methods(["GET"])
+def announcement_audio(request, locale, token, room):
+    if locale not in get_locales():
+        raise Http404('Unknown locale')
+
+    try:
+        audio = render_announcement(locale, token.upper(), room.upper())
+    except MissingClip as e:
+        raise Http404(str(e))
+
+    response = HttpResponse(audio, content_type='audio/wav')
+    # A call always sounds the same, so boards and proxies may keep it
+    patch_cache_control(response, public=True, max_age=86400)
+    return response
@@ -0,0 +1,143 @@
+"""
+Worker warm-up.
+
+A fresh worker pays for importing the views, compiling templates,
+opening database connections, loading reference data and reading the
+announcement clips on its first requests. ``warm_up`` does all of that
+up front; wsgi.py calls it when QMS_WARMUP is on, and
+``manage.py qms_warmup`` runs it by hand.
+
+Templates stay compiled in the cached template loader and connections
+stay open for CONN_MAX_AGE. If the process forks afterwards (gunicorn
+``--preload`` warms the master), connections are closed before the fork
+and each child opens its own.
+
+Warm-up is best-effort: a step that fails (e.g. before ``migrate`` has
+created the tables) is logged and skipped, and the worker starts cold.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.template.loader import get_template
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+
+from .announcements import load_libraries
+from .cache import queue_version, registrations_version
+from .pathways import get_pathway
+from .reference import get_departments
+from .routers import REPLICA, replica_available
+
+
+logger = logging.getLogger(__name__)
+
+# Apps whose templates are compiled up front: ours and the admin staff use
+TEMPLATE_APPS = ['qms', 'admin']
+
+_fork_hooks_registered = False
+
+
+def _populate(resolver, namespace=''):
+    # Namespaced includes (the admin) build their own lookup tables, and
+    # the first reverse() in a namespace builds one more
+    count = len(resolver.reverse_dict)
+    for name in resolver.reverse_dict:
+        if isinstance(name, str) and namespace:
+            try:
+                reverse(f'{namespace}:{name}')
+                break
+            except NoReverseMatch:
+                continue
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            nested = ':'.join(filter(None, [namespace, pattern.namespace]))
+            count += _populate(pattern, nested)
+    return count
+
+
+def load_urls():
+    # Imports every view module and builds the reverse() lookup tables
+    return _populate(get_resolver())
+
+
+def compile_templates():
+    names = []
+    for label in TEMPLATE_APPS:
+        root = os.path.join(apps.get_app_config(label).path, 'templates')
+        for directory, _, files in os.walk(root):
+            names += [
+                os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+                for name in files if name.endswith('.html')
+            ]
+    for name in names:
+        get_template(name)
+    return len(names)
+
+
+def connect():
+    opened = 0
+    for alias in connections:
+        if alias == REPLICA:
+            # Also refreshes the replica health check
+            opened += replica_available()
+            continue
+        try:
+            connections[alias].ensure_connection()
+            opened += 1
+        except DatabaseError:
+            pass
+    return opened
+
+
+def prime_reference_data():
+    departments = get_departments()
+    registrations_version()
+    for department in departments:
+        for queue_type in get_pathway(department.id):
+            queue_version(department.id, queue_type)
+    return len(departments)
+
+
+STEPS = [
+    ('urls', load_urls),
+    ('templates', compile_templates),
+    ('connections', connect),
+    ('reference data', prime_reference_data),
+    ('audio clips', load_libraries),
+]
+
+
+def _close_before_fork():
+    # A connection must not be shared by parent and child
+    connections.close_all()
+
+
+def _connect_after_fork():
+    try:
+        connect()
+    except Exception:
+        logger.exception('Could not reconnect to the databases after fork')
+
+
+def warm_up():
+    """
+    Run every warm-up step; returns ``[(step, count, seconds)]``, with
+    ``count`` None for steps that failed.
+    """
+    global _fork_hooks_registered
+    timings = []
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            count = step()
+        except Exception:
+            logger.exception('Warm-up step %r failed', name)
+            count = None
+        timings.append((name, count, time.perf_counter() - started))
+
+    if not _fork_hooks_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=_close_before_fork, after_in_child=_connect_after_fork)
+        _fork_hooks_registered = True
+    return timings